@@ -1,6 +1,39 @@
+from importlib import import_module
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+# Modules behind the insight and analytics endpoints, imported on first use
+ANALYTICS_MODULES = (
+    'data_integration.insights_generator',
+    'data_integration.insight_state',
+    'data_integration.precompute',
+    'data_integration.population',
+)
+
+
+def warm_up():
+    """
+    Import the analytics stack and build the sentiment analyzer up front.
+
+    Under a preforking server that loads the application before forking
+    (e.g. gunicorn --preload), every worker then shares these pages with the
+    master instead of paying for the imports on its first insights request.
+    """
+    from .sentiment import _get_analyzer
+
+    for module in ANALYTICS_MODULES:
+        import_module(module)
+    _get_analyzer()
 
 
 class DataIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'data_integration'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.ANALYTICS_WARMUP:
+            warm_up()
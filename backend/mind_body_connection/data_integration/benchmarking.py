@@ -0,0 +1,183 @@
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+import random
+import sqlite3
+
+import django
+from django.db import connection, transaction
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from .models import HealthMetric, SleepData, JournalEntry
+from .sentiment import score_text
+
+
+BENCHMARK_START_DATE = date(2020, 1, 1)
+
+JOURNAL_SAMPLES = [
+    "Feeling calm and rested after a good night of sleep.",
+    "Work stress is building up and I feel overwhelmed.",
+    "A normal day, nothing special to report.",
+    "Excited about my progress and happy with my workouts.",
+    "Some anxiety this morning but the evening walk helped.",
+]
+
+
+@contextmanager
+def benchmark_database(database_file=None, keepdb=False, verbosity=0):
+    """
+    Run a benchmark against a throwaway copy of the default database.
+
+    The database is created (and migrated) the same way the test runner does,
+    so benchmarks never touch real data.
+
+    :param database_file: Optional file path for the SQLite benchmark database.
+        Defaults to an in-memory database, which is faster but limited by RAM.
+    :param keepdb: Keep the benchmark database around after the run
+    :param verbosity: Verbosity passed on to the database creation
+    """
+    if database_file:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(database_file)
+
+    old_config = setup_databases(verbosity, interactive=False, keepdb=keepdb, aliases={'default'})
+    try:
+        yield connection
+    finally:
+        teardown_databases(old_config, verbosity, keepdb=keepdb)
+
+
+def time_call(func, repeat=5, warmup=1):
+    """
+    Time a callable and summarise the runs in milliseconds.
+
+    :param func: Zero-argument callable to time
+    :param repeat: Number of timed runs
+    :param warmup: Number of untimed runs used to warm caches
+    :return: Dictionary with min, median, mean and max timings
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def benchmark_user_ids(users):
+    return [f"bench-{index:06d}" for index in range(users)]
+
+
+def seed_time_series(users, first_day, last_day, batch_size=10000, seed=0):
+    """
+    Insert one HealthMetric, SleepData and JournalEntry row per user per day.
+
+    Days are offsets from BENCHMARK_START_DATE, so a dataset can be grown in
+    steps by seeding consecutive day ranges.
+
+    :param users: Number of synthetic users
+    :param first_day: First day offset to seed (inclusive)
+    :param last_day: Last day offset to seed (exclusive)
+    :param batch_size: Number of rows per bulk insert
+    :param seed: Random seed, so repeated runs produce the same data
+    :return: Number of rows inserted per model
+    """
+    rng = random.Random(seed + first_day)
+    user_ids = benchmark_user_ids(users)
+    # Stored with the entries, as ingestion would, so reads never rescore them
+    scores = {text: score_text(text) for text in JOURNAL_SAMPLES}
+    metrics, sleep, journal = [], [], []
+    inserted = 0
+
+    def flush():
+        with transaction.atomic():
+            HealthMetric.objects.bulk_create(metrics, batch_size=batch_size)
+            SleepData.objects.bulk_create(sleep, batch_size=batch_size)
+            JournalEntry.objects.bulk_create(journal, batch_size=batch_size)
+        metrics.clear()
+        sleep.clear()
+        journal.clear()
+
+    for day in range(first_day, last_day):
+        current = BENCHMARK_START_DATE + timedelta(days=day)
+        for user_id in user_ids:
+            metrics.append(HealthMetric(
+                user_id=user_id,
+                date=current,
+                steps=rng.randint(2000, 15000),
+                heart_rate=rng.randint(55, 95),
+                sleep_hours=round(rng.uniform(4.5, 9.5), 1),
+                hrv=rng.randint(20, 90),
+            ))
+            sleep.append(SleepData(
+                user_id=user_id,
+                date=current,
+                duration=round(rng.uniform(4.5, 9.5), 1),
+                disturbances=rng.randint(0, 6),
+                sleep_quality=round(rng.uniform(40, 95), 1),
+            ))
+            entry = JournalEntry(user_id=user_id, date=current, entry=rng.choice(JOURNAL_SAMPLES))
+            entry.apply_sentiment(scores[entry.entry])
+            journal.append(entry)
+            inserted += 1
+            if len(metrics) >= batch_size:
+                flush()
+
+    flush()
+    return inserted
+
+
+def environment_info():
+    """
+    Versions and machine details stored alongside benchmark results.
+    """
+    return {
+        'recorded_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def compare_results(baseline, results, threshold=0.2, min_delta_ms=1.0):
+    """
+    Compare benchmark medians against a saved baseline.
+
+    A benchmark regresses when its median is more than `threshold` slower
+    than the baseline median, and by at least `min_delta_ms`, so that noise
+    on sub-millisecond benchmarks is not reported.
+
+    :param baseline: Dictionary of benchmark name to time_call summary
+    :param results: Dictionary of benchmark name to time_call summary
+    :param threshold: Allowed slowdown as a fraction of the baseline median
+    :param min_delta_ms: Smallest slowdown, in milliseconds, reported as a regression
+    :return: List of dictionaries with the name, both medians, the relative
+        change and whether it is a regression, for benchmarks present in both
+    """
+    comparisons = []
+    for name in sorted(baseline.keys() & results.keys()):
+        before = baseline[name]['median_ms']
+        after = results[name]['median_ms']
+        change = (after - before) / before if before else 0.0
+        comparisons.append({
+            'name': name,
+            'baseline_ms': before,
+            'median_ms': after,
+            'change': round(change, 4),
+            'regression': change > threshold and after - before >= min_delta_ms,
+        })
+    return comparisons
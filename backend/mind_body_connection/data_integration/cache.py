@@ -0,0 +1,76 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Cache key of the insights computed across every user (no user_id filter)
+ALL_USERS = '*'
+
+
+class CacheStats:
+    """
+    Process-local hit/miss counters for the insights cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.INSIGHTS_CACHE_ALIAS]
+
+
+def insights_key(user_id, version, start_date=None, end_date=None, agent=None):
+    """
+    Cache key of the insights of a query at a data version of the user.
+
+    The version is the user's DataVersion (see data_integration.versions),
+    which every write moves forward in the database. A write therefore makes
+    the user's earlier entries unreachable in every process at once, whatever
+    the cache backend; they then age out through its TTL and eviction.
+    """
+    return ':'.join([
+        'insights',
+        str(user_id or ALL_USERS),
+        str(version),
+        str(start_date or ''),
+        str(end_date or ''),
+        (agent or 'holistic').lower(),
+    ])
+
+
+def get_insights(key):
+    """
+    Cached insights for a key from insights_key, or None on a miss.
+    """
+    insights = get_cache().get(key)
+    stats.record('hits' if insights is not None else 'misses')
+    return insights
+
+
+def set_insights(key, insights):
+    get_cache().set(key, insights, timeout=settings.INSIGHTS_CACHE_TIMEOUT)
+
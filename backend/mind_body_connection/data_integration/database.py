@@ -0,0 +1,13 @@
+def apply_pragmas(connection):
+    """
+    Set the PRAGMAS of a database's settings on a new SQLite connection.
+
+    PRAGMAS maps pragma names to values, e.g. {'journal_mode': 'WAL'}; see
+    DATABASE_PROFILES in settings. Other databases are left alone.
+    """
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    # Straight on the driver connection: these are not queries of the request
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,140 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import JournalEntry
+from .signals import send_data_changed
+
+
+# Every time-series model holds at most one row per user per day
+UPSERT_UNIQUE_FIELDS = ['user_id', 'date']
+
+
+def upsert_objects(model, objects, batch_size=None):
+    """
+    Insert model instances, overwriting any existing row for the same user and day.
+
+    :param model: HealthMetric, SleepData or JournalEntry
+    :param objects: Unsaved model instances
+    :param batch_size: Rows per INSERT statement
+    :return: The instances, with primary keys set where the database reports them
+
+    Sends data_changed for the written days.
+    """
+    if model is JournalEntry:
+        for obj in objects:
+            obj.score_sentiment()
+
+    update_fields = [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in UPSERT_UNIQUE_FIELDS
+    ]
+    objects = model.objects.bulk_create(
+        objects,
+        batch_size=batch_size or settings.INGEST_DB_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=UPSERT_UNIQUE_FIELDS,
+        update_fields=update_fields,
+    )
+    send_data_changed(model, [(obj.user_id, obj.date) for obj in objects])
+    return objects
+
+
+def upsert_rows(model, fields, rows, batch_size=None, notify=True):
+    """
+    Fast path of upsert_objects for trusted bulk loads.
+
+    Rows are plain tuples that go straight to `executemany`, skipping model
+    instantiation and the ORM's per-value SQL compilation, which dominate the
+    cost of bulk_create at millions of rows. Values must already be in a form
+    the database accepts (e.g. ISO date strings); no validation is done.
+
+    :param model: HealthMetric, SleepData or JournalEntry
+    :param fields: Field names, in the order values appear in each row.
+        Must include user_id and date.
+    :param rows: Iterable of tuples
+    :param batch_size: Rows per executemany call
+    :param notify: Send data_changed for the written days. Loaders writing
+        millions of rows for new users can skip it and rebuild the rollups and
+        insight states for those users afterwards, which is far cheaper.
+    :return: Number of rows written
+    """
+    user_position = fields.index('user_id')
+    date_position = fields.index('date')
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    columns = [quote(model._meta.get_field(name).column) for name in fields]
+    conflict_columns = [quote(model._meta.get_field(name).column) for name in UPSERT_UNIQUE_FIELDS]
+    assignments = [
+        f"{column} = excluded.{column}"
+        for name, column in zip(fields, columns) if name not in UPSERT_UNIQUE_FIELDS
+    ]
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {', '.join(assignments)}"
+    )
+
+    rows = iter(rows)
+    batch_size = batch_size or settings.INGEST_DB_BATCH_SIZE
+    written = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return written
+            cursor.executemany(sql, batch)
+            if notify:
+                send_data_changed(model, [(row[user_position], row[date_position]) for row in batch])
+            written += len(batch)
+
+
+def upsert_records(serializer_class, records):
+    """
+    Validate a batch of raw records and upsert the valid ones in one transaction.
+
+    Invalid records are reported and skipped; they do not abort the batch. When
+    the same (user_id, date) appears more than once, the last record wins and the
+    earlier ones are reported as superseded.
+
+    :param serializer_class: Ingestion serializer for the target model
+    :param records: List of dictionaries as received from the client
+    :return: Dictionary with batch totals and one result per input record
+    """
+    serializer = serializer_class()
+    model = serializer_class.Meta.model
+    results = [None] * len(records)
+    latest_by_key = {}
+
+    for index, record in enumerate(records):
+        try:
+            validated = serializer.run_validation(record)
+        except ValidationError as exc:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': exc.detail}
+            continue
+
+        key = (validated['user_id'], validated['date'])
+        if key in latest_by_key:
+            results[latest_by_key[key][0]] = {'index': latest_by_key[key][0], 'status': 'superseded'}
+        latest_by_key[key] = (index, validated)
+
+    indexes = [index for index, _ in latest_by_key.values()]
+    objects = [model(**validated) for _, validated in latest_by_key.values()]
+
+    with transaction.atomic():
+        upsert_objects(model, objects)
+
+    for index, obj in zip(indexes, objects):
+        result = {'index': index, 'status': 'upserted'}
+        if obj.pk is not None:
+            result['id'] = obj.pk
+        results[index] = result
+
+    return {
+        'received': len(records),
+        'upserted': len(objects),
+        'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+        'results': results,
+    }
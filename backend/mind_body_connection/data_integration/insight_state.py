@@ -0,0 +1,315 @@
+import math
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import islice
+
+from django.conf import settings
+from django.db import router, transaction
+
+from .insights_generator import DATASET_ORDERING, FITNESS_METRICS, HealthInsightsGenerator
+from .models import HealthMetric, SleepData, JournalEntry, InsightState
+from .sentiment import score_text, score_texts
+from .trends import fit_trends
+
+
+# Per model: the columns read into the state, and the state field holding the
+# date of the newest row already folded in
+STATE_SOURCES = {
+    HealthMetric: (('date',) + FITNESS_METRICS, 'health_last_date'),
+    SleepData: (('date', 'duration', 'sleep_quality'), 'sleep_last_date'),
+    JournalEntry: (('date', 'entry', 'polarity', 'emotional_keywords'), 'journal_last_date'),
+}
+
+STATE_FIELDS = [
+    field.name for field in InsightState._meta.concrete_fields
+    if not field.primary_key and field.name != 'user_id'
+]
+
+REBUILD_USER_BATCH_SIZE = 500
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _add_exact(partials, value):
+    """
+    Add a value to an exact sum kept as non-overlapping float partials.
+
+    Shewchuk's algorithm, the one behind math.fsum: math.fsum of the
+    partials is the correctly rounded sum of every value added.
+    """
+    result = []
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            result.append(low)
+        value = high
+    result.append(value)
+    return result
+
+
+def _reset(state, model):
+    if model is HealthMetric:
+        state.health_count = 0
+        state.health_last_date = None
+        state.health_window = {}
+    elif model is SleepData:
+        state.sleep_count = 0
+        state.sleep_last_date = None
+        state.duration_partials = []
+        state.sleep_quality_partials = []
+    else:
+        state.journal_count = 0
+        state.journal_last_date = None
+        state.polarity_partials = []
+        state.positive_count = state.negative_count = 0
+        state.keyword_counts = []
+
+
+def _apply(state, model, row):
+    """
+    Fold one row, newer than every row already in the state, into the state.
+    """
+    if model is HealthMetric:
+        window = settings.TREND_WINDOW
+        state.health_count += 1
+        state.health_last_date = row[0]
+        state.health_window = {
+            metric: (state.health_window.get(metric, []) + [value])[-window:]
+            for metric, value in zip(FITNESS_METRICS, row[1:])
+        }
+
+    elif model is SleepData:
+        _, duration, sleep_quality = row
+        state.sleep_count += 1
+        state.sleep_last_date = row[0]
+        state.duration_partials = _add_exact(state.duration_partials, duration)
+        state.sleep_quality_partials = _add_exact(state.sleep_quality_partials, sleep_quality)
+
+    else:
+        _, entry, polarity, keywords = row
+        if polarity is None or keywords is None:
+            # Written before sentiment was stored and not yet backfilled
+            score = score_text(entry)
+            polarity, keywords = score.polarity, score.emotional_keywords
+
+        # Same thresholds as HealthInsightsGenerator
+        state.journal_count += 1
+        state.journal_last_date = row[0]
+        state.polarity_partials = _add_exact(state.polarity_partials, polarity)
+        if polarity > 0.2:
+            state.positive_count += 1
+        elif polarity < -0.2:
+            state.negative_count += 1
+        if keywords:
+            counts = Counter(dict(state.keyword_counts))
+            counts.update(keywords)
+            state.keyword_counts = [[keyword, count] for keyword, count in counts.items()]
+
+
+def _source_rows(model, user_ids, using=None):
+    """
+    State columns of every row of these users, grouped by user in chronological order.
+    """
+    fields, _ = STATE_SOURCES[model]
+    rows = defaultdict(list)
+    queryset = model.objects.using(using).filter(user_id__in=user_ids).order_by('user_id', *DATASET_ORDERING)
+    for user_id, *row in queryset.values_list('user_id', *fields).iterator():
+        rows[user_id].append(row)
+    return rows
+
+
+def _score_unscored(rows, score=score_texts):
+    """
+    Fill in the sentiment of journal rows stored without it, as one batch.
+
+    :param score: Callable scoring a list of texts, e.g. BatchSentimentScorer.score
+    """
+    unscored = [
+        (user_rows, index)
+        for user_rows in rows.values()
+        for index, row in enumerate(user_rows)
+        if row[2] is None or row[3] is None
+    ]
+    if not unscored:
+        return
+    scores = score([user_rows[index][1] for user_rows, index in unscored])
+    for (user_rows, index), score in zip(unscored, scores):
+        day, entry, _, _ = user_rows[index]
+        user_rows[index] = [day, entry, score.polarity, score.emotional_keywords]
+
+
+def _rebuild(states, models, using=None, score=score_texts):
+    """
+    Recompute the given datasets of these states from the source rows.
+    """
+    for model in models:
+        rows = _source_rows(model, list(states), using)
+        if model is JournalEntry:
+            _score_unscored(rows, score)
+        for user_id, state in states.items():
+            _reset(state, model)
+            for row in rows.get(user_id, ()):
+                _apply(state, model, row)
+
+
+def _save(states):
+    InsightState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['user_id'],
+        update_fields=STATE_FIELDS,
+    )
+
+
+def update_insight_state(model, keys):
+    """
+    Bring the insight state of the users behind a write up to date.
+
+    Rows dated after everything already in a user's state are folded in
+    directly, in O(1) per row. Anything else (an overwritten or deleted day,
+    or a backfill of older days) rebuilds that user's state for the dataset
+    from their stored rows, as does the first write for a user without state.
+
+    :param model: HealthMetric, SleepData or JournalEntry
+    :param keys: Iterable of (user_id, date) pairs that were written or deleted
+    """
+    if model not in STATE_SOURCES:
+        return
+    dates_by_user = defaultdict(set)
+    for user_id, day in keys:
+        dates_by_user[user_id].add(_as_date(day))
+    if not dates_by_user:
+        return
+
+    fields, last_date_field = STATE_SOURCES[model]
+    with transaction.atomic():
+        states = {
+            state.user_id: state
+            for state in InsightState.objects.select_for_update().filter(user_id__in=list(dates_by_user))
+        }
+        new_states = {
+            user_id: InsightState(user_id=user_id)
+            for user_id in dates_by_user if user_id not in states
+        }
+        if new_states:
+            _rebuild(new_states, STATE_SOURCES)
+
+        rebuild = {}
+        appends = {}
+        for user_id, state in states.items():
+            last_date = getattr(state, last_date_field)
+            if last_date is None or min(dates_by_user[user_id]) > last_date:
+                appends[user_id] = state
+            else:
+                rebuild[user_id] = state
+        if rebuild:
+            _rebuild(rebuild, [model])
+
+        if appends:
+            written = {(user_id, day) for user_id in appends for day in dates_by_user[user_id]}
+            rows = (
+                model.objects
+                .filter(user_id__in=list(appends), date__in={day for _, day in written})
+                .order_by(*DATASET_ORDERING)
+                .values_list('user_id', *fields)
+            )
+            for user_id, *row in rows:
+                if (user_id, row[0]) in written:
+                    _apply(appends[user_id], model, row)
+
+        _save([*new_states.values(), *states.values()])
+
+
+def load_insight_state(user_id):
+    """
+    A user's insight state, built from their rows if it does not exist yet.
+
+    The build reads the rows from the primary, where the state is written,
+    and never replaces a state written meanwhile by update_insight_state.
+
+    :return: The InsightState, or None when the user has no rows (nothing is saved)
+    """
+    state = InsightState.objects.filter(user_id=user_id).first()
+    if state is not None:
+        return state
+
+    using = router.db_for_write(InsightState)
+    state = InsightState(user_id=user_id)
+    _rebuild({user_id: state}, STATE_SOURCES, using)
+    if not (state.health_count or state.sleep_count or state.journal_count):
+        return None
+    InsightState.objects.using(using).bulk_create([state], ignore_conflicts=True)
+    return InsightState.objects.using(using).get(user_id=user_id)
+
+
+def rebuild_insight_states(user_ids=None, batch_size=REBUILD_USER_BATCH_SIZE, scorer=None):
+    """
+    Rebuild insight states from the source tables, e.g. after a bulk load.
+
+    :param user_ids: Restrict the rebuild to these users (default: every user with data)
+    :param scorer: BatchSentimentScorer for journal entries stored without
+        sentiment (default: score them in this process)
+    :return: Number of states written
+    """
+    score = scorer.score if scorer is not None else score_texts
+    if user_ids is None:
+        user_ids = set()
+        for model in STATE_SOURCES:
+            user_ids.update(model.objects.values_list('user_id', flat=True).distinct())
+    user_ids = iter(sorted(user_ids))
+
+    written = 0
+    while True:
+        batch = list(islice(user_ids, batch_size))
+        if not batch:
+            return written
+        states = {user_id: InsightState(user_id=user_id) for user_id in batch}
+        _rebuild(states, STATE_SOURCES, score=score)
+        with transaction.atomic():
+            _save(list(states.values()))
+        written += len(states)
+
+
+class StateInsightsGenerator(HealthInsightsGenerator):
+    """
+    Full-history insights for one user, computed from their InsightState
+    instead of their rows. Produces the same output as HealthInsightsGenerator
+    over all of the user's data.
+    """
+
+    def __init__(self, state):
+        super().__init__(None, None, None)
+        self.state = state
+
+    def _fitness_trends(self):
+        if self._fitness_fits is None:
+            window = self.state.health_window
+            self._fitness_fits = fit_trends([window.get(metric, []) for metric in FITNESS_METRICS])
+        return self._fitness_fits
+
+    def generate_sleep_insights(self):
+        state = self.state
+        if state.sleep_count == 0:
+            return self._summarize_sleep(0, None, None)
+        return self._summarize_sleep(
+            state.sleep_count,
+            math.fsum(state.duration_partials) / state.sleep_count,
+            math.fsum(state.sleep_quality_partials) / state.sleep_count
+        )
+
+    def analyze_journal_sentiments(self):
+        state = self.state
+        if state.journal_count == 0:
+            return self._summarize_journal(0, 0, 0, 0, Counter())
+        return self._summarize_journal(
+            state.journal_count,
+            math.fsum(state.polarity_partials) / state.journal_count,
+            state.positive_count,
+            state.negative_count,
+            Counter(dict(state.keyword_counts))
+        )
@@ -1,9 +1,37 @@
+import asyncio
+import hashlib
+import math
 import numpy as np
-import pandas as pd
-import random
 from typing import Dict, Any, List
-from textblob import TextBlob
 from collections import Counter
+from django.db.models import Q
+
+from .sentiment import score_texts
+from .telemetry import timed
+from .trends import classify_trend, fit_trends
+
+# Columns each agent reads, loaded once per dataset
+DATASET_COLUMNS = {
+    'health_metrics': ('steps', 'heart_rate', 'hrv'),
+    'sleep_data': ('duration', 'sleep_quality'),
+    'journal_entries': ('polarity', 'emotional_keywords'),
+}
+
+# Metrics whose trends the fitness agent reports
+FITNESS_METRICS = DATASET_COLUMNS['health_metrics']
+
+# Columns holding Python objects rather than numbers
+OBJECT_COLUMNS = {'entry', 'emotional_keywords'}
+
+# Chronological order, so first/last values are the oldest/newest readings
+DATASET_ORDERING = ('date', 'id')
+
+# Generator method producing the insights of each agent
+AGENT_METHODS = {
+    'fitness': 'generate_fitness_insights',
+    'sleep': 'generate_sleep_insights',
+    'journal': 'analyze_journal_sentiments',
+}
 
 class HealthInsightsGenerator:
     def __init__(self, health_metrics, sleep_data, journal_entries):
@@ -17,6 +45,129 @@ class HealthInsightsGenerator:
         self.health_metrics = health_metrics
         self.sleep_data = sleep_data
         self.journal_entries = journal_entries
+        self._columns = {}
+        self._unscored_texts = None
+        self._fitness_fits = None
+
+    @classmethod
+    def from_rows(cls, rows, fitness_trends=None):
+        """
+        Build a generator over rows that were already loaded, e.g. by a batch
+        job reading many users at once.
+
+        :param rows: Dictionary of dataset name to a list of tuples holding that
+            dataset's DATASET_COLUMNS, in chronological order
+        :param fitness_trends: Optional TrendFit per fitness metric, in
+            FITNESS_METRICS order, when the job fitted them already
+        """
+        generator = cls([], [], [])
+        for dataset, dataset_rows in rows.items():
+            generator._columns[dataset] = generator._build_columns(dataset, dataset_rows)
+        generator._fitness_fits = fitness_trends
+        return generator
+
+    def _load_columns(self, dataset):
+        """
+        Load the analysed columns of a dataset in a single pass.
+
+        Querysets are read with one `values_list` query instead of building a
+        model instance per row; any other collection of objects is read with
+        getattr. Numeric columns are returned as NumPy arrays, text as lists.
+
+        :param dataset: Name of the dataset attribute, e.g. 'health_metrics'
+        :return: Dictionary of column name to values
+        """
+        if dataset in self._columns:
+            return self._columns[dataset]
+
+        fields = DATASET_COLUMNS[dataset]
+        collection = getattr(self, dataset)
+        if hasattr(collection, 'values_list'):
+            rows = list(self._column_rows(dataset))
+        else:
+            rows = [tuple(getattr(item, field, None) for field in fields) for item in collection]
+
+        self._columns[dataset] = self._build_columns(dataset, rows)
+        return self._columns[dataset]
+
+    def _column_rows(self, dataset):
+        return getattr(self, dataset).order_by(*DATASET_ORDERING).values_list(*DATASET_COLUMNS[dataset])
+
+    def _build_columns(self, dataset, rows):
+        fields = DATASET_COLUMNS[dataset]
+        values = list(zip(*rows)) if rows else [()] * len(fields)
+        columns = {}
+        for field, column in zip(fields, values):
+            if field in OBJECT_COLUMNS:
+                columns[field] = list(column)
+            else:
+                columns[field] = np.asarray(column, dtype=float)
+        return columns
+
+    async def aload_columns(self):
+        """
+        Load every dataset with Django's async ORM, issuing the queries concurrently.
+
+        Afterwards the agents run without touching the database, so they can be
+        handed to an executor. Datasets that are not querysets are left to
+        _load_columns.
+        """
+        datasets = [
+            dataset for dataset in DATASET_COLUMNS
+            if dataset not in self._columns and hasattr(getattr(self, dataset), 'values_list')
+        ]
+
+        async def fetch(dataset):
+            return [row async for row in self._column_rows(dataset)]
+
+        for dataset, rows in zip(datasets, await asyncio.gather(*map(fetch, datasets))):
+            self._columns[dataset] = self._build_columns(dataset, rows)
+
+        if 'journal_entries' in datasets and self._unscored_indexes():
+            self._unscored_texts = [text async for text in self._unscored_entries()]
+
+    def _unscored_indexes(self):
+        columns = self._load_columns('journal_entries')
+        return [
+            index for index, (polarity, entry_keywords)
+            in enumerate(zip(columns['polarity'], columns['emotional_keywords']))
+            if np.isnan(polarity) or entry_keywords is None
+        ]
+
+    def _unscored_entries(self):
+        return self.journal_entries.order_by(*DATASET_ORDERING).filter(
+            Q(polarity__isnull=True) | Q(emotional_keywords__isnull=True)
+        ).values_list('entry', flat=True)
+
+    def _load_journal_scores(self):
+        """
+        Sentiment polarity and emotional keywords for every journal entry.
+
+        Scores are normally stored on the entries when they are written; any
+        entry without them (written before scoring existed and not yet
+        backfilled) is scored here instead.
+
+        :return: Tuple of (polarity array, list of keyword lists)
+        """
+        columns = self._load_columns('journal_entries')
+        polarities = columns['polarity']
+        keywords = columns['emotional_keywords']
+
+        missing = self._unscored_indexes()
+        if missing:
+            collection = self.journal_entries
+            if self._unscored_texts is not None:
+                texts = self._unscored_texts
+            elif hasattr(collection, 'values_list'):
+                texts = list(self._unscored_entries())
+            else:
+                texts = [getattr(collection[index], 'entry') for index in missing]
+
+            for index, score in zip(missing, score_texts(texts)):
+                polarities[index] = score.polarity
+                keywords[index] = score.emotional_keywords
+
+        return polarities, keywords
 
     def generate_fitness_insights(self):
         """
@@ -24,51 +175,48 @@ class HealthInsightsGenerator:
 
         :return: Dictionary of fitness predictions and trends
         """
-        # Simulate a more conceptual approach to fitness insights
-        metrics = {
-            'steps': self._analyze_trend(self.health_metrics, 'steps'),
-            'heart_rate': self._analyze_trend(self.health_metrics, 'heart_rate'),
-            'hrv': self._analyze_trend(self.health_metrics, 'hrv')
-        }
-
+        metrics = dict(zip(FITNESS_METRICS, self._fitness_trends()))
         return {
-            'steps_prediction': metrics['steps'],
-            'heart_rate_prediction': metrics['heart_rate'],
-            'hrv_prediction': metrics['hrv']
+            'steps_prediction': self._describe_trend('steps', metrics['steps']),
+            'heart_rate_prediction': self._describe_trend('heart_rate', metrics['heart_rate']),
+            'hrv_prediction': self._describe_trend('hrv', metrics['hrv'])
         }
 
-    def _analyze_trend(self, data_collection, metric_name):
+    def _fitness_trends(self):
+        """
+        TrendFit of each fitness metric, in FITNESS_METRICS order.
+
+        Batch jobs may set these beforehand (see from_rows), having fitted many
+        users in one call.
+        """
+        if self._fitness_fits is None:
+            columns = self._load_columns('health_metrics')
+            self._fitness_fits = fit_trends([columns[metric] for metric in FITNESS_METRICS])
+        return self._fitness_fits
+
+    def _describe_trend(self, metric_name, fit):
         """
-        Conceptual trend analysis for a specific metric.
+        Trend analysis from a least-squares fit of a metric's recent readings.
 
-        :param data_collection: Collection of health metrics
         :param metric_name: Name of the metric to analyze
+        :param fit: TrendFit of the metric
         :return: Trend analysis dictionary
         """
-        if not data_collection:
+        if fit.count == 0:
             return {
                 'trend': 'insufficient_data',
                 'next_prediction': None,
                 'recommendation': 'Collect more data to gain insights'
             }
 
-        # Extract metric values
-        values = [getattr(item, metric_name) for item in data_collection]
-
-        # Simple trend detection
-        if len(values) > 1:
-            trend = 'increasing' if values[-1] > values[0] else 'decreasing'
-            next_prediction = values[-1] * (1.1 if trend == 'increasing' else 0.9)
-        else:
-            trend = 'stable'
-            next_prediction = values[0]
+        trend = classify_trend(fit)
 
         # Generate contextual recommendation
         recommendation = self._generate_metric_recommendation(metric_name, trend)
 
         return {
             'trend': trend,
-            'next_prediction': round(float(next_prediction), 2),
+            'next_prediction': round(fit.forecast, 2),
             'recommendation': recommendation
         }
 
@@ -106,19 +254,26 @@ class HealthInsightsGenerator:
 
         :return: Dictionary of sleep-related insights
         """
-        if not self.sleep_data:
+        columns = self._load_columns('sleep_data')
+        count = len(columns['duration'])
+        if count == 0:
+            return self._summarize_sleep(0, None, None)
+        # Correctly rounded sums, which InsightState keeps exactly as data arrives
+        return self._summarize_sleep(
+            count, math.fsum(columns['duration']) / count, math.fsum(columns['sleep_quality']) / count
+        )
+
+    def _summarize_sleep(self, count, avg_duration, avg_quality):
+        """
+        Sleep insights from the number of nights tracked and their averages.
+        """
+        if count == 0:
             return {
                 'average_duration': None,
                 'average_quality': None,
                 'recommendation': 'Start tracking your sleep to gain insights'
             }
 
-        durations = [item.duration for item in self.sleep_data]
-        qualities = [item.sleep_quality for item in self.sleep_data]
-
-        avg_duration = np.mean(durations)
-        avg_quality = np.mean(qualities)
-
         recommendation = self._generate_sleep_recommendation(avg_duration, avg_quality)
 
         return {
@@ -139,7 +294,31 @@ class HealthInsightsGenerator:
         """
         Perform comprehensive sentiment analysis on journal entries.
         """
-        if not self.journal_entries:
+        sentiments, entry_keywords = self._load_journal_scores()
+        if len(sentiments) == 0:
+            return self._summarize_journal(0, 0, 0, 0, Counter())
+
+        # Aggregate the stored per-entry scores
+        keyword_counts = Counter(keyword for keywords in entry_keywords for keyword in keywords)
+        return self._summarize_journal(
+            len(sentiments),
+            math.fsum(sentiments) / len(sentiments),
+            int(np.count_nonzero(sentiments > 0.2)),
+            int(np.count_nonzero(sentiments < -0.2)),
+            keyword_counts
+        )
+
+    def _summarize_journal(self, total_entries, avg_sentiment, positive_entries, negative_entries, keyword_counts):
+        """
+        Journal insights from aggregate sentiment figures.
+
+        :param total_entries: Number of journal entries
+        :param avg_sentiment: Mean polarity of the entries
+        :param positive_entries: Entries with polarity above 0.2
+        :param negative_entries: Entries with polarity below -0.2
+        :param keyword_counts: Counter of emotional keywords, in order of first appearance
+        """
+        if total_entries == 0:
             return {
                 'average_sentiment': 0,
                 'overall_mood': 'neutral',
@@ -152,35 +331,14 @@ class HealthInsightsGenerator:
                 'recommendation': 'Start journaling to track emotional patterns'
             }
 
-        # Perform detailed sentiment analysis
-        sentiments = []
-        emotional_keywords = []
-
-        for entry in self.journal_entries:
-            blob = TextBlob(str(entry.entry))
-            sentiment = blob.sentiment.polarity
-            sentiments.append(sentiment)
-
-            # Simple emotional keyword extraction
-            emotional_terms = [
-                word.lower() for word in str(entry.entry).split()
-                if word.lower() in ['stress', 'happy', 'sad', 'anxiety', 'excited',
-                                    'worry', 'joy', 'frustrated', 'calm', 'overwhelmed']
-            ]
-            emotional_keywords.extend(emotional_terms)
-
         # Calculate sentiment percentages
-        positive_entries = sum(1 for s in sentiments if s > 0.2)
-        negative_entries = sum(1 for s in sentiments if s < -0.2)
-        neutral_entries = sum(1 for s in sentiments if -0.2 <= s <= 0.2)
+        neutral_entries = total_entries - positive_entries - negative_entries
 
-        total_entries = len(sentiments)
         positive_percentage = round((positive_entries / total_entries) * 100, 2) if total_entries > 0 else 0
         negative_percentage = round((negative_entries / total_entries) * 100, 2) if total_entries > 0 else 0
         neutral_percentage = round((neutral_entries / total_entries) * 100, 2) if total_entries > 0 else 0
 
         # Determine overall mood
-        avg_sentiment = np.mean(sentiments) if sentiments else 0
         overall_mood = self._classify_sentiment(avg_sentiment)
 
         # Generate detailed recommendation
@@ -188,7 +346,7 @@ class HealthInsightsGenerator:
             overall_mood,
             positive_percentage,
             negative_percentage,
-            emotional_keywords
+            keyword_counts
         )
 
         return {
@@ -199,7 +357,7 @@ class HealthInsightsGenerator:
                 'negative_percentage': negative_percentage,
                 'neutral_percentage': neutral_percentage
             },
-            'emotional_keywords': list(set(emotional_keywords)),
+            'emotional_keywords': sorted(keyword_counts),
             'recommendation': recommendation
         }
 
@@ -220,6 +378,8 @@ class HealthInsightsGenerator:
     def _generate_mood_recommendation(self, mood, positive_pct, negative_pct, keywords):
         """
         Generate nuanced mood recommendation with personalized insights
+
+        :param keywords: Emotional keywords, as a list or a Counter
         """
         recommendation_templates = {
             'negative': [
@@ -257,9 +417,6 @@ class HealthInsightsGenerator:
             ]
         }
 
-        base_recommendation = random.choice(recommendation_templates.get(mood, recommendation_templates['neutral']))
-        support_suggestion = random.choice(emotional_support_suggestions.get(mood, []))
-
         percentage_context = (
             f"Emotional Composition: {positive_pct}% positive, {negative_pct}% negative entries. "
         )
@@ -270,6 +427,14 @@ class HealthInsightsGenerator:
             keyword_str = ", ".join([k for k, _ in top_keywords])
             keyword_insights = f"Emotional Themes: {keyword_str}. "
 
+        # The phrasing is picked by a digest of the figures it describes, so the
+        # same data always reads the same (insights responses carry strong ETags)
+        digest = hashlib.sha256(f"{mood}|{percentage_context}|{keyword_insights}".encode()).digest()
+        templates = recommendation_templates.get(mood, recommendation_templates['neutral'])
+        suggestions = emotional_support_suggestions.get(mood, [])
+        base_recommendation = templates[digest[0] % len(templates)]
+        support_suggestion = suggestions[digest[1] % len(suggestions)]
+
         full_recommendation = (
             f"{base_recommendation} {percentage_context}"
             f"{keyword_insights}"
@@ -278,14 +443,29 @@ class HealthInsightsGenerator:
 
         return full_recommendation
 
+    def run_agent(self, agent):
+        """
+        Insights of one agent by name, timed as a phase of the current request.
+
+        :param agent: Key of AGENT_METHODS
+        """
+        with timed(f"agent-{agent}"):
+            return getattr(self, AGENT_METHODS[agent])()
+
     def generate_holistic_insights(self):
         """
         Aggregate insights from all health tracking agents with enhanced correlations.
         """
-        fitness_insights = self.generate_fitness_insights()
-        sleep_insights = self.generate_sleep_insights()
-        journal_sentiments = self.analyze_journal_sentiments()
+        return self.combine_insights(
+            self.run_agent('fitness'),
+            self.run_agent('sleep'),
+            self.run_agent('journal')
+        )
 
+    def combine_insights(self, fitness_insights, sleep_insights, journal_sentiments):
+        """
+        Holistic insights from the output of the three agents.
+        """
         # Enhanced correlative recommendation
         holistic_recommendation = self._generate_comprehensive_recommendation(
             fitness_insights,
@@ -0,0 +1,112 @@
+import json
+
+
+class JSONStreamReader:
+    """
+    Incremental reader for large JSON files made of one big array.
+
+    Only a single array element is held in memory at a time, so fixture files
+    far larger than RAM can be loaded. Supports a top-level array, or a
+    top-level object holding the array under a known key.
+    """
+    whitespace = ' \t\n\r'
+    delimiters = whitespace + ',]}'
+
+    def __init__(self, fp, chunk_size=1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """
+        Read the next chunk into the buffer. Returns False at end of file.
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError('Unexpected end of file', self.buffer, self.pos)
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def _is_delimited(self, end):
+        return end < len(self.buffer) and self.buffer[end] in self.delimiters
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may simply be cut off at the end of the buffer
+                if not self._fill():
+                    raise
+                continue
+            if isinstance(value, (int, float)) and not self._is_delimited(end) and self._fill():
+                # A number cut off by the end of the buffer continues in the next chunk
+                continue
+            self.pos = end
+            return value
+
+    def _iter_elements(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect(']')
+            return
+
+    def iter_array(self, key=None, header=None):
+        """
+        Yield the elements of the top-level array, or of the array stored under
+        `key` when the document is an object.
+
+        :param key: Member holding the array when the top level is an object
+        :param header: Optional dict that receives the object's other members
+            that appear before the array
+        """
+        if self._peek() == '[':
+            yield from self._iter_elements()
+            return
+
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            name = self._decode_value()
+            self._expect(':')
+            if name == key and self._peek() == '[':
+                yield from self._iter_elements()
+            else:
+                value = self._decode_value()
+                if header is not None:
+                    header[name] = value
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect('}')
+            return
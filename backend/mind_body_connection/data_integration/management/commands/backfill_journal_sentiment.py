@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from data_integration.models import JournalEntry, SENTIMENT_FIELDS
+from data_integration.sentiment import BatchSentimentScorer
+from data_integration.signals import send_data_changed
+
+class Command(BaseCommand):
+    help = 'Compute and store sentiment scores for journal entries that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Entries scored and written per transaction')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Scoring processes (default: SENTIMENT_WORKERS, or one per CPU)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Entries sent to a scoring process per task (default: SENTIMENT_CHUNK_SIZE)')
+        parser.add_argument('--rescore', action='store_true',
+                            help='Check every entry and rescore those whose text changed since it was scored')
+        parser.add_argument('--force', action='store_true',
+                            help='Rescore every entry, e.g. after a change to the scoring model')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        force = options['force']
+
+        entries = JournalEntry.objects.order_by('id')
+        if not (options['rescore'] or force):
+            entries = entries.filter(
+                Q(polarity__isnull=True) | Q(content_hash__isnull=True) | Q(emotional_keywords__isnull=True)
+            )
+
+        started = time.perf_counter()
+        checked = scored = 0
+        last_id = 0
+        with BatchSentimentScorer(workers=options['workers'], chunk_size=options['chunk_size']) as scorer:
+            while True:
+                batch = list(entries.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                checked += len(batch)
+
+                stale = [entry for entry in batch if force or not entry.has_current_sentiment()]
+                if stale:
+                    for entry, score in zip(stale, scorer.score(entry.entry for entry in stale)):
+                        entry.apply_sentiment(score)
+                    with transaction.atomic():
+                        JournalEntry.objects.bulk_update(stale, SENTIMENT_FIELDS, batch_size=1000)
+                        # Refreshes the insight states and data versions built on the old scores
+                        send_data_changed(JournalEntry, [(entry.user_id, entry.date) for entry in stale])
+                    scored += len(stale)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"Checked {checked:,} entries, scored {scored:,} ({checked / elapsed:,.0f} entries/s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored:,} of {checked:,} journal entries"))
@@ -0,0 +1,193 @@
+import copy
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+from multiprocessing import get_context
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from data_integration.benchmarking import benchmark_database
+from data_integration.synthetic import generate_blocks, synthetic_user_ids, write_blocks
+
+
+START_DATE = date(2024, 1, 1)
+
+
+def call(application, method, path, query=None, body=None):
+    """
+    One request through the WSGI handler, as a server would make it.
+
+    Unlike the test client, the handler opens and closes database connections
+    per request the way CONN_MAX_AGE says.
+
+    :return: HTTP status code
+    """
+    environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': urlencode(query or {})}
+    if body is not None:
+        payload = json.dumps(body).encode()
+        environ.update(CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(payload)))
+        environ['wsgi.input'] = BytesIO(payload)
+    setup_testing_defaults(environ)
+    environ['HTTP_HOST'] = 'localhost'
+
+    statuses = []
+    result = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return int(statuses[0].split()[0])
+
+
+def read_requests(rng, users, days):
+    """
+    Endless dashboard reads: a user's metrics, sleep data or insights over a random window.
+    """
+    paths = ('/api/metrics/', '/api/sleep/', '/api/insights/')
+    while True:
+        first = rng.randrange(days)
+        last = min(days - 1, first + rng.randrange(7, 90))
+        yield paths[rng.randrange(len(paths))], {
+            'user_id': rng.choice(users),
+            'start_date': (START_DATE + timedelta(days=first)).isoformat(),
+            'end_date': (START_DATE + timedelta(days=last)).isoformat(),
+        }
+
+
+def write_records(worker, batch_size):
+    """
+    Endless ingest batches: new days of health metrics for the worker's own user.
+    """
+    day = 0
+    while True:
+        yield [
+            {'user_id': f"load-writer-{worker}", 'date': (START_DATE + timedelta(days=day + offset)).isoformat(),
+             'steps': 8000 + offset, 'heart_rate': 70, 'sleep_hours': 7.5, 'hrv': 55}
+            for offset in range(batch_size)
+        ]
+        day += batch_size
+
+
+def run_worker(role, worker, deadline, users, days, batch_size):
+    """
+    Send requests of one kind until the deadline. Runs in a forked process.
+
+    :return: Dictionary with the role, request latencies in ms and error count
+    """
+    application = get_wsgi_application()
+    latencies = []
+    errors = 0
+    if role == 'read':
+        requests = (('GET', path, query, None) for path, query in read_requests(random.Random(worker), users, days))
+    else:
+        requests = (('POST', '/api/metrics/', None, records) for records in write_records(worker, batch_size))
+
+    for method, path, query, body in requests:
+        if time.monotonic() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            status = call(application, method, path, query, body)
+        except Exception:
+            status = 500
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status >= 500:
+            errors += 1
+    connections.close_all()
+    return {'role': role, 'latencies': latencies, 'errors': errors}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a file database with concurrent reader and writer processes under each database profile, '
+        'and compare read and write throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='default,production',
+                            help='Comma separated names from DATABASE_PROFILES')
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes')
+        parser.add_argument('--writers', type=int, default=2, help='Writer processes')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per profile')
+        parser.add_argument('--users', type=int, default=50, help='Synthetic users to read')
+        parser.add_argument('--days', type=int, default=365, help='Days of data per user')
+        parser.add_argument('--batch-size', type=int, default=50, help='Records per ingest request')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'].split(',')
+        unknown = [name for name in profiles if name not in settings.DATABASE_PROFILES]
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(unknown)}. Choose from: "
+                               f"{', '.join(settings.DATABASE_PROFILES)}")
+        if options['readers'] + options['writers'] < 1:
+            raise CommandError('At least one reader or writer is needed')
+
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers of {options['batch_size']} records, "
+            f"{options['duration']:g}s per profile, {options['users']} users x {options['days']} days"
+        )
+        database = connections['default'].settings_dict
+        profile_keys = {key for profile in settings.DATABASE_PROFILES.values() for key in profile}
+        base = {key: value for key, value in database.items() if key not in profile_keys}
+        defaults = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+        original = dict(database)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for name in profiles:
+                    database.clear()
+                    database.update(base, **defaults)
+                    database.update(copy.deepcopy(settings.DATABASE_PROFILES[name]))
+                    # A fresh file per profile: WAL mode, once set, stays with the file
+                    with benchmark_database(os.path.join(directory, f"{name}.sqlite3")):
+                        self.report(name, self.load(options))
+        finally:
+            database.clear()
+            database.update(original)
+
+    def load(self, options):
+        blocks = generate_blocks(options['users'], START_DATE, options['days'])
+        for _ in write_blocks(blocks):
+            pass
+        users = synthetic_user_ids(options['users'])
+
+        # Forked workers must not share the parent's connection
+        connections.close_all()
+        started = time.monotonic()
+        deadline = started + options['duration']
+        workers = [('read', worker) for worker in range(options['readers'])]
+        workers += [('write', worker) for worker in range(options['writers'])]
+        with ProcessPoolExecutor(max_workers=len(workers), mp_context=get_context('fork')) as executor:
+            futures = [
+                executor.submit(
+                    run_worker, role, worker, deadline, users, options['days'], options['batch_size']
+                )
+                for role, worker in workers
+            ]
+            results = [future.result() for future in futures]
+        return results, time.monotonic() - started
+
+    def report(self, name, load):
+        results, elapsed = load
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nProfile {name}"))
+        for role, unit in (('read', 'requests'), ('write', 'batches')):
+            latencies = [latency for result in results if result['role'] == role for latency in result['latencies']]
+            errors = sum(result['errors'] for result in results if result['role'] == role)
+            if not latencies:
+                continue
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            self.stdout.write(
+                f"  {role + 's':<7} {len(latencies) / elapsed:8.1f} {unit}/s  p50 {quantiles[49]:8.1f} ms"
+                f"  p95 {quantiles[94]:8.1f} ms  max {max(latencies):8.1f} ms  errors {errors}"
+            )
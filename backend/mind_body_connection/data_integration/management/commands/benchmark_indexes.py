@@ -0,0 +1,82 @@
+import math
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from data_integration.benchmarking import (
+    BENCHMARK_START_DATE,
+    benchmark_database,
+    benchmark_user_ids,
+    seed_time_series,
+    time_call,
+)
+from data_integration.models import HealthMetric, SleepData, JournalEntry
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the (user_id, date) time-series queries at several table sizes, with query plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000000,10000000',
+                            help='Comma separated row counts per table to benchmark at')
+        parser.add_argument('--users', type=int, default=1000, help='Number of synthetic users')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert while seeding')
+        parser.add_argument('--database-file', help='SQLite file for the benchmark database (default: in memory)')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers')
+
+        users = options['users']
+        user_id = benchmark_user_ids(users)[users // 2]
+
+        with benchmark_database(options['database_file']):
+            seeded_days = 0
+            for size in sizes:
+                days = math.ceil(size / users)
+                if days > seeded_days:
+                    self.stdout.write(f"Seeding {days * users:,} rows per table ({users} users x {days} days)...")
+                    seed_time_series(users, seeded_days, days, batch_size=options['batch_size'])
+                    seeded_days = days
+
+                last_day = BENCHMARK_START_DATE + timedelta(days=seeded_days - 1)
+                month_start = last_day - timedelta(days=29)
+                queries = {
+                    'user': {'user_id': user_id},
+                    'user_month': {'user_id': user_id, 'date__range': [month_start, last_day]},
+                    'all_users_day': {'date__range': [last_day, last_day]},
+                }
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{days * users:,} rows per table"))
+                for model in (HealthMetric, SleepData, JournalEntry):
+                    for label, filters in queries.items():
+                        self._benchmark_query(model, label, filters, options['repeat'])
+
+    def _benchmark_query(self, model, label, filters, repeat):
+        queryset = model.objects.filter(**filters)
+        rows = queryset.count()
+        timings = time_call(lambda: list(queryset.values_list()), repeat=repeat)
+
+        self.stdout.write(
+            f"{model.__name__:<13} {label:<14} rows={rows:<8} "
+            f"median={timings['median_ms']:.3f}ms min={timings['min_ms']:.3f}ms"
+        )
+        self.stdout.write(f"    plan: {queryset.explain()}")
+
+        if connection.vendor == 'sqlite':
+            # Same query with the indexes disabled, for a before/after comparison
+            sql, params = queryset.values_list().query.sql_with_params()
+            table = connection.ops.quote_name(model._meta.db_table)
+            unindexed_sql = sql.replace(f"FROM {table}", f"FROM {table} NOT INDEXED", 1)
+
+            def run_unindexed():
+                with connection.cursor() as cursor:
+                    cursor.execute(unindexed_sql, params)
+                    cursor.fetchall()
+
+            unindexed = time_call(run_unindexed, repeat=repeat)
+            self.stdout.write(f"    without indexes: median={unindexed['median_ms']:.3f}ms")
@@ -0,0 +1,55 @@
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data_integration.benchmarking import JOURNAL_SAMPLES
+from data_integration.sentiment import BatchSentimentScorer
+
+
+class Command(BaseCommand):
+    help = 'Measure journal sentiment scoring throughput as the number of worker processes grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=50000, help='Number of synthetic journal texts')
+        parser.add_argument('--workers', default=None,
+                            help='Comma separated worker counts (default: powers of two up to the CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Texts per worker task')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['workers']:
+            try:
+                worker_counts = [int(count) for count in options['workers'].split(',')]
+            except ValueError:
+                raise CommandError('--workers must be a comma separated list of integers')
+        else:
+            cpus = os.cpu_count() or 1
+            worker_counts = sorted({1, cpus} | {2 ** power for power in range(cpus.bit_length()) if 2 ** power <= cpus})
+
+        rng = random.Random(options['seed'])
+        texts = [
+            ' '.join(rng.sample(JOURNAL_SAMPLES, k=rng.randint(1, len(JOURNAL_SAMPLES))))
+            for _ in range(options['entries'])
+        ]
+
+        self.stdout.write(f"Scoring {len(texts):,} texts on {os.cpu_count()} CPUs")
+        baseline = None
+        reference = None
+        for workers in worker_counts:
+            with BatchSentimentScorer(workers=workers, chunk_size=options['chunk_size']) as scorer:
+                started = time.perf_counter()
+                scores = scorer.score(texts)
+                elapsed = time.perf_counter() - started
+
+            if reference is None:
+                reference = scores
+            elif scores != reference:
+                raise CommandError(f"Scores with {workers} workers differ from the single worker run")
+
+            throughput = len(texts) / elapsed
+            baseline = baseline or throughput
+            self.stdout.write(
+                f"workers={workers:<3} {elapsed:8.2f}s {throughput:12,.0f} texts/s  speedup x{throughput / baseline:.2f}"
+            )
@@ -0,0 +1,100 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from data_integration.benchmarking import benchmark_database, time_call
+from data_integration.insights_generator import HealthInsightsGenerator
+from data_integration.models import HealthMetric, SleepData, JournalEntry
+from data_integration.renderers import NumpyJSONRenderer
+from data_integration.serializers import (
+    HealthMetricSerializer,
+    SleepDataSerializer,
+    JournalEntrySerializer,
+    values_serializer,
+)
+from data_integration.synthetic import generate_blocks, write_blocks
+
+
+SERIALIZERS = {
+    'metrics': HealthMetricSerializer,
+    'sleep': SleepDataSerializer,
+    'journal': JournalEntrySerializer,
+}
+
+
+def round_trip(obj):
+    """
+    The json.dumps/json.loads pass the insights views made before rendering.
+    """
+    return json.loads(json.dumps(obj))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the ModelSerializers with the values_list fast path of the list views, and the insights '
+        'JSON round trip with the NumPy-aware renderer, checking that both produce identical bytes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Number of synthetic users')
+        parser.add_argument('--days', type=int, default=1000, help='Days of data per user')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per implementation')
+        parser.add_argument('--database-file', help='SQLite file for the benchmark database (default: in memory)')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['days'] < 1:
+            raise CommandError('--users and --days must be at least 1')
+
+        with benchmark_database(options['database_file']):
+            for _ in write_blocks(generate_blocks(options['users'], date(2024, 1, 1), options['days'])):
+                pass
+            self.stdout.write(f"{options['users']:,} users x {options['days']:,} days")
+            for dataset, serializer_class in SERIALIZERS.items():
+                self.compare_lists(dataset, serializer_class, options['repeat'])
+            self.compare_insights(options['repeat'])
+
+    def compare_lists(self, dataset, serializer_class, repeat):
+        model = serializer_class.Meta.model
+        serializer = values_serializer(serializer_class)
+        renderer = JSONRenderer()
+
+        # A fresh queryset per call, so that every run fetches the rows
+        def model_serializer():
+            return serializer_class(model.objects.all(), many=True).data
+
+        def fast_path():
+            return serializer.data(serializer.values_list(model.objects.all()))
+
+        if renderer.render(model_serializer()) != renderer.render(fast_path()):
+            raise CommandError(f"The fast path output differs from {serializer_class.__name__}")
+        self.report(f"list/{dataset}", time_call(model_serializer, repeat=repeat), time_call(fast_path, repeat=repeat))
+        self.report(
+            f"list/{dataset}+json",
+            time_call(lambda: renderer.render(model_serializer()), repeat=repeat),
+            time_call(lambda: renderer.render(fast_path()), repeat=repeat),
+        )
+
+    def compare_insights(self, repeat):
+        insights = HealthInsightsGenerator(
+            HealthMetric.objects.all(), SleepData.objects.all(), JournalEntry.objects.all()
+        ).generate_holistic_insights()
+        renderer = JSONRenderer()
+        numpy_renderer = NumpyJSONRenderer()
+
+        def with_round_trip():
+            return renderer.render(round_trip(insights))
+
+        def numpy_aware():
+            return numpy_renderer.render(insights)
+
+        if with_round_trip() != numpy_aware():
+            raise CommandError('The NumPy-aware renderer output differs from the JSON round trip')
+        self.report('insights', time_call(with_round_trip, repeat=repeat), time_call(numpy_aware, repeat=repeat))
+
+    def report(self, name, before, after):
+        self.stdout.write(
+            f"{name:<20} before {before['median_ms']:10.2f} ms  after {after['median_ms']:10.2f} ms"
+            f"  x{before['median_ms'] / after['median_ms']:.1f}"
+        )
@@ -0,0 +1,118 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from data_integration.benchmarking import benchmark_database
+from data_integration.synthetic import generate_blocks, synthetic_user_ids, write_blocks
+
+
+# Runs in a fresh interpreter per measurement, so nothing is imported yet
+PROBE = """
+import io, json, os, resource, sys, time
+from contextlib import redirect_stdout
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+started = time.perf_counter()
+import django
+from django.conf import settings
+settings.DATABASES['default']['NAME'] = os.environ['STARTUP_PROBE_DATABASE']
+django.setup()
+result = {'setup_s': time.perf_counter() - started}
+
+path = os.environ['STARTUP_PROBE_PATH']
+if path:
+    from django.test import Client
+    client = Client(SERVER_NAME='localhost')
+    started = time.perf_counter()
+    response = client.get(path)
+    result['request_s'] = time.perf_counter() - started
+    result['status'] = response.status_code
+else:
+    from django.core.management import call_command
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        call_command('check')
+    result['check_s'] = time.perf_counter() - started
+
+result['rss_mb'] = rss_mb()
+result['heavy_modules'] = sorted(name for name in %r if name in sys.modules)
+print(json.dumps(result))
+"""
+
+HEAVY_MODULES = ('numpy', 'pandas', 'scipy', 'sklearn', 'nltk', 'textblob')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure process startup: wall time, import time and peak RSS of `manage.py check` and of '
+        'serving the first /api/insights/ request, with and without ANALYTICS_WARMUP. '
+        'The request reads a synthetic user from a throwaway database generated for the run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per scenario')
+        parser.add_argument('--days', type=int, default=365, help='Days of data of the synthetic user')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            database_file = os.path.join(directory, 'startup.sqlite3')
+            with benchmark_database(database_file):
+                for _ in write_blocks(generate_blocks(1, date(2024, 1, 1), options['days'])):
+                    pass
+                self.run_scenarios(database_file, synthetic_user_ids(1)[0], options['repeat'])
+
+    def run_scenarios(self, database_file, user_id, repeat):
+        insights_path = f"/api/insights/?user_id={user_id}"
+
+        scenarios = {
+            'manage.py check': ('', False),
+            'first insights request': (insights_path, False),
+            'first insights request, warm-up': (insights_path, True),
+        }
+        self.stdout.write(f"{repeat} fresh processes per scenario, insights for user {user_id}")
+        for name, (path, warm_up) in scenarios.items():
+            runs = [self._probe(database_file, path, warm_up) for _ in range(repeat)]
+            self._report(name, runs)
+
+    def _probe(self, database_file, path, warm_up):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'mind_body_connection.settings'),
+            'ANALYTICS_WARMUP': '1' if warm_up else '0',
+            'STARTUP_PROBE_PATH': path,
+            'STARTUP_PROBE_DATABASE': database_file,
+        }
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE % (HEAVY_MODULES,)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall_s = time.perf_counter() - started
+        if completed.returncode:
+            raise CommandError(f"Startup probe failed:\n{completed.stderr}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['wall_s'] = wall_s
+        return result
+
+    def _report(self, name, runs):
+        def median_ms(key):
+            return statistics.median(run[key] for run in runs) * 1000
+
+        line = f"{name:<34} wall {median_ms('wall_s'):7.0f} ms  django.setup {median_ms('setup_s'):6.0f} ms"
+        if 'check_s' in runs[0]:
+            line += f"  check {median_ms('check_s'):6.0f} ms"
+        if 'request_s' in runs[0]:
+            line += f"  request {median_ms('request_s'):6.0f} ms (HTTP {runs[0]['status']})"
+        line += f"  peak RSS {statistics.median(run['rss_mb'] for run in runs):5.0f} MB"
+        self.stdout.write(line)
+        self.stdout.write(f"{'':<34} heavy modules loaded: {', '.join(runs[0]['heavy_modules']) or 'none'}")
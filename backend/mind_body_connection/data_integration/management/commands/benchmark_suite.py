@@ -0,0 +1,198 @@
+import json
+import math
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from data_integration.benchmarking import (
+    BENCHMARK_START_DATE,
+    JOURNAL_SAMPLES,
+    benchmark_database,
+    compare_results,
+    environment_info,
+    time_call,
+)
+from data_integration.insights_generator import HealthInsightsGenerator
+from data_integration.models import HealthMetric, SleepData, JournalEntry
+from data_integration.synthetic import generate_blocks, synthetic_user_ids, write_blocks
+
+
+LIST_ENDPOINTS = {
+    'metrics': '/api/metrics/',
+    'sleep': '/api/sleep/',
+    'journal': '/api/journal/',
+}
+
+AGENTS = {
+    'fitness': 'generate_fitness_insights',
+    'sleep': 'generate_sleep_insights',
+    'journal': 'analyze_journal_sentiments',
+    'holistic': 'generate_holistic_insights',
+}
+
+INGEST_USER_ID = 'bench-ingest'
+
+
+def ingest_records(dataset, batch_size):
+    """
+    A batch of records for one ingestion endpoint, one per day for INGEST_USER_ID.
+    """
+    records = []
+    for day in range(batch_size):
+        record = {'user_id': INGEST_USER_ID, 'date': (BENCHMARK_START_DATE + timedelta(days=day)).isoformat()}
+        if dataset == 'metrics':
+            record.update(steps=8000 + day % 500, heart_rate=70, sleep_hours=7.5, hrv=55)
+        elif dataset == 'sleep':
+            record.update(duration=7.5, disturbances=day % 4, sleep_quality=80.0)
+        else:
+            record.update(entry=JOURNAL_SAMPLES[day % len(JOURNAL_SAMPLES)])
+        records.append(record)
+    return records
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the list views, the insights agents and the ingestion endpoints on synthetic datasets of '
+        'several sizes, write the results as JSON, and optionally flag regressions against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--datasets', default='1000:1,100000:100,1000000:10000',
+                            help='Comma separated ROWS:USERS pairs; ROWS is rows per table')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark')
+        parser.add_argument('--ingest-batch', type=int, default=500, help='Records per ingestion request')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert while seeding')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic datasets')
+        parser.add_argument('--database-file', help='SQLite file for the benchmark database (default: in memory)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--input', help='Compare a saved results file instead of running the suite')
+        parser.add_argument('--compare', help='Baseline results file to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Slowdown over the baseline median reported as a regression (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if options['input']:
+            report = self._load(options['input'])
+        else:
+            report = self._run(options)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            baseline = self._load(options['compare'])
+            self._compare(baseline['results'], report['results'], options['threshold'])
+
+    def _load(self, path):
+        try:
+            with open(path) as saved:
+                return json.load(saved)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read benchmark results from {path}: {e}")
+
+    def _run(self, options):
+        try:
+            datasets = [tuple(int(part) for part in pair.split(':')) for pair in options['datasets'].split(',')]
+        except ValueError:
+            raise CommandError('--datasets must be a comma separated list of ROWS:USERS pairs')
+        if any(len(dataset) != 2 or min(dataset) < 1 for dataset in datasets):
+            raise CommandError('--datasets must be a comma separated list of ROWS:USERS pairs')
+
+        results = {}
+        with benchmark_database(options['database_file']):
+            for rows, users in datasets:
+                days = math.ceil(rows / users)
+                label = f"{days * users}rows-{users}users"
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"\nSeeding {days * users:,} rows per table ({users:,} users x {days:,} days)"
+                ))
+                self._clear()
+                blocks = generate_blocks(users, BENCHMARK_START_DATE, days, seed=options['seed'])
+                for _ in write_blocks(blocks, batch_size=options['batch_size'], rebuild=False):
+                    pass
+
+                user_id = synthetic_user_ids(users)[users // 2]
+                for name, func in self._benchmarks(user_id, days, options['ingest_batch']):
+                    results[f"{label}/{name}"] = timing = time_call(func, repeat=options['repeat'])
+                    self.stdout.write(f"  {name:<24} median {timing['median_ms']:10.2f} ms")
+
+        return {
+            'environment': environment_info(),
+            'options': {key: options[key] for key in ('datasets', 'repeat', 'ingest_batch', 'seed')},
+            'results': results,
+        }
+
+    def _clear(self):
+        # Raw deletes: a queryset delete would send post_delete for every row
+        with connection.cursor() as cursor:
+            for model in apps.get_app_config('data_integration').get_models():
+                cursor.execute(f'DELETE FROM "{model._meta.db_table}"')
+
+    def _benchmarks(self, user_id, days, ingest_batch):
+        client = Client(SERVER_NAME='localhost')
+
+        def get(path):
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} returned HTTP {response.status_code}")
+
+        def post(path, records):
+            response = client.post(path, records, content_type='application/json')
+            if response.status_code != 200:
+                raise CommandError(f"POST {path} returned HTTP {response.status_code}: {response.content[:200]}")
+
+        for dataset, path in LIST_ENDPOINTS.items():
+            yield f"list/{dataset}", lambda path=path: get(f"{path}?user_id={user_id}")
+            yield f"page/{dataset}", lambda path=path: get(f"{path}?page_size={settings.API_PAGE_SIZE}")
+            yield f"columnar/{dataset}", lambda path=path: get(f"{path}?user_id={user_id}&format=columnar")
+            yield f"msgpack/{dataset}", lambda path=path: get(f"{path}?user_id={user_id}&format=msgpack")
+
+        def generator():
+            return HealthInsightsGenerator(
+                HealthMetric.objects.filter(user_id=user_id),
+                SleepData.objects.filter(user_id=user_id),
+                JournalEntry.objects.filter(user_id=user_id),
+            )
+
+        for agent, method in AGENTS.items():
+            yield f"insights/{agent}", lambda method=method: getattr(generator(), method)()
+
+        # The whole history as an explicit date range, which skips the running
+        # insight state and snapshots; the cache is cleared so every run computes
+        last_day = BENCHMARK_START_DATE + timedelta(days=days - 1)
+        insights_path = f"/api/insights/?user_id={user_id}&start_date={BENCHMARK_START_DATE}&end_date={last_day}"
+
+        def insights_view():
+            caches[settings.INSIGHTS_CACHE_ALIAS].clear()
+            get(insights_path)
+
+        yield 'api/insights', insights_view
+
+        for dataset, path in LIST_ENDPOINTS.items():
+            records = ingest_records(dataset, ingest_batch)
+            yield f"ingest/{dataset}", lambda path=path, records=records: post(path, records)
+
+    def _compare(self, baseline, results, threshold):
+        comparisons = compare_results(baseline, results, threshold=threshold)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nCompared with baseline (threshold {threshold:.0%})"))
+        for comparison in comparisons:
+            line = (
+                f"  {comparison['name']:<48} {comparison['baseline_ms']:10.2f} ms -> "
+                f"{comparison['median_ms']:10.2f} ms  {comparison['change']:+7.1%}"
+            )
+            self.stdout.write(self.style.ERROR(line + '  REGRESSION') if comparison['regression'] else line)
+
+        for name in sorted(baseline.keys() ^ results.keys()):
+            self.stdout.write(f"  {name:<48} only in {'baseline' if name in baseline else 'results'}")
+
+        regressions = [comparison['name'] for comparison in comparisons if comparison['regression']]
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS('No regressions'))
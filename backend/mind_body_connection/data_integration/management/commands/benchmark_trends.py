@@ -0,0 +1,91 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from data_integration.benchmarking import time_call
+from data_integration.insights_generator import FITNESS_METRICS
+from data_integration.trends import fit_trends
+
+
+def first_vs_last(series):
+    """
+    The per-user loop fit_trends replaced: compare the first and last readings.
+    """
+    results = []
+    for values in series:
+        if len(values) > 1:
+            trend = 'increasing' if values[-1] > values[0] else 'decreasing'
+            results.append((trend, values[-1] * (1.1 if trend == 'increasing' else 0.9)))
+        elif len(values):
+            results.append(('stable', values[0]))
+        else:
+            results.append(('insufficient_data', None))
+    return results
+
+
+def per_series_least_squares(series, window):
+    """
+    The same fit as fit_trends, one np.polyfit call per series.
+    """
+    results = []
+    for values in series:
+        tail = values[-window:]
+        if len(tail) > 1:
+            slope, intercept = np.polyfit(np.arange(len(tail)), tail, 1)
+            results.append((slope, intercept + slope * len(tail)))
+        elif len(tail):
+            results.append((0.0, float(tail[0])))
+        else:
+            results.append((0.0, np.nan))
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Compare the vectorized fitness trend kernel with per-user loops on synthetic users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Number of synthetic users')
+        parser.add_argument('--days', type=int, default=365, help='Maximum readings per user and metric')
+        parser.add_argument('--window', type=int, default=None, help='Readings per fit (default: TREND_WINDOW)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per implementation')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        window = options['window'] or settings.TREND_WINDOW
+        if options['days'] < 1 or window < 2:
+            raise CommandError('--days must be at least 1 and --window at least 2')
+
+        # Ragged histories: every user tracked for a different number of days
+        rng = np.random.default_rng(options['seed'])
+        lengths = rng.integers(1, options['days'] + 1, size=options['users'])
+        series = [
+            rng.normal(100, 15, length) + rng.normal(0, 0.2) * np.arange(length)
+            for length in lengths
+            for _ in FITNESS_METRICS
+        ]
+        self.stdout.write(
+            f"{options['users']:,} users x {len(FITNESS_METRICS)} metrics, {int(lengths.sum()):,} readings"
+            f" per metric, window {window}"
+        )
+
+        kernel = fit_trends(series, window)
+        reference = per_series_least_squares(series, window)
+        if not np.allclose([fit.slope for fit in kernel], [slope for slope, _ in reference]) or not np.allclose(
+            [fit.forecast for fit in kernel], [forecast for _, forecast in reference]
+        ):
+            raise CommandError('Vectorized fits differ from per-series np.polyfit')
+
+        timings = {
+            'first vs last, per-user loop': time_call(lambda: first_vs_last(series), repeat=options['repeat']),
+            'least squares, per-user np.polyfit': time_call(
+                lambda: per_series_least_squares(series, window), repeat=options['repeat']
+            ),
+            'least squares, vectorized fit_trends': time_call(
+                lambda: fit_trends(series, window), repeat=options['repeat']
+            ),
+        }
+        baseline = timings['least squares, per-user np.polyfit']['median_ms']
+        for name, timing in timings.items():
+            self.stdout.write(
+                f"{name:<40} median {timing['median_ms']:10.2f} ms  x{baseline / timing['median_ms']:.1f} vs polyfit"
+            )
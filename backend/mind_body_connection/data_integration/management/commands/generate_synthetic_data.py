@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data_integration.models import HealthMetric, SleepData, JournalEntry
+from data_integration.synthetic import SYNTHETIC_FIELDS, generate_blocks, write_blocks
+
+
+# File names and fields written with --output-dir, in the formats load_mock_data reads
+OUTPUT_FILES = {
+    HealthMetric: ('health_metric_data.json', SYNTHETIC_FIELDS[HealthMetric]),
+    SleepData: ('sleep_data.json', SYNTHETIC_FIELDS[SleepData]),
+    JournalEntry: ('journal_data.json', ['user_id', 'date', 'entry']),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate realistic, correlated health metrics, sleep data and journal entries for many users, '
+        'straight into the database or into files load_mock_data can read. Deterministic for a given seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users')
+        parser.add_argument('--days', type=int, default=365, help='Days of data per user')
+        parser.add_argument('--start-date', type=date.fromisoformat, default=date(2024, 1, 1),
+                            help='First day, YYYY-MM-DD')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--prefix', default='synthetic', help='Prefix of the generated user ids')
+        parser.add_argument('--sentiment', type=float, default=0.0,
+                            help='Journal mood shift, from -1 (mostly negative) to 1 (mostly positive)')
+        parser.add_argument('--journal-rate', type=float, default=1.0,
+                            help='Probability of a journal entry per user and day')
+        parser.add_argument('--output-dir',
+                            help='Write JSON files to this directory instead of the database')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per executemany call')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Skip rebuilding rollups and insight states for the new users')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['days'] < 1:
+            raise CommandError('--users and --days must be at least 1')
+        if not -1 <= options['sentiment'] <= 1 or not 0 <= options['journal_rate'] <= 1:
+            raise CommandError('--sentiment must be within [-1, 1] and --journal-rate within [0, 1]')
+
+        blocks = generate_blocks(
+            options['users'],
+            options['start_date'],
+            options['days'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            sentiment=options['sentiment'],
+            journal_rate=options['journal_rate'],
+        )
+
+        self.started = time.perf_counter()
+        self.written = 0
+        if options['output_dir']:
+            self.write_files(blocks, options['output_dir'])
+        else:
+            self.write_database(blocks, options['batch_size'], rebuild=not options['no_rebuild'])
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {self.written:,} rows for {options['users']:,} users in {elapsed:.1f}s"
+            f" ({self.written / elapsed if elapsed else 0:,.0f} rows/s)"
+        ))
+
+    def write_database(self, blocks, batch_size, rebuild):
+        for user_ids, written in write_blocks(blocks, batch_size=batch_size, rebuild=rebuild):
+            self.written += written
+            self.report(user_ids)
+
+    def write_files(self, blocks, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        files = {
+            model: open(os.path.join(output_dir, name), 'w')
+            for model, (name, _) in OUTPUT_FILES.items()
+        }
+        try:
+            # Health metrics carry the user id on every record under a "metrics" key
+            files[HealthMetric].write('{"metrics": [')
+            for output in (files[SleepData], files[JournalEntry]):
+                output.write('[')
+
+            started = set()
+            for user_ids, rows in blocks:
+                for model, model_rows in rows.items():
+                    fields = OUTPUT_FILES[model][1]
+                    chunk = ',\n'.join(json.dumps(dict(zip(fields, row))) for row in model_rows)
+                    if chunk:
+                        files[model].write((',\n' if model in started else '\n') + chunk)
+                        started.add(model)
+                    self.written += len(model_rows)
+                self.report(user_ids)
+
+            files[HealthMetric].write('\n]}\n')
+            for output in (files[SleepData], files[JournalEntry]):
+                output.write('\n]\n')
+        finally:
+            for output in files.values():
+                output.close()
+
+    def report(self, user_ids):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f"Up to {user_ids[-1]}: {self.written:,} rows ({self.written / elapsed if elapsed else 0:,.0f} rows/s)"
+        )
@@ -1,53 +1,168 @@
 import json
+import time
+from itertools import islice
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from data_integration.ingestion import upsert_rows
+from data_integration.insight_state import rebuild_insight_states
+from data_integration.json_stream import JSONStreamReader
 from data_integration.models import HealthMetric, SleepData, JournalEntry
+from data_integration.rollups import rebuild_rollups
+from data_integration.sentiment import BatchSentimentScorer
+from data_integration.versions import bump_data_versions
+
+HEALTH_METRIC_FIELDS = ['user_id', 'date', 'steps', 'heart_rate', 'sleep_hours', 'hrv']
+SLEEP_DATA_FIELDS = ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality']
+JOURNAL_ENTRY_FIELDS = [
+    'user_id', 'date', 'entry', 'content_hash', 'polarity', 'subjectivity', 'emotional_keywords'
+]
 
 class Command(BaseCommand):
     help = 'Load mock data for Health Metrics, Sleep, and Journaling into the database'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--health-file', default='health_metric_data.json',
+                            help='Health metrics file: {"user_id": ..., "metrics": [...]}')
+        parser.add_argument('--sleep-file', default='sleep_data.json', help='Sleep data file: a list of records')
+        parser.add_argument('--journal-file', default='journal_data.json', help='Journal file: a list of records')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows inserted per bulk insert and transaction')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Journal sentiment scoring processes (default: SENTIMENT_WORKERS, or one per CPU)')
+        parser.add_argument('--progress-every', type=int, default=100000,
+                            help='Report progress after this many rows')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.progress_every = options['progress_every']
+        self.user_ids = set()
+
         try:
             # Load Health Metrics Data
-            with open('health_metric_data.json') as health_file:
-                health_data = json.load(health_file)
-                for metric in health_data['metrics']:
-                    HealthMetric.objects.create(
-                        user_id=health_data['user_id'],
-                        date=metric['date'],
-                        steps=metric['steps'],
-                        heart_rate=metric['heart_rate'],
-                        sleep_hours=metric['sleep_hours'],
-                        hrv=metric['hrv']
+            with open(options['health_file']) as health_file:
+                header = {}
+                records = JSONStreamReader(health_file).iter_array(key='metrics', header=header)
+                metrics = (
+                    (
+                        metric.get('user_id', header.get('user_id')),
+                        metric['date'],
+                        metric['steps'],
+                        metric['heart_rate'],
+                        metric['sleep_hours'],
+                        metric['hrv']
                     )
+                    for metric in records
+                )
+                self.load(HealthMetric, HEALTH_METRIC_FIELDS, metrics, 'Health Metrics')
             self.stdout.write(self.style.SUCCESS('Loaded Health Metrics Data'))
 
             # Load Sleep Data
-            with open('sleep_data.json') as sleep_file:
-                sleep_data = json.load(sleep_file)
-                for record in sleep_data:
-                    SleepData.objects.create(
-                        user_id=record['user_id'],
-                        date=record['date'],
-                        duration=record['duration'],
-                        disturbances=record['disturbances'],
-                        sleep_quality=record['sleep_quality']
+            with open(options['sleep_file']) as sleep_file:
+                records = JSONStreamReader(sleep_file).iter_array()
+                sleep_data = (
+                    (
+                        record['user_id'],
+                        record['date'],
+                        record['duration'],
+                        record['disturbances'],
+                        record['sleep_quality']
                     )
+                    for record in records
+                )
+                self.load(SleepData, SLEEP_DATA_FIELDS, sleep_data, 'Sleep')
             self.stdout.write(self.style.SUCCESS('Loaded Sleep Data'))
 
             # Load Journal Data
-            with open('journal_data.json') as journal_file:
-                journal_data = json.load(journal_file)
-                for record in journal_data:
-                    JournalEntry.objects.create(
-                        user_id=record['user_id'],
-                        date=record['date'],
-                        entry=record['entry']
+            with open(options['journal_file']) as journal_file:
+                records = JSONStreamReader(journal_file).iter_array()
+                journal_entries = (
+                    (
+                        record['user_id'],
+                        record['date'],
+                        record['entry']
                     )
+                    for record in records
+                )
+                with BatchSentimentScorer(workers=options['workers']) as scorer:
+                    scored_entries = self.score_journal_rows(journal_entries, scorer)
+                    self.load(JournalEntry, JOURNAL_ENTRY_FIELDS, scored_entries, 'Journal')
             self.stdout.write(self.style.SUCCESS('Loaded Journal Data'))
 
         except FileNotFoundError as e:
             self.stderr.write(self.style.ERROR(f"File not found: {e.filename}"))
         except json.JSONDecodeError as e:
             self.stderr.write(self.style.ERROR(f"JSON decode error: {str(e)}"))
+        except KeyError as e:
+            self.stderr.write(self.style.ERROR(f"Record is missing field: {e}"))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"An unexpected error occurred: {str(e)}"))
+
+        # Whatever was loaded, even before an error, gets its derived data
+        if self.user_ids:
+            self.refresh_derived_data()
+
+    def score_journal_rows(self, rows, scorer):
+        """
+        Add sentiment scores to (user_id, date, entry) rows, as JournalEntry.save() would
+        """
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            scores = scorer.score(entry for _, _, entry in batch)
+            for (user_id, date, entry), score in zip(batch, scores):
+                yield (
+                    user_id,
+                    date,
+                    entry,
+                    score.content_hash,
+                    score.polarity,
+                    score.subjectivity,
+                    json.dumps(score.emotional_keywords)
+                )
+
+    def load(self, model, fields, rows, label):
+        """
+        Upsert a stream of row tuples in batches, one transaction per batch.
+
+        Rows go in without data_changed; refresh_derived_data brings the
+        loaded users up to date once every file is in.
+        """
+        started = time.perf_counter()
+        loaded = reported = 0
+        user_position = fields.index('user_id')
+
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                upsert_rows(model, fields, batch, batch_size=self.batch_size, notify=False)
+            self.user_ids.update(row[user_position] for row in batch)
+            loaded += len(batch)
+            if loaded - reported >= self.progress_every:
+                self.report(label, loaded, started)
+                reported = loaded
+
+        if loaded != reported or not loaded:
+            self.report(label, loaded, started)
+
+    def refresh_derived_data(self):
+        """
+        Rebuild the rollups and insight states of the loaded users, and move
+        their data versions on, which retires their cached insights.
+        """
+        started = time.perf_counter()
+        user_ids = sorted(self.user_ids)
+        rebuild_rollups(user_ids=user_ids)
+        rebuild_insight_states(user_ids=user_ids)
+        with transaction.atomic():
+            bump_data_versions(user_ids)
+        self.stdout.write(
+            f"Rebuilt rollups and insight states of {len(user_ids):,} users in {time.perf_counter() - started:.1f}s"
+        )
+
+    def report(self, label, loaded, started):
+        elapsed = time.perf_counter() - started
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(f"{label}: {loaded:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
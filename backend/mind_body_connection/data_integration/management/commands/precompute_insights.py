@@ -0,0 +1,80 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from data_integration.precompute import compute_chunk, pending_user_ids, prepare_chunk, save_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute holistic insights for every user into the snapshot table served by /api/insights/. '
+        'Users whose snapshot is still newer than their data are skipped, so an interrupted run resumes '
+        'where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU)')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Users loaded together and sent to a worker as one task')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompute every user, including those with a fresh snapshot')
+        parser.add_argument('--user', action='append', dest='users', default=None,
+                            help='Only precompute this user id (may be repeated)')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or os.cpu_count() or 1
+        chunk_size = options['chunk_size']
+
+        user_ids = options['users'] or pending_user_ids(force=options['force'])
+        chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+        self.stdout.write(f"Precomputing insights for {len(user_ids):,} users with {workers} workers")
+
+        self.started = time.perf_counter()
+        self.done = self.failed = 0
+
+        if workers <= 1:
+            for chunk in chunks:
+                data_as_of, rows = prepare_chunk(chunk)
+                self.save(data_as_of, compute_chunk(rows))
+        else:
+            # Keep a bounded number of chunks in flight: the main process reads
+            # the next chunks while the workers compute the current ones.
+            # Workers set Django up themselves: spawn and forkserver workers (the
+            # default on macOS and Windows, and on Linux from Python 3.14) do
+            # not inherit it from this process.
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                in_flight = deque()
+                for chunk in chunks:
+                    data_as_of, rows = prepare_chunk(chunk)
+                    in_flight.append((data_as_of, pool.submit(compute_chunk, rows)))
+                    if len(in_flight) >= workers * 2:
+                        data_as_of, future = in_flight.popleft()
+                        self.save(data_as_of, future.result())
+                while in_flight:
+                    data_as_of, future = in_flight.popleft()
+                    self.save(data_as_of, future.result())
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Precomputed insights for {self.done - self.failed:,} users in {elapsed:.2f}s"
+            f" ({self.done / elapsed if elapsed else 0:,.0f} users/s), {self.failed:,} failed"
+        ))
+
+    def save(self, data_as_of, results):
+        with transaction.atomic():
+            save_snapshots(data_as_of, results)
+
+        for user_id, _, error in results:
+            if error:
+                self.failed += 1
+                self.stderr.write(f"{user_id}: {error}")
+        self.done += len(results)
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f"Processed {self.done:,} users ({self.done / elapsed:,.0f} users/s)")
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from data_integration.insight_state import rebuild_insight_states
+from data_integration.sentiment import BatchSentimentScorer
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user running insight state from the health, sleep and journal tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', default=None,
+                            help='Only rebuild the state of this user id (may be repeated)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users rebuilt and written per transaction')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes scoring journal entries stored without sentiment '
+                                 '(default: SENTIMENT_WORKERS, or one per CPU)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with BatchSentimentScorer(workers=options['workers']) as scorer:
+            written = rebuild_insight_states(
+                user_ids=options['users'], batch_size=options['batch_size'], scorer=scorer
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt insight state for {written:,} users in {elapsed:.2f}s"))
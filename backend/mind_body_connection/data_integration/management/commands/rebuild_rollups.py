@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from data_integration.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild weekly and monthly metric rollups from the health metric and sleep tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', default=None,
+                            help='Only rebuild rollups for this user id (may be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rollup rows written per INSERT statement')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_rollups(user_ids=options['users'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written:,} rollup rows in {elapsed:.2f}s"))
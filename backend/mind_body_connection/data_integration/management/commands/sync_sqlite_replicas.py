@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary database into each SQLite replica of DATABASE_REPLICAS, '
+        'standing in for replication when running replicas locally'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica aliases to refresh (default: all SQLite replicas)')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep copying every this many seconds, like a lagging replica')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('The primary database is not SQLite')
+        aliases = options['aliases'] or [
+            alias for alias in settings.DATABASE_REPLICAS if connections[alias].vendor == 'sqlite'
+        ]
+        unknown = [alias for alias in aliases if alias not in settings.DATABASE_REPLICAS]
+        if unknown:
+            raise CommandError(f"Not in DATABASE_REPLICAS: {', '.join(unknown)}")
+        if not aliases:
+            raise CommandError('No SQLite replicas configured; set DATABASE_REPLICAS')
+
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            for alias in aliases:
+                replica = connections[alias]
+                replica.ensure_connection()
+                # The backup API copies a consistent snapshot, even while the primary takes writes
+                primary.connection.backup(replica.connection)
+                replica.close()
+            self.stdout.write(
+                f"Copied {primary.settings_dict['NAME']} to {', '.join(aliases)} "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
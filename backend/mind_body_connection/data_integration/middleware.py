@@ -0,0 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import telemetry
+
+
+class TelemetryMiddleware:
+    """
+    Record per-request performance: query count and SQL time, time per
+    insights agent, sentiment scoring and serialization, and optionally peak
+    allocations. Each response carries them in a Server-Timing header, and
+    they are aggregated into histograms served by /api/telemetry/.
+
+    Only installed when TELEMETRY_ENABLED is set. Otherwise Django drops the
+    middleware at startup, and the phase hooks in the views cost one context
+    variable lookup. Runs natively under both WSGI and ASGI, so async views
+    are not pushed into a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TELEMETRY_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        telemetry.count_queries()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with telemetry.record_request(trace_allocations=settings.TELEMETRY_TRACE_ALLOCATIONS) as recorder:
+            response = self.get_response(request)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        with telemetry.record_request(trace_allocations=settings.TELEMETRY_TRACE_ALLOCATIONS) as recorder:
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder):
+        # The URL pattern rather than the path, so ids in paths do not explode the label set
+        match = request.resolver_match
+        route = match.route if match else 'unresolved'
+        telemetry.observe_request(recorder, route, request.method, response.status_code)
+        response['Server-Timing'] = recorder.server_timing()
+        return response
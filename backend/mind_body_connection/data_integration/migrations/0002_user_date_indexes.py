@@ -0,0 +1,110 @@
+# Generated by Django 5.1.3 on 2026-10-18 02:48
+#
+# The unique (user_id, date) constraints are added as plain unique indexes
+# instead of Django's default AddConstraint, which on SQLite rebuilds the whole
+# table (copying every row) and on PostgreSQL takes a long exclusive lock.
+# Existing duplicate rows are collapsed first, keeping the most recent insert
+# for each user and day.
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+TIME_SERIES_MODELS = [
+    ('healthmetric', 'unique_health_metric_user_date'),
+    ('sleepdata', 'unique_sleep_data_user_date'),
+    ('journalentry', 'unique_journal_entry_user_date'),
+]
+
+
+def remove_duplicate_days(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    for model_name, _ in TIME_SERIES_MODELS:
+        model = apps.get_model('data_integration', model_name)
+        latest_ids = (
+            model.objects.using(db_alias)
+            .values('user_id', 'date')
+            .annotate(latest_id=Max('id'))
+            .values('latest_id')
+        )
+        model.objects.using(db_alias).exclude(id__in=latest_ids).delete()
+
+
+def create_unique_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    for model_name, constraint_name in TIME_SERIES_MODELS:
+        table = apps.get_model('data_integration', model_name)._meta.db_table
+        if connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {quote(constraint_name)} "
+                f"ON {quote(table)} ({quote('user_id')}, {quote('date')})"
+            )
+            schema_editor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(constraint_name)} "
+                f"UNIQUE USING INDEX {quote(constraint_name)}"
+            )
+        else:
+            schema_editor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {quote(constraint_name)} "
+                f"ON {quote(table)} ({quote('user_id')}, {quote('date')})"
+            )
+
+
+def drop_unique_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    for model_name, constraint_name in TIME_SERIES_MODELS:
+        table = apps.get_model('data_integration', model_name)._meta.db_table
+        if connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f"ALTER TABLE {quote(table)} DROP CONSTRAINT IF EXISTS {quote(constraint_name)}"
+            )
+        else:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {quote(constraint_name)}")
+
+
+class Migration(migrations.Migration):
+
+    # Each index build commits on its own so large tables are not held in a
+    # single transaction (and PostgreSQL can build the indexes concurrently).
+    atomic = False
+
+    dependencies = [
+        ('data_integration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthmetric',
+            index=models.Index(fields=['date'], name='health_metric_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['date'], name='journal_entry_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sleepdata',
+            index=models.Index(fields=['date'], name='sleep_data_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_days, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_unique_indexes, drop_unique_indexes),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='healthmetric',
+                    constraint=models.UniqueConstraint(fields=('user_id', 'date'), name='unique_health_metric_user_date'),
+                ),
+                migrations.AddConstraint(
+                    model_name='journalentry',
+                    constraint=models.UniqueConstraint(fields=('user_id', 'date'), name='unique_journal_entry_user_date'),
+                ),
+                migrations.AddConstraint(
+                    model_name='sleepdata',
+                    constraint=models.UniqueConstraint(fields=('user_id', 'date'), name='unique_sleep_data_user_date'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0002_user_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='emotional_keywords',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='polarity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='subjectivity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
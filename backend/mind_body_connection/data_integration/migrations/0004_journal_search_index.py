@@ -0,0 +1,76 @@
+# Full-text search index over journal entries.
+#
+# On SQLite this is an FTS5 external-content table: it stores only the index,
+# reading entry text from data_integration_journalentry, and triggers keep it in
+# sync with every insert, upsert, update and delete (including bulk writes that
+# bypass model signals). Other databases skip it, and journal search is not
+# available there. The table names and the insert trigger, which
+# deferred_search_index recreates, are defined in data_integration.search.
+
+from django.db import migrations
+
+from data_integration.search import (
+    JOURNAL_FTS_INSERT_TRIGGER as INSERT_TRIGGER_SQL,
+    JOURNAL_FTS_INSERT_TRIGGER_NAME as INSERT_TRIGGER_NAME,
+    JOURNAL_FTS_TABLE as FTS_TABLE,
+    JOURNAL_TABLE as CONTENT_TABLE,
+)
+
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        entry,
+        content='{CONTENT_TABLE}',
+        content_rowid='id',
+        tokenize='unicode61',
+        prefix='2 3'
+    )
+    """,
+    INSERT_TRIGGER_SQL,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, entry) VALUES ('delete', old.id, old.entry);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF entry ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, entry) VALUES ('delete', old.id, old.entry);
+        INSERT INTO {FTS_TABLE}(rowid, entry) VALUES (new.id, new.entry);
+    END
+    """,
+    # Index the entries that already exist
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {INSERT_TRIGGER_NAME}",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0003_journal_sentiment_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0004_journal_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=50)),
+                ('period', models.CharField(choices=[('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField(help_text='Monday of the week, or first day of the month')),
+                ('metric', models.CharField(max_length=30)),
+                ('count', models.IntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('sum_squares', models.FloatField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user_id', 'period', 'metric', 'period_start'), name='unique_metric_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0005_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=50, unique=True)),
+                ('health_count', models.IntegerField(default=0)),
+                ('health_first_date', models.DateField(blank=True, null=True)),
+                ('health_last_date', models.DateField(blank=True, null=True)),
+                ('health_first', models.JSONField(default=dict)),
+                ('health_last', models.JSONField(default=dict)),
+                ('sleep_count', models.IntegerField(default=0)),
+                ('sleep_last_date', models.DateField(blank=True, null=True)),
+                ('duration_sum', models.FloatField(default=0.0)),
+                ('sleep_quality_sum', models.FloatField(default=0.0)),
+                ('journal_count', models.IntegerField(default=0)),
+                ('journal_last_date', models.DateField(blank=True, null=True)),
+                ('polarity_sum', models.FloatField(default=0.0)),
+                ('positive_count', models.IntegerField(default=0)),
+                ('negative_count', models.IntegerField(default=0)),
+                ('keyword_counts', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0006_insight_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=50, unique=True)),
+                ('insights', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('data_as_of', models.DateTimeField(help_text='When the data the insights were computed from was read')),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def clear_insight_states(apps, schema_editor):
+    # States and snapshots hold first/last-reading trends; both are rebuilt on
+    # demand (or by rebuild_insight_state / precompute_insights) with the new ones
+    apps.get_model('data_integration', 'InsightState').objects.all().delete()
+    apps.get_model('data_integration', 'InsightSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0007_insight_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_insight_states, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='insightstate',
+            name='health_first',
+        ),
+        migrations.RemoveField(
+            model_name='insightstate',
+            name='health_first_date',
+        ),
+        migrations.RemoveField(
+            model_name='insightstate',
+            name='health_last',
+        ),
+        migrations.AddField(
+            model_name='insightstate',
+            name='health_window',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+def clear_insight_states(apps, schema_editor):
+    # Running float sums cannot be made exact after the fact, and snapshots
+    # hold means of the old summation; both are rebuilt on demand (or by
+    # rebuild_insight_state / precompute_insights)
+    apps.get_model('data_integration', 'InsightState').objects.all().delete()
+    apps.get_model('data_integration', 'InsightSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_integration', '0009_data_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_insight_states, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='insightstate',
+            name='duration_sum',
+        ),
+        migrations.RemoveField(
+            model_name='insightstate',
+            name='polarity_sum',
+        ),
+        migrations.RemoveField(
+            model_name='insightstate',
+            name='sleep_quality_sum',
+        ),
+        migrations.AddField(
+            model_name='insightstate',
+            name='duration_partials',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='insightstate',
+            name='polarity_partials',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='insightstate',
+            name='sleep_quality_partials',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
 
+from .sentiment import content_hash, score_text
+
+SENTIMENT_FIELDS = ['content_hash', 'polarity', 'subjectivity', 'emotional_keywords']
+
 class HealthMetric(models.Model):
     user_id = models.CharField(max_length=50)
     date = models.DateField()
@@ -8,6 +12,14 @@ class HealthMetric(models.Model):
     sleep_hours = models.FloatField()
     hrv = models.IntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'date'], name='unique_health_metric_user_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='health_metric_date_idx'),
+        ]
+
     def __str__(self):
         return f"Metrics for {self.user_id} on {self.date}"
 
@@ -18,6 +30,14 @@ class SleepData(models.Model):
     disturbances = models.IntegerField(help_text="Number of disturbances during sleep")
     sleep_quality = models.FloatField(default=0.0, help_text="Quality of sleep on a scale of 0-100")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'date'], name='unique_sleep_data_user_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='sleep_data_date_idx'),
+        ]
+
     def __str__(self):
         return f"Sleep data for {self.user_id} on {self.date}"
 
@@ -25,6 +45,166 @@ class JournalEntry(models.Model):
     user_id = models.CharField(max_length=50)
     date = models.DateField()
     entry = models.TextField()
+    # Sentiment scores computed when the entry is written; null until scored.
+    # content_hash identifies the text the scores belong to.
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    polarity = models.FloatField(null=True, blank=True)
+    subjectivity = models.FloatField(null=True, blank=True)
+    emotional_keywords = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'date'], name='unique_journal_entry_user_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='journal_entry_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Journal entry for {self.user_id} on {self.date}"
+
+    def has_current_sentiment(self):
+        """
+        Whether the stored sentiment scores belong to the current text.
+        """
+        return (
+            self.polarity is not None
+            and self.emotional_keywords is not None
+            and self.content_hash == content_hash(self.entry)
+        )
+
+    def apply_sentiment(self, score):
+        """
+        Store a SentimentScore computed for this entry's text.
+        """
+        self.content_hash = score.content_hash
+        self.polarity = score.polarity
+        self.subjectivity = score.subjectivity
+        self.emotional_keywords = score.emotional_keywords
+
+    def score_sentiment(self, force=False):
+        """
+        Compute and store sentiment scores unless they are already current for this text.
+
+        :param force: Rescore even when the stored content hash matches
+        :return: True if the scores were (re)computed
+        """
+        if not force and self.has_current_sentiment():
+            return False
+
+        self.apply_sentiment(score_text(self.entry))
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.score_sentiment() and update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(SENTIMENT_FIELDS)
+        super().save(*args, **kwargs)
+
+
+class MetricRollup(models.Model):
+    """
+    Per-user aggregate of one HealthMetric/SleepData field over a week or month.
+
+    Maintained incrementally as rows are written (see rollups.refresh_rollups).
+    Daily figures are not stored: the source tables already hold one row per
+    user per day.
+    """
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    PERIOD_CHOICES = [
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+    ]
+
+    user_id = models.CharField(max_length=50)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField(help_text="Monday of the week, or first day of the month")
+    metric = models.CharField(max_length=30)
+    count = models.IntegerField()
+    sum = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+    sum_squares = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_id', 'period', 'metric', 'period_start'],
+                name='unique_metric_rollup_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period.capitalize()} {self.metric} for {self.user_id} from {self.period_start}"
+
+
+class InsightState(models.Model):
+    """
+    Running aggregates behind a user's full-history insights.
+
+    Updated as HealthMetric, SleepData and JournalEntry rows arrive (see
+    insight_state.update_insight_state), so full-history insights can be
+    produced without reading the user's rows.
+    """
+    user_id = models.CharField(max_length=50, unique=True)
+
+    health_count = models.IntegerField(default=0)
+    health_last_date = models.DateField(null=True, blank=True)
+    # Metric name -> its last TREND_WINDOW readings, oldest first
+    health_window = models.JSONField(default=dict)
+
+    # Sums are kept exactly, as non-overlapping float partials whose
+    # math.fsum is the correctly rounded total, so the means match the batch
+    # computation to the last bit
+    sleep_count = models.IntegerField(default=0)
+    sleep_last_date = models.DateField(null=True, blank=True)
+    duration_partials = models.JSONField(default=list)
+    sleep_quality_partials = models.JSONField(default=list)
+
+    journal_count = models.IntegerField(default=0)
+    journal_last_date = models.DateField(null=True, blank=True)
+    polarity_partials = models.JSONField(default=list)
+    positive_count = models.IntegerField(default=0)
+    negative_count = models.IntegerField(default=0)
+    # [keyword, count] pairs in order of first appearance
+    keyword_counts = models.JSONField(default=list)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Insight state for {self.user_id}"
+
+
+class InsightSnapshot(models.Model):
+    """
+    Holistic insights precomputed for a user by the precompute_insights command.
+
+    A snapshot is only served while it is newer than the user's data, i.e. while
+    data_as_of is not earlier than InsightState.updated_at.
+    """
+    user_id = models.CharField(max_length=50, unique=True)
+    insights = models.JSONField(null=True, blank=True)
+    # Set instead of insights when computing them failed
+    error = models.TextField(null=True, blank=True)
+    data_as_of = models.DateTimeField(help_text="When the data the insights were computed from was read")
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Insight snapshot for {self.user_id} as of {self.data_as_of}"
+
+
+class DataVersion(models.Model):
+    """
+    Version of a user's HealthMetric, SleepData and JournalEntry rows.
+
+    Bumped with every write or delete (see versions.bump_data_versions), so
+    responses built from the data can be validated with one indexed lookup.
+    The row with user_id '*' versions the data of all users together.
+    """
+    user_id = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
 
     def __str__(self):
-        return f"Journal entry for {self.user_id} on {self.date}"
\ No newline at end of file
+        return f"Data version {self.version} for {self.user_id}"
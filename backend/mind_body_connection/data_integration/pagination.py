@@ -0,0 +1,127 @@
+import base64
+import json
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the time-series models, ordered by (date, id).
+
+    Each page is fetched with a `WHERE (date, id) > (last_date, last_id)` seek
+    instead of an OFFSET, so it costs the same at any depth and rides the
+    (user_id, date) index. Pagination is opt-in: it only applies when the
+    request carries a `cursor` or `page_size` parameter, so existing clients
+    keep receiving a plain list.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('date', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+        self.next_position = None
+        self.request = None
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of the queryset, or None when pagination was not requested.
+        """
+        return self.paginate(queryset, request, lambda last: (last.date, last.id))
+
+    def paginate_values_list(self, queryset, request, fields):
+        """
+        Return one page of the queryset as tuples of `fields`, which must
+        include date and id, or None when pagination was not requested.
+        """
+        date_index, id_index = fields.index('date'), fields.index('id')
+        return self.paginate(
+            queryset.values_list(*fields), request, lambda last: (last[date_index], last[id_index])
+        )
+
+    def paginate(self, queryset, request, position_of):
+        """
+        :param position_of: Function returning the (date, id) of a page row
+        """
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            last_date, last_id = position
+            queryset = queryset.filter(date__gte=last_date).filter(
+                Q(date__gt=last_date) | Q(id__gt=last_id)
+            )
+
+        page = list(queryset[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = position_of(page[-1])
+        return page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            last_date, last_id = json.loads(base64.urlsafe_b64decode(padded))
+            return date.fromisoformat(last_date), int(last_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        last_date, last_id = position
+        payload = json.dumps([last_date.isoformat(), last_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
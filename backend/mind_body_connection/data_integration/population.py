@@ -0,0 +1,198 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Avg, Sum
+
+from .models import HealthMetric, SleepData, MetricRollup
+from .rollups import period_end
+
+
+# Metrics compared across the population, by source model
+POPULATION_METRICS = {
+    HealthMetric: ('steps', 'heart_rate', 'hrv', 'sleep_hours'),
+    SleepData: ('duration', 'sleep_quality'),
+}
+
+METRIC_MODELS = {
+    metric: model
+    for model, metrics in POPULATION_METRICS.items()
+    for metric in metrics
+}
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+def _filter_window(queryset, start_date=None, end_date=None):
+    if start_date and end_date:
+        return queryset.filter(date__range=[start_date, end_date])
+    return queryset
+
+
+def load_population(start_date=None, end_date=None):
+    """
+    Every user's mean of each metric over a date window, sorted per metric.
+
+    Windows made of whole calendar months (or no window at all) merge the
+    monthly MetricRollup sums and counts, a few rows per user; other windows
+    are averaged by the database in one grouped query per model over the
+    daily rows. The result is cached for POPULATION_CACHE_TIMEOUT seconds,
+    since the population moves slowly compared to the rate of requests.
+
+    :return: Dictionary of metric name to a sorted NumPy array of per-user means
+    """
+    cache = caches[settings.POPULATION_CACHE_ALIAS]
+    key = f"population:{start_date or ''}:{end_date or ''}"
+    population = cache.get(key)
+    if population is not None:
+        return population
+
+    if _whole_months(start_date, end_date):
+        population = _means_from_rollups(start_date, end_date)
+    else:
+        population = _means_from_rows(start_date, end_date)
+
+    cache.set(key, population, timeout=settings.POPULATION_CACHE_TIMEOUT)
+    return population
+
+
+def _whole_months(start_date, end_date):
+    if not (start_date and end_date):
+        return True
+    return (
+        start_date.day == 1
+        and start_date <= end_date
+        and end_date == period_end(MetricRollup.MONTHLY, end_date.replace(day=1))
+    )
+
+
+def _monthly_rollups(start_date=None, end_date=None):
+    rollups = MetricRollup.objects.filter(period=MetricRollup.MONTHLY, metric__in=list(METRIC_MODELS))
+    if start_date and end_date:
+        rollups = rollups.filter(period_start__range=[start_date, end_date])
+    return rollups
+
+
+def _means_from_rollups(start_date=None, end_date=None):
+    """
+    Per-user means merged from monthly rollups.
+    """
+    rows = list(
+        _monthly_rollups(start_date, end_date)
+        .values('user_id', 'metric')
+        .annotate(total=Sum('sum'), count=Sum('count'))
+        .order_by()
+        .values_list('metric', 'total', 'count')
+    )
+
+    population = {}
+    names = np.array([metric for metric, _, _ in rows], dtype=object)
+    totals = np.array([total for _, total, _ in rows], dtype=float)
+    counts = np.array([count for _, _, count in rows], dtype=float)
+    for metric in METRIC_MODELS:
+        selected = names == metric
+        population[metric] = np.sort(totals[selected] / counts[selected])
+    return population
+
+
+def _means_from_rows(start_date=None, end_date=None):
+    """
+    Per-user means computed by the database from the daily rows.
+    """
+    population = {}
+    for model, metrics in POPULATION_METRICS.items():
+        rows = (
+            _filter_window(model.objects.all(), start_date, end_date)
+            .values('user_id')
+            .annotate(**{metric: Avg(metric) for metric in metrics})
+            .order_by()
+            .values_list(*metrics)
+        )
+        means = np.array(list(rows), dtype=float).reshape(-1, len(metrics))
+        for position, metric in enumerate(metrics):
+            population[metric] = np.sort(means[:, position])
+    return population
+
+
+def user_means(user_id, metrics, start_date=None, end_date=None):
+    """
+    A single user's mean of each metric over the window, None where they have no data.
+    """
+    if _whole_months(start_date, end_date):
+        totals = (
+            _monthly_rollups(start_date, end_date)
+            .filter(user_id=user_id, metric__in=metrics)
+            .values('metric')
+            .annotate(total=Sum('sum'), count=Sum('count'))
+            .order_by()
+            .values_list('metric', 'total', 'count')
+        )
+        return {metric: total / count for metric, total, count in totals}
+
+    means = {}
+    for model in POPULATION_METRICS:
+        fields = [metric for metric in metrics if METRIC_MODELS[metric] is model]
+        if fields:
+            queryset = _filter_window(model.objects.filter(user_id=user_id), start_date, end_date)
+            means.update(queryset.aggregate(**{metric: Avg(metric) for metric in fields}))
+    return means
+
+
+def describe_distribution(values, bins):
+    """
+    Summary statistics, percentiles and a histogram of a sorted array.
+    """
+    if len(values) == 0:
+        return {'users': 0, 'mean': None, 'percentiles': {}, 'histogram': {'bin_edges': [], 'counts': []}}
+
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        'users': int(len(values)),
+        'mean': round(float(values.mean()), 4),
+        'percentiles': {
+            f"p{percentile}": round(float(value), 4)
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        },
+        'histogram': {
+            'bin_edges': [round(float(edge), 4) for edge in edges],
+            'counts': counts.tolist(),
+        },
+    }
+
+
+def rank_in_population(values, value):
+    """
+    Where a value falls in a sorted population.
+
+    :return: Dictionary with the value, its rank (1 = highest) and its
+        percentile rank (share of users below it, counting ties as half)
+    """
+    below = int(np.searchsorted(values, value, side='left'))
+    not_above = int(np.searchsorted(values, value, side='right'))
+    return {
+        'value': round(float(value), 4),
+        'rank': len(values) - not_above + 1,
+        'percentile_rank': round((below + (not_above - below) / 2) / len(values) * 100, 2),
+    }
+
+
+def population_summary(metrics, start_date=None, end_date=None, user_id=None, bins=None):
+    """
+    Distribution of per-user means for each metric, and optionally where a user stands.
+
+    :param metrics: Metric names, keys of METRIC_MODELS
+    :param user_id: Include this user's value, rank and percentile rank
+    :param bins: Number of histogram bins
+    """
+    population = load_population(start_date, end_date)
+    means = user_means(user_id, metrics, start_date, end_date) if user_id else {}
+
+    summary = {}
+    for metric in metrics:
+        values = population[metric]
+        summary[metric] = describe_distribution(values, bins or settings.POPULATION_HISTOGRAM_BINS)
+        if user_id:
+            value = means.get(metric)
+            summary[metric]['user'] = (
+                rank_in_population(values, value) if value is not None and len(values) else None
+            )
+    return summary
@@ -0,0 +1,154 @@
+import json
+from collections import defaultdict
+
+import numpy as np
+
+from django.db.models import Case, F, OuterRef, Q, Subquery, When
+from django.utils import timezone
+
+from .insight_state import rebuild_insight_states
+from .insights_generator import DATASET_COLUMNS, DATASET_ORDERING, FITNESS_METRICS, HealthInsightsGenerator
+from .models import HealthMetric, SleepData, JournalEntry, InsightState, InsightSnapshot
+from .renderers import NumpyJSONEncoder
+from .sentiment import score_text
+from .trends import fit_trends
+
+
+DATASET_MODELS = {
+    'health_metrics': HealthMetric,
+    'sleep_data': SleepData,
+    'journal_entries': JournalEntry,
+}
+
+# Section of the holistic insights returned for each `agent` query parameter
+AGENT_SECTIONS = {
+    'fitness': 'fitness_insights',
+    'sleep': 'sleep_insights',
+    'journal': 'journal_sentiments',
+}
+
+
+def pending_user_ids(force=False):
+    """
+    Users with health metrics whose snapshot is missing, failed or older than their data.
+
+    :param force: Return every user, fresh snapshot or not
+    :return: Sorted list of user ids
+    """
+    user_ids = HealthMetric.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+    if not force:
+        fresh = InsightSnapshot.objects.filter(
+            error__isnull=True,
+            data_as_of__gte=Subquery(
+                InsightState.objects.filter(user_id=OuterRef('user_id')).values('updated_at')[:1]
+            ),
+        ).values('user_id')
+        user_ids = user_ids.exclude(user_id__in=fresh)
+    return list(user_ids)
+
+
+def load_user_rows(user_ids):
+    """
+    Insight columns for a group of users, read with one query per dataset.
+
+    Journal rows carry the entry text as an extra last column when the entry
+    has no stored sentiment, and None otherwise.
+
+    :return: Tuple of (time the data was read, {user_id: {dataset: rows}})
+    """
+    # Taken before reading, so any write racing the read leaves the snapshot stale
+    data_as_of = timezone.now()
+    rows = defaultdict(lambda: {dataset: [] for dataset in DATASET_MODELS})
+    for dataset, model in DATASET_MODELS.items():
+        fields = list(DATASET_COLUMNS[dataset])
+        queryset = model.objects.filter(user_id__in=user_ids).order_by('user_id', *DATASET_ORDERING)
+        if model is JournalEntry:
+            queryset = queryset.annotate(unscored_text=Case(
+                When(Q(polarity__isnull=True) | Q(emotional_keywords__isnull=True), then=F('entry')),
+                default=None,
+            ))
+            fields.append('unscored_text')
+        for user_id, *row in queryset.values_list('user_id', *fields).iterator(chunk_size=10000):
+            rows[user_id][dataset].append(row)
+    return data_as_of, dict(rows)
+
+
+def user_generator(rows, fitness_trends=None):
+    """
+    HealthInsightsGenerator over one user's rows as loaded by load_user_rows.
+    """
+    journal_rows = []
+    for polarity, keywords, unscored_text in rows['journal_entries']:
+        if unscored_text is not None:
+            score = score_text(unscored_text)
+            polarity, keywords = score.polarity, score.emotional_keywords
+        journal_rows.append((polarity, keywords))
+    return HealthInsightsGenerator.from_rows({**rows, 'journal_entries': journal_rows}, fitness_trends)
+
+
+def compute_chunk(chunk):
+    """
+    Compute insights for a group of users, isolating failures per user.
+
+    Fitness trends of the whole chunk are fitted in one vectorized call.
+    Runs in a worker process.
+
+    :param chunk: Dictionary of user id to rows, as loaded by load_user_rows
+    :return: List of (user_id, insights, error) tuples
+    """
+    metric_count = len(FITNESS_METRICS)
+    series = []
+    for rows in chunk.values():
+        series.extend(np.asarray(rows['health_metrics'], dtype=float).reshape(-1, metric_count).T)
+    fits = fit_trends(series)
+
+    results = []
+    for position, (user_id, rows) in enumerate(chunk.items()):
+        try:
+            generator = user_generator(rows, fits[position * metric_count:(position + 1) * metric_count])
+            insights = generator.generate_holistic_insights()
+            results.append((user_id, json.loads(json.dumps(insights, cls=NumpyJSONEncoder)), None))
+        except Exception as e:
+            results.append((user_id, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def prepare_chunk(user_ids):
+    """
+    Make sure every user in a chunk has an insight state, then load their rows.
+
+    Snapshots are only served while newer than the user's state, so the state
+    must exist before the data is read.
+    """
+    missing = set(user_ids) - set(InsightState.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    if missing:
+        rebuild_insight_states(user_ids=missing)
+    return load_user_rows(user_ids)
+
+
+def save_snapshots(data_as_of, results):
+    InsightSnapshot.objects.bulk_create(
+        [
+            InsightSnapshot(user_id=user_id, insights=insights, error=error, data_as_of=data_as_of)
+            for user_id, insights, error in results
+        ],
+        update_conflicts=True,
+        unique_fields=['user_id'],
+        update_fields=['insights', 'error', 'data_as_of', 'computed_at'],
+    )
+
+
+def load_snapshot(state, agent=None):
+    """
+    Precomputed insights for a user, if a snapshot newer than their data exists.
+
+    :param state: The user's InsightState
+    :param agent: Optional agent name selecting one section of the insights
+    :return: Insights, or None when there is no usable snapshot
+    """
+    snapshot = InsightSnapshot.objects.filter(
+        user_id=state.user_id, error__isnull=True, data_as_of__gte=state.updated_at
+    ).values_list('insights', flat=True).first()
+    if snapshot is None or not agent:
+        return snapshot
+    return snapshot.get(AGENT_SECTIONS.get(agent.lower()))
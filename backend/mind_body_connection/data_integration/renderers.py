@@ -0,0 +1,129 @@
+import csv
+import json
+import sys
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .telemetry import timed
+
+
+# Renderer formats for which the list views return one list per field
+COLUMNAR_FORMATS = ('columnar', 'msgpack')
+
+
+class EchoBuffer:
+    """
+    File-like object that hands written data straight back to the caller,
+    so csv.writer can be used to format rows for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+class NumpyJSONEncoder(JSONEncoder):
+    """
+    DRF's JSON encoder, extended to NumPy scalars and arrays.
+
+    float64 values subclass float and are written by json itself; other
+    scalars (integers, booleans, float32) and arrays are converted here.
+    """
+    def default(self, obj):
+        # Only look for NumPy types once something has imported NumPy
+        numpy = sys.modules.get('numpy')
+        if numpy is not None:
+            if isinstance(obj, numpy.generic):
+                return obj.item()
+            if isinstance(obj, numpy.ndarray):
+                return obj.tolist()
+        return super().default(obj)
+
+
+class NumpyJSONRenderer(JSONRenderer):
+    """
+    JSON renderer for data holding NumPy values, such as computed insights.
+    """
+    encoder_class = NumpyJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON: one JSON document per line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.render_row(row) for row in rows).encode(self.charset)
+
+    @staticmethod
+    def render_row(row):
+        return json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Comma separated values with a header row taken from the first record.
+
+    List and dict values (JSON columns such as emotional_keywords) are
+    written as JSON, the same text the JSON formats carry.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        header = list(rows[0].keys())
+        writer = csv.writer(EchoBuffer())
+        lines = [writer.writerow(header)]
+        lines.extend(self.render_row(writer, [row.get(field) for field in header]) for row in rows)
+        return ''.join(lines).encode(self.charset)
+
+    @staticmethod
+    def render_row(writer, values):
+        return writer.writerow([
+            json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':'))
+            if isinstance(value, (list, dict)) else value
+            for value in values
+        ])
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    JSON with one array per field instead of one object per row.
+
+    Requested with `?format=columnar` or the media type in Accept; the list
+    views build the columns themselves (see ValuesSerializer.columns).
+    """
+    media_type = 'application/vnd.mindbody.columnar+json'
+    format = 'columnar'
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack, a compact binary encoding of the columnar format.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Imported here so that only deployments serving MessagePack need the package
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True)
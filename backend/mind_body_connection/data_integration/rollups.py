@@ -0,0 +1,271 @@
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import HealthMetric, SleepData, MetricRollup
+
+
+# Fields rolled up for each source model
+ROLLUP_METRICS = {
+    HealthMetric: ('steps', 'heart_rate', 'sleep_hours', 'hrv'),
+    SleepData: ('duration', 'disturbances', 'sleep_quality'),
+}
+
+METRIC_SOURCES = {
+    metric: model
+    for model, metrics in ROLLUP_METRICS.items()
+    for metric in metrics
+}
+
+PERIOD_TRUNCATIONS = {
+    MetricRollup.WEEKLY: TruncWeek,
+    MetricRollup.MONTHLY: TruncMonth,
+}
+
+ROLLUP_BATCH_SIZE = 1000
+
+# Touched periods aggregated per query by refresh_rollups, keeping its OR
+# of date ranges well inside SQLite's expression depth limit
+REFRESH_QUERY_PERIODS = 100
+
+
+def as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def period_start(period, day):
+    """
+    First day of the week (Monday) or month containing `day`.
+    """
+    if period == MetricRollup.WEEKLY:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(period, start):
+    """
+    Last day of the period beginning on `start`.
+    """
+    if period == MetricRollup.WEEKLY:
+        return start + timedelta(days=6)
+    return start.replace(day=calendar.monthrange(start.year, start.month)[1])
+
+
+def _aggregate_buckets(model, period, queryset):
+    """
+    Group rows into period buckets per user, aggregating every rolled-up field in one query.
+    """
+    aggregates = {'row_count': Count('id')}
+    for metric in ROLLUP_METRICS[model]:
+        aggregates[f'{metric}__sum'] = Sum(metric)
+        aggregates[f'{metric}__min'] = Min(metric)
+        aggregates[f'{metric}__max'] = Max(metric)
+        aggregates[f'{metric}__sum_squares'] = Sum(F(metric) * F(metric))
+
+    return (
+        queryset.annotate(bucket=PERIOD_TRUNCATIONS[period]('date'))
+        .values('user_id', 'bucket')
+        .annotate(**aggregates)
+        .order_by('user_id', 'bucket')
+    )
+
+
+def _bucket_rollups(model, period, bucket):
+    start = as_date(bucket['bucket'])
+    return [
+        MetricRollup(
+            user_id=bucket['user_id'],
+            period=period,
+            period_start=start,
+            metric=metric,
+            count=bucket['row_count'],
+            sum=bucket[f'{metric}__sum'],
+            min=bucket[f'{metric}__min'],
+            max=bucket[f'{metric}__max'],
+            sum_squares=bucket[f'{metric}__sum_squares'],
+        )
+        for metric in ROLLUP_METRICS[model]
+    ]
+
+
+# Column order of the value tuples written by rebuild_rollups
+ROLLUP_FIELDS = ['user_id', 'period', 'period_start', 'metric', 'count', 'sum', 'min', 'max', 'sum_squares']
+
+
+def _bucket_rows(model, period, bucket):
+    start = as_date(bucket['bucket']).isoformat()
+    return [
+        (
+            bucket['user_id'], period, start, metric, bucket['row_count'], bucket[f'{metric}__sum'],
+            bucket[f'{metric}__min'], bucket[f'{metric}__max'], bucket[f'{metric}__sum_squares'],
+        )
+        for metric in ROLLUP_METRICS[model]
+    ]
+
+
+def _insert_rows(rows):
+    """
+    Plain INSERT of rollup value tuples, skipping model instantiation and
+    per-value SQL compilation; rebuilds write into an emptied table.
+    """
+    connection = connections[router.db_for_write(MetricRollup)]
+    quote = connection.ops.quote_name
+    columns = [quote(MetricRollup._meta.get_field(name).column) for name in ROLLUP_FIELDS]
+    sql = (
+        f"INSERT INTO {quote(MetricRollup._meta.db_table)} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _save_rollups(rollups):
+    MetricRollup.objects.bulk_create(
+        rollups,
+        batch_size=ROLLUP_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['user_id', 'period', 'metric', 'period_start'],
+        update_fields=['count', 'sum', 'min', 'max', 'sum_squares'],
+    )
+
+
+def refresh_rollups(model, keys):
+    """
+    Recompute the weekly and monthly buckets touched by a write.
+
+    Only the buckets containing the written days are rebuilt, each from the
+    writing user's rows in that week or month, so the cost of a write does
+    not grow with the user's history, however far apart the written days
+    are. Recomputing (rather than adding deltas) keeps min/max correct when
+    a day is overwritten or deleted.
+
+    :param model: HealthMetric or SleepData; other models are ignored
+    :param keys: Iterable of (user_id, date) pairs that were written or deleted
+    """
+    if model not in ROLLUP_METRICS:
+        return
+    keys = {(user_id, as_date(day)) for user_id, day in keys}
+    if not keys:
+        return
+
+    metrics = ROLLUP_METRICS[model]
+    for period in PERIOD_TRUNCATIONS:
+        touched = {(user_id, period_start(period, day)) for user_id, day in keys}
+        users_by_start = defaultdict(set)
+        for user_id, start in touched:
+            users_by_start[start].add(user_id)
+
+        rollups = []
+        found = set()
+        starts = sorted(users_by_start)
+        for offset in range(0, len(starts), REFRESH_QUERY_PERIODS):
+            # Only the touched periods, and only for the users who touched them
+            condition = Q()
+            for start in starts[offset:offset + REFRESH_QUERY_PERIODS]:
+                condition |= Q(
+                    user_id__in=sorted(users_by_start[start]), date__range=[start, period_end(period, start)]
+                )
+            for bucket in _aggregate_buckets(model, period, model.objects.filter(condition)):
+                key = (bucket['user_id'], as_date(bucket['bucket']))
+                if key in touched:
+                    found.add(key)
+                    rollups.extend(_bucket_rollups(model, period, bucket))
+        _save_rollups(rollups)
+
+        # Buckets whose last source row was deleted
+        emptied = touched - found
+        if emptied:
+            condition = Q()
+            for user_id, start in emptied:
+                condition |= Q(user_id=user_id, period_start=start)
+            MetricRollup.objects.filter(condition, period=period, metric__in=metrics).delete()
+
+
+def rebuild_rollups(user_ids=None, batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Rebuild all rollups from the source tables, e.g. after a bulk load.
+
+    Runs in one transaction, so readers see the old rollups until the new
+    ones are complete, never an empty or partial table.
+
+    :param user_ids: Restrict the rebuild to these users
+    :return: Number of rollup rows written
+    """
+    with transaction.atomic(using=router.db_for_write(MetricRollup)):
+        existing = MetricRollup.objects.all()
+        if user_ids:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+
+        written = 0
+        for model in ROLLUP_METRICS:
+            source = model.objects.all()
+            if user_ids:
+                source = source.filter(user_id__in=user_ids)
+            for period in PERIOD_TRUNCATIONS:
+                rows = []
+                for bucket in _aggregate_buckets(model, period, source).iterator(chunk_size=batch_size):
+                    rows.extend(_bucket_rows(model, period, bucket))
+                    if len(rows) >= batch_size:
+                        _insert_rows(rows)
+                        written += len(rows)
+                        rows = []
+                _insert_rows(rows)
+                written += len(rows)
+    return written
+
+
+def daily_series(user_id, metrics, start_date=None, end_date=None):
+    """
+    Daily figures in the rollup shape, read straight from the source rows.
+    """
+    series = {}
+    for model in ROLLUP_METRICS:
+        fields = [metric for metric in metrics if METRIC_SOURCES[metric] is model]
+        if not fields:
+            continue
+        rows = model.objects.filter(user_id=user_id)
+        if start_date and end_date:
+            rows = rows.filter(date__range=[start_date, end_date])
+        rows = list(rows.order_by('date').values_list('date', *fields))
+        for position, metric in enumerate(fields, start=1):
+            series[metric] = [
+                rollup_point(row[0], 1, row[position], row[position], row[position], row[position] ** 2)
+                for row in rows
+            ]
+    return series
+
+
+def rollup_series(user_id, period, metrics, start_date=None, end_date=None):
+    """
+    Stored weekly or monthly rollups for a user, one list of points per metric.
+    """
+    rollups = MetricRollup.objects.filter(user_id=user_id, period=period, metric__in=metrics)
+    if start_date and end_date:
+        rollups = rollups.filter(period_start__range=[period_start(period, start_date), end_date])
+
+    series = {metric: [] for metric in metrics}
+    for metric, start, count, total, minimum, maximum, sum_squares in rollups.order_by(
+        'metric', 'period_start'
+    ).values_list('metric', 'period_start', 'count', 'sum', 'min', 'max', 'sum_squares'):
+        series[metric].append(rollup_point(start, count, total, minimum, maximum, sum_squares))
+    return series
+
+
+def rollup_point(start, count, total, minimum, maximum, sum_squares):
+    mean = total / count
+    variance = max(sum_squares / count - mean * mean, 0.0)
+    return {
+        'period_start': start.isoformat(),
+        'count': count,
+        'sum': total,
+        'min': minimum,
+        'max': maximum,
+        'sum_squares': sum_squares,
+        'mean': round(mean, 4),
+        'stddev': round(variance ** 0.5, 4),
+    }
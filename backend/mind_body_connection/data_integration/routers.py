@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .versions import arecently_changed, recently_changed
+
+
+# The read routing of the view being handled; None outside read_from_replica
+_routing = contextvars.ContextVar('database_routing', default=None)
+
+_round_robin = itertools.count()
+
+
+class ReadRouting:
+    """
+    Where the reads of one request go: a replica alias, or None for the primary.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+
+class PrimaryReplicaRouter:
+    """
+    Send every write to the primary, and the reads of views decorated with
+    read_from_replica to the replica chosen for the request.
+
+    Once a request writes, its remaining reads go to the primary too, so it
+    always reads its own writes. Replica aliases are copies of the primary
+    and are never migrated themselves.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        return routing.alias if routing is not None and routing.alias else None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.alias = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def choose_replica():
+    """
+    A replica alias from DATABASE_REPLICAS, or None when none is configured.
+
+    DATABASE_REPLICA_SELECTION 'weighted' picks at random in proportion to
+    the weights; 'round_robin' takes the aliases in turn.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    aliases = list(replicas)
+    if settings.DATABASE_REPLICA_SELECTION == 'round_robin':
+        return aliases[next(_round_robin) % len(aliases)]
+    return random.choices(aliases, weights=list(replicas.values()))[0]
+
+
+def read_from_replica(view_method):
+    """
+    Decorate a read-only view's get method to read from a replica.
+
+    A replica is chosen once per request, so all of its reads see the same
+    copy. Requests for a user whose data changed within the last
+    DATABASE_PRIMARY_PIN_SECONDS read from the primary instead, so a write
+    is never followed by a read that misses it while the replicas catch up.
+    Works on sync and async methods.
+
+    Apply it outside conditional_on_data_version, so that the data version
+    behind the validators is read from the same database as the body. Rows
+    read after the method returns, e.g. by a streaming response, must be
+    bound to the chosen database inside it with `.using(queryset.db)`.
+    """
+    if asyncio.iscoroutinefunction(view_method):
+        @functools.wraps(view_method)
+        async def wrapper(self, request, *args, **kwargs):
+            alias = choose_replica()
+            if alias and await arecently_changed(request.GET.get('user_id'), settings.DATABASE_PRIMARY_PIN_SECONDS):
+                alias = None
+            token = _routing.set(ReadRouting(alias))
+            try:
+                return await view_method(self, request, *args, **kwargs)
+            finally:
+                _routing.reset(token)
+    else:
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            alias = choose_replica()
+            if alias and recently_changed(request.GET.get('user_id'), settings.DATABASE_PRIMARY_PIN_SECONDS):
+                alias = None
+            token = _routing.set(ReadRouting(alias))
+            try:
+                return view_method(self, request, *args, **kwargs)
+            finally:
+                _routing.reset(token)
+
+    return wrapper
@@ -0,0 +1,122 @@
+import re
+from contextlib import contextmanager
+
+from django.db import NotSupportedError, connections, transaction
+from django.db.models.expressions import RawSQL
+
+
+# SQLite FTS5 index over JournalEntry.entry, kept in sync by triggers created
+# by migration 0004_journal_search_index, which takes these definitions from here
+JOURNAL_FTS_TABLE = 'data_integration_journalentry_fts'
+JOURNAL_TABLE = 'data_integration_journalentry'
+JOURNAL_FTS_INSERT_TRIGGER_NAME = f'{JOURNAL_FTS_TABLE}_insert'
+JOURNAL_FTS_INSERT_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS {JOURNAL_FTS_INSERT_TRIGGER_NAME} AFTER INSERT ON {JOURNAL_TABLE} BEGIN
+        INSERT INTO {JOURNAL_FTS_TABLE}(rowid, entry) VALUES (new.id, new.entry);
+    END
+"""
+
+QUERY_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def parse_search_query(query):
+    """
+    Split a user query into search terms.
+
+    Supports bare keywords, "quoted phrases" and prefix terms ending in `*`.
+    Every term must match.
+
+    :param query: Raw query string from the client
+    :return: List of (kind, text) tuples, kind being 'keyword', 'phrase' or 'prefix'
+    """
+    terms = []
+    for phrase, word in QUERY_TERM_PATTERN.findall(query or ''):
+        if phrase.strip():
+            terms.append(('phrase', ' '.join(phrase.split())))
+        elif word:
+            if word.endswith('*') and word.rstrip('*'):
+                terms.append(('prefix', word.rstrip('*')))
+            elif word.strip('*'):
+                terms.append(('keyword', word.strip('*')))
+
+    if not terms:
+        raise SearchQueryError("Provide a search query with at least one word")
+    return terms
+
+
+def build_match_expression(terms):
+    """
+    Build an FTS5 MATCH expression from parsed terms.
+
+    Every term is emitted as a quoted FTS5 string, so characters in user input
+    are never interpreted as query syntax.
+    """
+    parts = []
+    for kind, text in terms:
+        quoted = '"' + text.replace('"', '""') + '"'
+        parts.append(quoted + '*' if kind == 'prefix' else quoted)
+    return ' AND '.join(parts)
+
+
+def search_journal_entries(queryset, query):
+    """
+    Restrict a JournalEntry queryset to entries matching a search query.
+
+    The match is answered by the SQLite full-text index. There is no
+    fallback to substring filters elsewhere: they scan every entry.
+
+    :param queryset: JournalEntry queryset, usually already filtered by user and date
+    :param query: Raw query string
+    :return: Filtered queryset, newest entries first
+    :raises NotSupportedError: On databases other than SQLite
+    """
+    terms = parse_search_query(query)
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        raise NotSupportedError('Journal search needs the SQLite full-text index')
+
+    table = connection.ops.quote_name(JOURNAL_FTS_TABLE)
+    matching_ids = RawSQL(
+        f"SELECT rowid FROM {table} WHERE {table} MATCH %s",
+        [build_match_expression(terms)]
+    )
+    return queryset.filter(id__in=matching_ids).order_by('-date', '-id')
+
+
+@contextmanager
+def deferred_search_index(using='default'):
+    """
+    Index the journal entries inserted inside the block in one statement at the end.
+
+    Bulk loads spend most of their time in the FTS insert trigger, which
+    indexes entries one row at a time. Within this block the trigger is
+    dropped, and on exit every entry inserted meanwhile is indexed with a
+    single INSERT ... SELECT and the trigger is restored. The block runs in
+    one transaction, so other connections never see the index out of sync.
+    Updates and deletes are still indexed by their own triggers.
+
+    :param using: Database alias the entries are written to
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor != 'sqlite':
+            yield
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT coalesce(max(id), 0) FROM {JOURNAL_TABLE}")
+            last_id = cursor.fetchone()[0]
+            cursor.execute(f"DROP TRIGGER IF EXISTS {JOURNAL_FTS_INSERT_TRIGGER_NAME}")
+
+        yield
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {JOURNAL_FTS_TABLE}(rowid, entry) SELECT id, entry FROM {JOURNAL_TABLE} WHERE id > %s",
+                [last_id]
+            )
+            cursor.execute(JOURNAL_FTS_INSERT_TRIGGER)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .telemetry import timed
+
+
+EMOTIONAL_KEYWORDS = frozenset([
+    'stress', 'happy', 'sad', 'anxiety', 'excited',
+    'worry', 'joy', 'frustrated', 'calm', 'overwhelmed'
+])
+
+SentimentScore = namedtuple('SentimentScore', ['content_hash', 'polarity', 'subjectivity', 'emotional_keywords'])
+
+# One analyzer per process, reused for every text it scores. This is the
+# analyzer TextBlob(text).sentiment uses, so scores are identical. TextBlob
+# pulls in NLTK, SciPy and scikit-learn, so it is only imported on first use.
+_analyzer = None
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from textblob.sentiments import PatternAnalyzer
+
+        _analyzer = PatternAnalyzer()
+    return _analyzer
+
+
+def content_hash(text):
+    """
+    Stable fingerprint of a journal text, used to tell whether stored scores are current.
+    """
+    return hashlib.sha256(str(text).encode('utf-8')).hexdigest()
+
+
+def extract_emotional_keywords(text):
+    """
+    Emotional keywords in order of appearance, repeats included.
+    """
+    return [
+        word.lower() for word in str(text).split()
+        if word.lower() in EMOTIONAL_KEYWORDS
+    ]
+
+
+def score_text(text):
+    """
+    Score a single journal text.
+
+    :param text: Journal entry text
+    :return: SentimentScore with the content hash, TextBlob polarity and
+        subjectivity, and the emotional keywords found in the text
+    """
+    with timed('sentiment'):
+        sentiment = _get_analyzer().analyze(str(text))
+    return SentimentScore(
+        content_hash=content_hash(text),
+        polarity=sentiment.polarity,
+        subjectivity=sentiment.subjectivity,
+        emotional_keywords=extract_emotional_keywords(text),
+    )
+
+
+def _score_chunk(texts):
+    return [score_text(text) for text in texts]
+
+
+class BatchSentimentScorer:
+    """
+    Score journal texts in parallel across a pool of worker processes.
+
+    Texts are dispatched in chunks so each task carries enough work to
+    amortise the inter-process round trip, and every worker keeps its own
+    analyzer between chunks. Results come back in input order. Small batches,
+    or a pool of one worker, are scored in-process without starting a pool.
+
+    Use as a context manager to keep one pool alive across many batches::
+
+        with BatchSentimentScorer(workers=8) as scorer:
+            for texts in batches:
+                scores = scorer.score(texts)
+    """
+
+    def __init__(self, workers=None, chunk_size=None):
+        """
+        :param workers: Number of worker processes; defaults to SENTIMENT_WORKERS,
+            or the number of CPUs when that is unset
+        :param chunk_size: Texts sent to a worker per task; defaults to SENTIMENT_CHUNK_SIZE
+        """
+        self.workers = workers or settings.SENTIMENT_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size or settings.SENTIMENT_CHUNK_SIZE
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def score(self, texts):
+        """
+        Score a list of texts.
+
+        :param texts: Journal entry texts
+        :return: List of SentimentScore, one per text, in input order
+        """
+        texts = list(texts)
+        if self.workers <= 1 or len(texts) <= self.chunk_size:
+            return _score_chunk(texts)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_get_analyzer)
+
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        scores = []
+        for chunk_scores in self._pool.map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+        return scores
+
+
+def score_texts(texts):
+    """
+    Score a batch of texts in this process.
+
+    For request paths and signal handlers: a web worker must not fork a
+    process pool per request. Batch commands score through a
+    BatchSentimentScorer instead.
+
+    :return: List of SentimentScore, one per text, in input order
+    """
+    return _score_chunk(texts)
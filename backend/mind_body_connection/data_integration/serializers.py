@@ -1,4 +1,9 @@
-from rest_framework import serializers
+from datetime import date
+from functools import cache
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
 from .models import HealthMetric, SleepData, JournalEntry
 
 class HealthMetricSerializer(serializers.ModelSerializer):
@@ -13,4 +18,107 @@ class SleepDataSerializer(serializers.ModelSerializer):
 class JournalEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = JournalEntry
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class HealthMetricIngestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HealthMetric
+        exclude = ['id']
+        # Conflicts on (user_id, date) are upserted, not rejected
+        validators = []
+
+class SleepDataIngestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SleepData
+        exclude = ['id']
+        validators = []
+
+class JournalEntryIngestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JournalEntry
+        # Sentiment scores are always computed server-side
+        fields = ['user_id', 'date', 'entry']
+        validators = []
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path of a ModelSerializer, over rows from `values_list`.
+
+    Listing through a ModelSerializer builds a model instance and runs every
+    field's to_representation for each row. Here the rows stay tuples and
+    each field gets a converter once, up front. Values the database already
+    returns in their representation (strings, numbers, decoded JSON) are
+    passed through as is, so only dates and the like are converted, a whole
+    column at a time. The output matches the ModelSerializer's.
+    """
+    # Serializer fields whose database values need no conversion
+    passthrough_fields = (serializers.CharField, serializers.IntegerField, serializers.FloatField)
+
+    def __init__(self, serializer_class):
+        readable = [field for field in serializer_class().fields.values() if not field.write_only]
+        self.fields = [field.field_name for field in readable]
+        self.sources = [field.source for field in readable]
+        self.converters = {}
+        self.nullable = set()
+        for field in readable:
+            convert = self.converter(field)
+            if convert is not None:
+                self.converters[field.field_name] = convert
+                if field.allow_null:
+                    self.nullable.add(field.field_name)
+
+    def converter(self, field):
+        """
+        Function returning the representation of a non-null value of the field,
+        or None when values are passed through.
+        """
+        if isinstance(field, self.passthrough_fields):
+            return None
+        if isinstance(field, serializers.JSONField) and not field.binary:
+            return None
+        if type(field) is serializers.DateField and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+            return date.isoformat
+        return field.to_representation
+
+    def values_list(self, queryset):
+        return queryset.values_list(*self.sources)
+
+    def convert(self, name, values):
+        convert = self.converters[name]
+        if name in self.nullable:
+            return [None if value is None else convert(value) for value in values]
+        return list(map(convert, values))
+
+    def columns(self, rows):
+        """
+        Transpose rows into a dictionary of field name to list of values.
+
+        :param rows: Iterable of tuples in `sources` order
+        """
+        rows = list(rows)
+        values = zip(*rows) if rows else ((),) * len(self.fields)
+        return {
+            name: self.convert(name, column) if name in self.converters else list(column)
+            for name, column in zip(self.fields, values)
+        }
+
+    def data(self, rows):
+        """
+        The rows as the list of dictionaries the ModelSerializer would return.
+        """
+        fields = self.fields
+        data = [dict(zip(fields, row)) for row in rows]
+        # One field at a time, which beats converting inside the row loop
+        for name in self.converters:
+            for item, value in zip(data, self.convert(name, [item[name] for item in data])):
+                item[name] = value
+        return data
+
+
+@cache
+def values_serializer(serializer_class):
+    """
+    The ValuesSerializer of a ModelSerializer class, built once per class.
+    """
+    return ValuesSerializer(serializer_class)
@@ -0,0 +1,53 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .database import apply_pragmas
+from .models import HealthMetric, SleepData, JournalEntry
+from .rollups import refresh_rollups
+from .versions import bump_data_versions
+
+
+# Sent after time-series rows are written or deleted, whether through a model
+# save/delete or a bulk upsert (which bypasses post_save).
+# sender is the model class; keys is a list of (user_id, date) pairs.
+data_changed = Signal()
+
+TIME_SERIES_MODELS = (HealthMetric, SleepData, JournalEntry)
+
+
+def send_data_changed(model, keys):
+    keys = list(keys)
+    if keys:
+        data_changed.send(sender=model, keys=keys)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def instance_changed(sender, instance, **kwargs):
+    if sender in TIME_SERIES_MODELS:
+        send_data_changed(sender, [(instance.user_id, instance.date)])
+
+
+@receiver(data_changed)
+def update_rollups(sender, keys, **kwargs):
+    refresh_rollups(sender, keys)
+
+
+@receiver(data_changed)
+def update_insights_state(sender, keys, **kwargs):
+    # Imported here: the insight state pulls in the NumPy analytics stack,
+    # which commands that never write time-series rows should not pay for
+    from .insight_state import update_insight_state
+
+    update_insight_state(sender, keys)
+
+
+@receiver(data_changed)
+def update_data_versions(sender, keys, **kwargs):
+    bump_data_versions(user_id for user_id, _ in keys)
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    apply_pragmas(connection)
@@ -0,0 +1,205 @@
+import json
+from datetime import timedelta
+
+import numpy as np
+
+from .ingestion import upsert_rows
+from .insight_state import rebuild_insight_states
+from .models import HealthMetric, SleepData, JournalEntry
+from .rollups import rebuild_rollups
+from .search import deferred_search_index
+from .sentiment import score_text
+from .versions import bump_data_versions
+
+
+# Users are generated in fixed blocks, each from its own seed, so the data
+# for a given seed does not depend on how it is batched or written
+SEED_BLOCK_USERS = 256
+
+# Column order of the row tuples produced for each model
+SYNTHETIC_FIELDS = {
+    HealthMetric: ['user_id', 'date', 'steps', 'heart_rate', 'sleep_hours', 'hrv'],
+    SleepData: ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality'],
+    JournalEntry: [
+        'user_id', 'date', 'entry', 'content_hash', 'polarity', 'subjectivity', 'emotional_keywords'
+    ],
+}
+
+# Journal texts are an opener, a middle and a closer from the pool of the
+# day's mood. Every combination is scored once and reused.
+JOURNAL_TEMPLATES = (
+    (  # negative
+        ("Rough day today.", "Woke up tired.", "Not my best day.", "Everything felt heavy.", "Long and draining day."),
+        ("Work stress kept piling up", "I could not shake the anxiety", "I was frustrated with myself",
+         "Felt sad most of the afternoon", "I was overwhelmed by everything on my plate"),
+        ("and I worry about tomorrow.", "and nothing seemed to help.", "and I skipped my workout.",
+         "and I barely slept.", "and I just want this week to end."),
+    ),
+    (  # neutral
+        ("A normal day.", "Nothing special today.", "Quiet day at home.", "Steady day overall.",
+         "Busy but fine."),
+        ("Work was routine", "I went for a short walk", "Spent the evening reading",
+         "Caught up on some chores", "Had a few meetings"),
+        ("and went to bed on time.", "and cooked dinner at home.", "and that was about it.",
+         "and planned the rest of the week.", "and kept to my usual schedule."),
+    ),
+    (  # positive
+        ("Great day today!", "Woke up refreshed.", "Feeling really good.", "What a lovely day.",
+         "Best day in a while."),
+        ("I felt calm and focused at work", "The morning run left me happy", "I was excited about my progress",
+         "Dinner with friends was pure joy", "I felt strong during my workout"),
+        ("and I slept well.", "and I am grateful for it.", "and I cannot wait for tomorrow.",
+         "and my energy was high all day.", "and everything just clicked."),
+    ),
+)
+TEMPLATE_CHOICES = len(JOURNAL_TEMPLATES[0][0])
+
+_journal_cache = {}
+
+
+def synthetic_user_ids(users, prefix='synthetic'):
+    return [f"{prefix}-{index:07d}" for index in range(users)]
+
+
+def journal_row_values(text_id):
+    """
+    Text and stored sentiment columns of a journal template combination, scored once.
+    """
+    values = _journal_cache.get(text_id)
+    if values is None:
+        mood, rest = divmod(text_id, TEMPLATE_CHOICES ** 3)
+        opener, rest = divmod(rest, TEMPLATE_CHOICES ** 2)
+        middle, closer = divmod(rest, TEMPLATE_CHOICES)
+        openers, middles, closers = JOURNAL_TEMPLATES[mood]
+        text = f"{openers[opener]} {middles[middle]} {closers[closer]}"
+        score = score_text(text)
+        values = (text, score.content_hash, score.polarity, score.subjectivity, json.dumps(score.emotional_keywords))
+        _journal_cache[text_id] = values
+    return values
+
+
+def generate_block(block, user_ids, start_date, days, seed=0, sentiment=0.0, journal_rate=1.0):
+    """
+    Generate correlated daily data for one block of users with vectorized NumPy.
+
+    Each user gets a fitness level that sets their typical steps, resting
+    heart rate and HRV, a sleep need and a baseline mood. A shared day-to-day
+    wellbeing factor (an AR(1) process) then moves sleep, heart rate, HRV,
+    steps and journal mood together, so the metrics correlate the way real
+    ones do. Steps also follow a per-user weekend effect.
+
+    :param block: Index of the block, used with `seed` to seed its generator
+    :param user_ids: User ids in the block, at most SEED_BLOCK_USERS
+    :param start_date: Date of the first day
+    :param days: Number of consecutive days per user
+    :param sentiment: Shift of every user's mood, from -1 (mostly negative
+        journal entries) to 1 (mostly positive)
+    :param journal_rate: Probability that a user writes a journal entry on a given day
+    :return: Dictionary of model to a list of row tuples in SYNTHETIC_FIELDS order
+    """
+    rng = np.random.default_rng([seed, block])
+    users = len(user_ids)
+    shape = (users, days)
+
+    # Per-user traits
+    fitness = rng.normal(0, 1, (users, 1))
+    base_steps = 7500 * np.exp(0.35 * fitness)
+    resting_hr = 68 - 4 * fitness + rng.normal(0, 4, (users, 1))
+    base_hrv = np.clip(50 + 8 * fitness + rng.normal(0, 8, (users, 1)), 15, 120)
+    sleep_need = np.clip(rng.normal(7.3, 0.6, (users, 1)), 5.5, 9.5)
+    mood = rng.normal(0, 0.5, (users, 1)) + sentiment
+    weekend_factor = rng.uniform(0.6, 1.3, (users, 1))
+
+    # Day-to-day wellbeing, shared by all metrics of a user
+    shocks = rng.normal(0, 0.6, shape)
+    wellbeing = np.empty(shape)
+    wellbeing[:, 0] = shocks[:, 0]
+    for day in range(1, days):
+        wellbeing[:, day] = 0.8 * wellbeing[:, day - 1] + shocks[:, day]
+
+    duration = np.clip(sleep_need + 0.6 * wellbeing + rng.normal(0, 0.7, shape), 3, 12).round(1)
+    disturbances = rng.poisson(np.clip(1.5 - 0.8 * wellbeing, 0.1, None))
+    sleep_quality = np.clip(
+        50 + 8 * (duration - 5) - 4 * disturbances + 5 * wellbeing + rng.normal(0, 5, shape), 0, 100
+    ).round(1)
+
+    dates = [start_date + timedelta(days=day) for day in range(days)]
+    weekend = np.array([current.weekday() >= 5 for current in dates])
+    steps = base_steps * np.where(weekend, weekend_factor, 1.0) * np.exp(
+        0.1 * wellbeing + rng.normal(0, 0.25, shape)
+    )
+    heart_rate = np.clip(
+        resting_hr + 0.0004 * (steps - base_steps) - 1.5 * (duration - sleep_need) - 2 * wellbeing
+        + rng.normal(0, 2, shape),
+        40, 150,
+    )
+    hrv = np.clip(base_hrv + 6 * wellbeing + 2 * (duration - sleep_need) + rng.normal(0, 5, shape), 10, 200)
+
+    day_mood = mood + 0.8 * wellbeing + rng.normal(0, 0.5, shape)
+    mood_class = np.digitize(day_mood, [-0.5, 0.5])
+    parts = rng.integers(0, TEMPLATE_CHOICES, (3,) + shape)
+    text_ids = ((mood_class * TEMPLATE_CHOICES + parts[0]) * TEMPLATE_CHOICES + parts[1]) * TEMPLATE_CHOICES + parts[2]
+    writes_journal = rng.random(shape) < journal_rate
+
+    user_column = np.repeat(np.array(user_ids, dtype=object), days).tolist()
+    date_strings = [current.isoformat() for current in dates]
+    date_column = date_strings * users
+    sleep_hours = duration.ravel().tolist()
+
+    journal_users, journal_days = np.nonzero(writes_journal)
+    journal = [
+        (user_ids[user], date_strings[day], *journal_row_values(text_id))
+        for user, day, text_id in zip(journal_users.tolist(), journal_days.tolist(), text_ids[writes_journal].tolist())
+    ]
+    return {
+        HealthMetric: list(zip(
+            user_column, date_column,
+            steps.round().astype(int).ravel().tolist(),
+            heart_rate.round().astype(int).ravel().tolist(),
+            sleep_hours,
+            hrv.round().astype(int).ravel().tolist(),
+        )),
+        SleepData: list(zip(
+            user_column, date_column, sleep_hours, disturbances.ravel().tolist(), sleep_quality.ravel().tolist(),
+        )),
+        JournalEntry: journal,
+    }
+
+
+def generate_blocks(users, start_date, days, seed=0, prefix='synthetic', **options):
+    """
+    Generate data for `users` users block by block.
+
+    :param options: Passed on to generate_block
+    :return: Iterator of (user_ids, rows) per block of SEED_BLOCK_USERS users
+    """
+    user_ids = synthetic_user_ids(users, prefix)
+    for block, start in enumerate(range(0, users, SEED_BLOCK_USERS)):
+        block_user_ids = user_ids[start:start + SEED_BLOCK_USERS]
+        yield block_user_ids, generate_block(block, block_user_ids, start_date, days, seed=seed, **options)
+
+
+def write_blocks(blocks, batch_size=None, rebuild=True):
+    """
+    Upsert generated blocks into the database, one transaction per block.
+
+    Rows go in without data_changed. The data versions of each block's users
+    are bumped once, and when `rebuild` is set their rollups and insight
+    states are rebuilt once at the end of the block, which is far cheaper
+    than refreshing them batch by batch.
+    Journal entries are added to the search index in one statement per block.
+
+    :param blocks: Iterator of (user_ids, rows), as from generate_blocks
+    :param batch_size: Rows per executemany call
+    :return: Iterator of (user_ids, rows written) per block
+    """
+    for user_ids, rows in blocks:
+        written = 0
+        with deferred_search_index():
+            for model, model_rows in rows.items():
+                written += upsert_rows(model, SYNTHETIC_FIELDS[model], model_rows, batch_size=batch_size, notify=False)
+            bump_data_versions(user_ids)
+            if rebuild:
+                rebuild_rollups(user_ids=user_ids)
+                rebuild_insight_states(user_ids=user_ids)
+        yield user_ids, written
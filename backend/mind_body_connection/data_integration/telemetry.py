@@ -0,0 +1,249 @@
+import contextvars
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+# The recorder of the request being handled, None when telemetry is off
+_recorder = contextvars.ContextVar('telemetry_recorder', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+ALLOCATION_BUCKETS = tuple(2 ** power for power in range(16, 31, 2))  # 64 KiB to 1 GiB
+
+
+class RequestRecorder:
+    """
+    Timings gathered while handling one request.
+
+    Phases are named spans of work (an insights agent, sentiment scoring,
+    serialization); time spent in a phase several times is added up.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.phases = {}
+        self.peak_allocated = None
+        self._lock = threading.Lock()
+
+    def record_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting queries and their time.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.sql_time += elapsed
+
+    def add_phase(self, name, elapsed):
+        # Agents of the async view report from several threads at once
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def server_timing(self):
+        """
+        The timings as a Server-Timing header value, durations in milliseconds.
+        """
+        entries = [f'db;dur={self.sql_time * 1000:.2f};desc="{self.queries} queries"']
+        entries.extend(f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in self.phases.items())
+        if self.peak_allocated is not None:
+            entries.append(f'alloc;desc="peak {self.peak_allocated} bytes"')
+        entries.append(f'total;dur={self.duration * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder.record_query(execute, sql, params, many, context)
+
+
+def _add_query_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def count_queries():
+    """
+    Count the queries of recorded requests on every database connection.
+
+    Connections are per thread, and async views query from sync_to_async
+    threads, so the wrapper goes on each connection as it opens and charges
+    the query to the recorder of the context it runs in.
+    """
+    connection_created.connect(_add_query_wrapper, dispatch_uid='telemetry_count_queries')
+    for connection in connections.all(initialized_only=True):
+        _add_query_wrapper(connection)
+
+
+@contextmanager
+def record_request(trace_allocations=False):
+    """
+    Record the queries and phases of the request handled inside the block.
+
+    Queries are only counted once count_queries() has been called.
+
+    :param trace_allocations: Also measure the peak of Python memory
+        allocations with tracemalloc. Tracing slows every allocation down and
+        the peak is process wide, so concurrent requests inflate each other's.
+    :return: The RequestRecorder, complete once the block exits
+    """
+    recorder = RequestRecorder()
+    token = _recorder.set(recorder)
+    if trace_allocations:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        yield recorder
+    finally:
+        if trace_allocations:
+            recorder.peak_allocated = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+        recorder.duration = time.perf_counter() - recorder.started
+        _recorder.reset(token)
+
+
+class _Phase:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.recorder.add_phase(self.name, time.perf_counter() - self.started)
+
+
+_NOT_RECORDING = nullcontext()
+
+
+def timed(name):
+    """
+    Time a phase of the current request; does nothing when no request is recorded.
+
+    Used as `with timed('serialize'): ...`. Hooks sit on hot paths, so the
+    disabled case only looks up a context variable.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NOT_RECORDING
+    return _Phase(recorder, name)
+
+
+def bind(func, *args):
+    """
+    Wrap a call to run in another thread under the current request's recorder.
+
+    Executor threads do not inherit context variables on their own.
+    """
+    return functools.partial(contextvars.copy_context().run, func, *args)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with labels, kept in process memory.
+    """
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def expose(self):
+        """
+        The histogram in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, dict(values, buckets=list(values['buckets']))) for key, values in self._series.items())
+        for key, values in series:
+            labels = list(zip(self.labels, key))
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, values['buckets'] + [values['count']]):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', bound)])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {values['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {values['count']}")
+        return lines
+
+
+def _format_labels(labels):
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to handle a request.', ('route', 'method', 'status'), DURATION_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request.', ('route',), QUERY_COUNT_BUCKETS
+)
+REQUEST_SQL_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time per request spent in database queries.', ('route',), DURATION_BUCKETS
+)
+REQUEST_PHASE_DURATION = Histogram(
+    'http_request_phase_duration_seconds',
+    'Time per request spent in a phase: an insights agent, sentiment scoring or serialization.',
+    ('route', 'phase'),
+    DURATION_BUCKETS,
+)
+REQUEST_PEAK_ALLOCATED = Histogram(
+    'http_request_peak_allocated_bytes',
+    'Peak Python memory allocated while handling a request, when allocation tracing is on.',
+    ('route',),
+    ALLOCATION_BUCKETS,
+)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_DURATION, REQUEST_PHASE_DURATION, REQUEST_PEAK_ALLOCATED)
+
+
+def observe_request(recorder, route, method, status):
+    """
+    Add a finished request's recorder to the histograms.
+    """
+    REQUEST_DURATION.observe(recorder.duration, route=route, method=method, status=status)
+    REQUEST_QUERIES.observe(recorder.queries, route=route)
+    REQUEST_SQL_DURATION.observe(recorder.sql_time, route=route)
+    for phase, elapsed in recorder.phases.items():
+        REQUEST_PHASE_DURATION.observe(elapsed, route=route, phase=phase)
+    if recorder.peak_allocated is not None:
+        REQUEST_PEAK_ALLOCATED.observe(recorder.peak_allocated, route=route)
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return '\n'.join(lines) + '\n'
@@ -1,3 +1,1141 @@
-from django.test import TestCase
+import base64
+import csv
+import functools
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from multiprocessing import get_context
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+import numpy as np
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, NotSupportedError, connection, connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import telemetry
+from .benchmarking import compare_results
+from .cache import insights_key
+from .ingestion import upsert_objects, upsert_rows
+from .insight_state import StateInsightsGenerator, load_insight_state, rebuild_insight_states
+from .insights_generator import HealthInsightsGenerator
+from .middleware import TelemetryMiddleware
+from .management.commands import precompute_insights
+from .models import HealthMetric, SleepData, JournalEntry, InsightState, DataVersion, MetricRollup
+from .precompute import load_snapshot, pending_user_ids
+from .renderers import NumpyJSONRenderer
+from .rollups import ROLLUP_METRICS, _aggregate_buckets, rebuild_rollups
+from .routers import read_from_replica
+from .search import JOURNAL_FTS_INSERT_TRIGGER_NAME, deferred_search_index, search_journal_entries
+from .sentiment import score_text, score_texts
+from .serializers import HealthMetricSerializer, SleepDataSerializer, JournalEntrySerializer, values_serializer
+from .synthetic import SYNTHETIC_FIELDS, generate_block, generate_blocks, synthetic_user_ids, write_blocks
+from .trends import classify_trend, fit_trends
+from .versions import bump_data_versions
+
+JOURNAL_TEXTS = [
+    "Feeling happy and calm after a long walk.",
+    "Work stress is overwhelming, lots of worry today.",
+    "A quiet day, nothing special.",
+    "So excited for the weekend, pure joy!",
+    "Sad and frustrated, anxiety kept me up.",
+]
+
+
+class UserDateUniquenessTest(TestCase):
+    def test_one_row_per_user_and_day(self):
+        HealthMetric.objects.create(user_id='u1', date=date(2024, 1, 1), steps=1, heart_rate=60, sleep_hours=7, hrv=50)
+        SleepData.objects.create(user_id='u1', date=date(2024, 1, 1), duration=7, disturbances=0, sleep_quality=80)
+        JournalEntry.objects.create(user_id='u1', date=date(2024, 1, 1), entry='First')
+
+        duplicates = [
+            lambda: HealthMetric.objects.create(
+                user_id='u1', date=date(2024, 1, 1), steps=2, heart_rate=60, sleep_hours=7, hrv=50
+            ),
+            lambda: SleepData.objects.create(
+                user_id='u1', date=date(2024, 1, 1), duration=8, disturbances=0, sleep_quality=80
+            ),
+            lambda: JournalEntry.objects.create(user_id='u1', date=date(2024, 1, 1), entry='Second'),
+        ]
+        for create in duplicates:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                create()
+
+        # Other users and other days are unaffected
+        JournalEntry.objects.create(user_id='u2', date=date(2024, 1, 1), entry='Other user')
+        JournalEntry.objects.create(user_id='u1', date=date(2024, 1, 2), entry='Next day')
+        self.assertEqual(JournalEntry.objects.count(), 3)
+
+
+class UserDateMigrationTest(TransactionTestCase):
+    """
+    Migration 0002 collapses duplicate days, keeping the latest insert, before adding the unique indexes.
+    """
+    before = [('data_integration', '0001_initial')]
+    after = [('data_integration', '0002_user_date_indexes')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.executor.loader.build_graph()
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_collapse_to_the_latest_insert(self):
+        apps = self.executor.loader.project_state(self.before).apps
+        HealthMetric = apps.get_model('data_integration', 'HealthMetric')
+        JournalEntry = apps.get_model('data_integration', 'JournalEntry')
+        for steps in (1000, 2000, 3000):
+            HealthMetric.objects.create(user_id='u1', date=date(2024, 1, 1), steps=steps, heart_rate=60,
+                                        sleep_hours=7, hrv=50)
+        HealthMetric.objects.create(user_id='u1', date=date(2024, 1, 2), steps=4000, heart_rate=60,
+                                    sleep_hours=7, hrv=50)
+        HealthMetric.objects.create(user_id='u2', date=date(2024, 1, 1), steps=5000, heart_rate=60,
+                                    sleep_hours=7, hrv=50)
+        for text in ('Draft', 'Final'):
+            JournalEntry.objects.create(user_id='u1', date=date(2024, 1, 1), entry=text)
+
+        self.executor.migrate(self.after)
+
+        apps = self.executor.loader.project_state(self.after).apps
+        HealthMetric = apps.get_model('data_integration', 'HealthMetric')
+        JournalEntry = apps.get_model('data_integration', 'JournalEntry')
+        self.assertEqual(
+            sorted(HealthMetric.objects.values_list('user_id', 'date', 'steps')),
+            [('u1', date(2024, 1, 1), 3000), ('u1', date(2024, 1, 2), 4000), ('u2', date(2024, 1, 1), 5000)],
+        )
+        self.assertEqual(list(JournalEntry.objects.values_list('entry', flat=True)), ['Final'])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            JournalEntry.objects.create(user_id='u1', date=date(2024, 1, 1), entry='Duplicate')
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        list(write_blocks(generate_blocks(3, date(2024, 1, 1), 20), rebuild=False))
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()['results']])
+            url = response.json()['next']
+        return pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        # Three users share each date, so pages break between rows of the same day
+        pages = self.walk('/api/metrics/?page_size=7')
+        self.assertEqual([len(page) for page in pages], [7] * 8 + [4])
+        self.assertEqual(
+            [row_id for page in pages for row_id in page],
+            list(HealthMetric.objects.order_by('date', 'id').values_list('id', flat=True)),
+        )
+
+        filtered = self.walk('/api/sleep/?user_id=synthetic-0000001&start_date=2024-01-05&end_date=2024-01-14'
+                             '&page_size=4')
+        self.assertEqual(
+            [row_id for page in filtered for row_id in page],
+            list(SleepData.objects.filter(user_id='synthetic-0000001', date__range=['2024-01-05', '2024-01-14'])
+                 .order_by('date', 'id').values_list('id', flat=True)),
+        )
+
+    def test_opt_in_and_page_size_limits(self):
+        self.assertIsInstance(self.client.get('/api/journal/').json(), list)
+        self.assertEqual(len(self.client.get('/api/journal/?page_size=0').json()['results']), 60)
+        with self.settings(API_MAX_PAGE_SIZE=10):
+            self.assertEqual(len(self.client.get('/api/journal/?page_size=50').json()['results']), 10)
+
+    def test_invalid_cursors(self):
+        for payload in (b'[1]', b'"2024-01-01"', b'["2024-13-01", 1]', b'["2024-01-01", "x"]', b'{'):
+            cursor = base64.urlsafe_b64encode(payload).decode()
+            self.assertEqual(self.client.get(f'/api/metrics/?cursor={cursor}').status_code, 404, payload)
+        self.assertEqual(self.client.get('/api/metrics/?cursor=%%%').status_code, 404)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=4)
+class DataExportTest(TestCase):
+    def setUp(self):
+        list(write_blocks(generate_blocks(2, date(2024, 1, 1), 10), rebuild=False))
+
+    def test_ndjson_streams_every_row_in_chunks(self):
+        response = self.client.get('/api/export/journal/?user_id=synthetic-0000001&start_date=2024-01-03'
+                                   '&end_date=2024-01-09')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="journal.ndjson"')
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 2)
+
+        rows = [json.loads(line) for line in b''.join(chunks).splitlines()]
+        entries = JournalEntry.objects.filter(user_id='synthetic-0000001', date__range=['2024-01-03', '2024-01-09'])
+        self.assertEqual([row['id'] for row in rows], list(entries.order_by('date').values_list('id', flat=True)))
+        self.assertEqual(rows[0]['date'], '2024-01-03')
+        self.assertEqual(rows[0]['emotional_keywords'], entries.get(date=date(2024, 1, 3)).emotional_keywords)
+
+    def test_csv(self):
+        response = self.client.get('/api/export/sleep/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(lines[0], [field.attname for field in SleepData._meta.concrete_fields])
+        self.assertEqual(len(lines), 1 + SleepData.objects.count())
+        first = SleepData.objects.order_by('user_id', 'date', 'id').first()
+        self.assertEqual(lines[1][:3], [str(first.id), first.user_id, first.date.isoformat()])
+
+    def test_csv_writes_json_columns_as_json(self):
+        entry = JournalEntry.objects.filter(user_id='synthetic-0000000').order_by('date').first()
+        JournalEntry.objects.filter(id=entry.id).update(emotional_keywords=['happy', 'calm'])
+        params = '?user_id=synthetic-0000000&start_date=2024-01-01&end_date=2024-01-01'
+
+        response = self.client.get(f'/api/export/journal/{params}&format=csv')
+        header, row = csv.reader(b''.join(response.streaming_content).decode().splitlines())
+        keywords = row[header.index('emotional_keywords')]
+        self.assertEqual(keywords, '["happy","calm"]')
+
+        response = self.client.get(f'/api/export/journal/{params}')
+        exported = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(keywords), exported['emotional_keywords'])
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/export/steps/').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/metrics/?start_date=2024-01-01&end_date=soon').status_code,
+                         400)
+
+
+class IngestTest(TestCase):
+    def metric(self, day, **values):
+        return {'user_id': 'ingest-user', 'date': f'2024-01-{day:02d}', 'steps': 8000, 'heart_rate': 70,
+                'sleep_hours': 7.5, 'hrv': 50, **values}
+
+    def post(self, path, records):
+        return self.client.post(path, records, content_type='application/json')
+
+    def test_upsert_with_per_record_results(self):
+        existing = self.post('/api/metrics/', [self.metric(1)]).json()['results'][0]['id']
+
+        response = self.post('/api/metrics/', {'records': [
+            self.metric(1, steps=12000),
+            self.metric(2, steps=1),
+            self.metric(3, heart_rate='fast'),
+            self.metric(2, steps=2),
+            {'user_id': 'ingest-user'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual((summary['received'], summary['upserted'], summary['invalid']), (5, 2, 2))
+        results = summary['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['upserted', 'superseded', 'invalid', 'upserted', 'invalid'])
+        self.assertEqual(results[0]['id'], existing)
+        self.assertIn('heart_rate', results[2]['errors'])
+        self.assertEqual(set(results[4]['errors']), {'date', 'steps', 'heart_rate', 'sleep_hours', 'hrv'})
+
+        # The overwrite kept its row, and the last record for a day won
+        self.assertEqual(
+            list(HealthMetric.objects.order_by('date').values_list('id', 'steps')),
+            [(existing, 12000), (results[3]['id'], 2)],
+        )
+
+    def test_rejected_batches(self):
+        self.assertEqual(self.post('/api/sleep/', []).status_code, 400)
+        self.assertEqual(self.post('/api/sleep/', {'rows': [self.metric(1)]}).status_code, 400)
+        self.assertEqual(self.post('/api/metrics/', [self.metric(1, hrv=None)]).status_code, 400)
+        with self.settings(INGEST_MAX_BATCH_SIZE=2):
+            self.assertEqual(self.post('/api/metrics/', [self.metric(day) for day in (1, 2, 3)]).status_code, 413)
+        self.assertFalse(HealthMetric.objects.exists())
+
+    def test_journal_sentiment_computed_on_ingest(self):
+        self.post('/api/journal/', [{'user_id': 'ingest-user', 'date': '2024-01-01', 'entry': JOURNAL_TEXTS[0],
+                                     'polarity': -1.0, 'emotional_keywords': ['sad']}])
+        entry = JournalEntry.objects.get()
+        score = score_text(JOURNAL_TEXTS[0])
+        self.assertEqual((entry.polarity, entry.emotional_keywords), (score.polarity, score.emotional_keywords))
+
+
+class LoadMockDataTest(TestCase):
+    def write_file(self, directory, name, data):
+        path = os.path.join(directory, name)
+        with open(path, 'w') as file:
+            json.dump(data, file)
+        return path
+
+    def test_derived_data_rebuilt_once_after_the_load(self):
+        users = ['mock-1', 'mock-2']
+        days = [f'2024-01-0{day}' for day in range(1, 4)]
+        with tempfile.TemporaryDirectory() as directory:
+            files = {
+                'health_file': self.write_file(directory, 'health.json', {'user_id': 'mock-1', 'metrics': [
+                    {'user_id': user, 'date': day, 'steps': 8000, 'heart_rate': 70, 'sleep_hours': 7.5, 'hrv': 50}
+                    for user in users for day in days
+                ]}),
+                'sleep_file': self.write_file(directory, 'sleep.json', [
+                    {'user_id': user, 'date': day, 'duration': 7.5, 'disturbances': 1, 'sleep_quality': 80}
+                    for user in users for day in days
+                ]),
+                'journal_file': self.write_file(directory, 'journal.json', [
+                    {'user_id': user, 'date': day, 'entry': JOURNAL_TEXTS[0]} for user in users for day in days
+                ]),
+            }
+            with mock.patch('data_integration.signals.refresh_rollups') as refresh:
+                call_command('load_mock_data', batch_size=2, stdout=StringIO(), **files)
+
+        refresh.assert_not_called()
+        self.assertEqual(HealthMetric.objects.count(), 6)
+        self.assertEqual(JournalEntry.objects.filter(polarity__isnull=True).count(), 0)
+        self.assertEqual(
+            set(MetricRollup.objects.values_list('user_id', flat=True).distinct()), set(users)
+        )
+        self.assertEqual([state.journal_count for state in InsightState.objects.order_by('user_id')], [3, 3])
+        self.assertEqual(dict(DataVersion.objects.filter(user_id__in=users).values_list('user_id', 'version')),
+                         {'mock-1': 1, 'mock-2': 1})
+
+
+class BackfillJournalSentimentTest(TestCase):
+    def test_rescore_refreshes_derived_state(self):
+        entries = [JournalEntry(user_id='backfill-user', date=date(2024, 1, day), entry=text)
+                   for day, text in enumerate(JOURNAL_TEXTS, 1)]
+        upsert_objects(JournalEntry, entries)
+        expected = InsightState.objects.get(user_id='backfill-user')
+
+        # Scores from an older scoring model, with the state built on them
+        JournalEntry.objects.update(polarity=0.9, emotional_keywords=[])
+        rebuild_insight_states(user_ids=['backfill-user'])
+        version = DataVersion.objects.get(user_id='backfill-user').version
+
+        call_command('backfill_journal_sentiment', force=True, workers=1, stdout=StringIO())
+        state = InsightState.objects.get(user_id='backfill-user')
+        self.assertEqual(state.polarity_partials, expected.polarity_partials)
+        self.assertEqual(state.keyword_counts, expected.keyword_counts)
+        self.assertGreater(DataVersion.objects.get(user_id='backfill-user').version, version)
+
+
+class SentimentScoringTest(SimpleTestCase):
+    @override_settings(SENTIMENT_WORKERS=4, SENTIMENT_CHUNK_SIZE=2)
+    def test_request_paths_score_in_process(self):
+        with mock.patch('data_integration.sentiment.ProcessPoolExecutor') as pool:
+            scores = score_texts(JOURNAL_TEXTS)
+            entries = [JournalEntry(user_id='u', date=date(2024, 1, day), entry=text)
+                       for day, text in enumerate(JOURNAL_TEXTS, 1)]
+            polarities, keywords = HealthInsightsGenerator([], [], entries)._load_journal_scores()
+        pool.assert_not_called()
+        self.assertEqual(scores, [score_text(text) for text in JOURNAL_TEXTS])
+        self.assertEqual(list(polarities), [score.polarity for score in scores])
+
+
+class JournalSearchTest(TestCase):
+    def setUp(self):
+        JournalEntry.objects.bulk_create([
+            JournalEntry(user_id='u1', date=date(2024, 1, 1), entry='Felt anxious before the morning run'),
+            JournalEntry(user_id='u1', date=date(2024, 1, 2), entry='Slept well, woke up rested'),
+            JournalEntry(user_id='u1', date=date(2024, 1, 3), entry='Anxiety eased after a long walk'),
+            JournalEntry(user_id='u2', date=date(2024, 1, 3), entry='Morning run in the rain'),
+        ])
+
+    def search(self, **params):
+        return self.client.get('/api/journal/search/', params)
+
+    def dates(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [(entry['user_id'], entry['date']) for entry in response.json()]
+
+    def test_keywords_phrases_and_prefixes(self):
+        self.assertEqual(self.dates(self.search(q='run')), [('u2', '2024-01-03'), ('u1', '2024-01-01')])
+        self.assertEqual(self.dates(self.search(q='"morning run" anxious')), [('u1', '2024-01-01')])
+        self.assertEqual(self.dates(self.search(q='anxi*')), [('u1', '2024-01-03'), ('u1', '2024-01-01')])
+        self.assertEqual(self.dates(self.search(q='"run morning"')), [])
+
+    def test_user_date_and_limit_filters(self):
+        self.assertEqual(self.dates(self.search(q='run', user_id='u2')), [('u2', '2024-01-03')])
+        self.assertEqual(self.dates(self.search(q='anxi*', start_date='2024-01-02', end_date='2024-01-31')), [('u1', '2024-01-03')])
+        self.assertEqual(self.dates(self.search(q='run', limit=1)), [('u2', '2024-01-03')])
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.search(q='  ').status_code, 400)
+        self.assertEqual(self.search(q='*').status_code, 400)
+        self.assertEqual(self.search(q='run', limit='many').status_code, 400)
+        self.assertEqual(self.dates(self.search(q='run OR NOT ("')), [])
+
+    def test_index_follows_writes(self):
+        entry = JournalEntry.objects.get(user_id='u1', date=date(2024, 1, 2))
+        entry.entry = 'Restless night, anxious thoughts'
+        entry.save()
+        self.assertEqual(self.dates(self.search(q='rested')), [])
+        self.assertEqual(self.dates(self.search(q='restless')), [('u1', '2024-01-02')])
+
+        upsert_objects(JournalEntry, [
+            JournalEntry(user_id='u2', date=date(2024, 1, 3), entry='Quiet evening with tea'),
+        ])
+        self.assertEqual(self.dates(self.search(q='tea')), [('u2', '2024-01-03')])
+        self.assertEqual(self.dates(self.search(q='rain')), [])
+
+        JournalEntry.objects.filter(user_id='u1', date=date(2024, 1, 2)).delete()
+        self.assertEqual(self.dates(self.search(q='restless')), [])
+
+    def test_deferred_index_recreates_the_migration_trigger(self):
+        def trigger_sql():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+                    [JOURNAL_FTS_INSERT_TRIGGER_NAME]
+                )
+                return cursor.fetchone()
+
+        created_by_migration = trigger_sql()
+        with deferred_search_index():
+            self.assertIsNone(trigger_sql())
+            JournalEntry.objects.create(user_id='u3', date=date(2024, 1, 4), entry='Loaded in bulk')
+
+        self.assertEqual(trigger_sql(), created_by_migration)
+        self.assertEqual(self.dates(self.search(q='bulk')), [('u3', '2024-01-04')])
+
+    def test_other_databases_are_refused(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            with self.assertRaises(NotSupportedError):
+                search_journal_entries(JournalEntry.objects.all(), 'run')
+            response = self.search(q='run')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('error', response.json())
+
+
+class RollupRefreshTest(TestCase):
+    fields = ['user_id', 'date', 'steps', 'heart_rate', 'sleep_hours', 'hrv']
+
+    def setUp(self):
+        list(write_blocks(generate_blocks(2, date(2024, 1, 1), 120)))
+
+    def rollups(self):
+        return sorted(MetricRollup.objects.values_list(
+            'user_id', 'period', 'period_start', 'metric', 'count', 'sum', 'min', 'max', 'sum_squares'
+        ))
+
+    def test_refresh_matches_rebuild_and_reads_only_touched_periods(self):
+        aggregated = []
+
+        def aggregate(model, period, queryset):
+            aggregated.append(queryset.count())
+            return _aggregate_buckets(model, period, queryset)
+
+        # A backdated overwrite and a new day, three months apart, plus a deletion
+        with mock.patch('data_integration.rollups._aggregate_buckets', side_effect=aggregate):
+            upsert_rows(HealthMetric, self.fields, [
+                ('synthetic-0000000', '2024-01-10', 20000, 50, 9.0, 80),
+                ('synthetic-0000000', '2024-05-01', 1000, 90, 4.0, 20),
+            ])
+            HealthMetric.objects.get(user_id='synthetic-0000001', date=date(2024, 2, 14)).delete()
+        # Weekly then monthly: for the upsert, two weeks (7 days, and April 29
+        # to May 1) and two months (31 days and 1) of one user; for the
+        # deletion, the rest of one week and one month of the other
+        self.assertEqual(aggregated, [7 + 2, 31 + 1, 6, 28])
+
+        refreshed = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(refreshed, self.rollups())
+
+    def test_emptied_bucket_removed(self):
+        HealthMetric.objects.filter(user_id='synthetic-0000000', date__month=3).delete()
+        march = MetricRollup.objects.filter(
+            user_id='synthetic-0000000', period=MetricRollup.MONTHLY, period_start=date(2024, 3, 1)
+        )
+        self.assertFalse(march.filter(metric__in=ROLLUP_METRICS[HealthMetric]).exists())
+        self.assertTrue(march.filter(metric__in=ROLLUP_METRICS[SleepData]).exists())
+
+    def test_rebuild_is_all_or_nothing(self):
+        before = self.rollups()
+        with mock.patch('data_integration.rollups._insert_rows', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                rebuild_rollups()
+        self.assertEqual(self.rollups(), before)
+
+
+class InsightsCacheTest(TestCase):
+    path = '/api/insights/?user_id=synthetic-0000000&start_date=2024-01-01&end_date=2024-01-10'
+
+    def setUp(self):
+        caches[settings.INSIGHTS_CACHE_ALIAS].clear()
+        list(write_blocks(generate_blocks(2, date(2024, 1, 1), 10), rebuild=False))
+
+    def test_hit_until_the_user_writes(self):
+        self.assertEqual(self.client.get(self.path)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.path)['X-Cache'], 'HIT')
+
+        # Another user's write leaves the entry alone
+        other = [{'user_id': 'synthetic-0000001', 'date': '2024-01-05', 'steps': 1000, 'heart_rate': 90,
+                  'sleep_hours': 5.0, 'hrv': 30}]
+        self.client.post('/api/metrics/', other, content_type='application/json')
+        self.assertEqual(self.client.get(self.path)['X-Cache'], 'HIT')
+
+        own = [dict(other[0], user_id='synthetic-0000000')]
+        self.client.post('/api/metrics/', own, content_type='application/json')
+        self.assertEqual(self.client.get(self.path)['X-Cache'], 'MISS')
+
+    def test_write_in_another_process(self):
+        self.client.get(self.path)
+        # All another process leaves behind is the moved data version
+        bump_data_versions(['synthetic-0000000'])
+        self.assertEqual(self.client.get(self.path)['X-Cache'], 'MISS')
+
+
+class InsightStateParityTest(TestCase):
+    """
+    Insights computed from the running InsightState must match the batch
+    computation over the user's rows, however the rows were written.
+    """
+    user_id = 'parity-user'
+
+    def setUp(self):
+        self.rng = random.Random(42)
+        self.start = date(2024, 1, 1)
+
+    def health_metric(self, day):
+        return HealthMetric(
+            user_id=self.user_id, date=self.start + timedelta(days=day),
+            steps=self.rng.randint(2000, 15000), heart_rate=self.rng.randint(55, 95),
+            sleep_hours=round(self.rng.uniform(4, 9), 1), hrv=self.rng.randint(20, 90),
+        )
+
+    def sleep_row(self, day):
+        return (
+            self.user_id, (self.start + timedelta(days=day)).isoformat(),
+            round(self.rng.uniform(4, 9), 2), self.rng.randint(0, 5), round(self.rng.uniform(30, 95), 1),
+        )
+
+    def journal_entry(self, day):
+        return JournalEntry(
+            user_id=self.user_id, date=self.start + timedelta(days=day),
+            entry=' '.join(self.rng.sample(JOURNAL_TEXTS, k=2)),
+        )
+
+    def assertParity(self, agents=('generate_fitness_insights', 'generate_sleep_insights',
+                                   'analyze_journal_sentiments', 'generate_holistic_insights')):
+        batch = HealthInsightsGenerator(
+            HealthMetric.objects.filter(user_id=self.user_id),
+            SleepData.objects.filter(user_id=self.user_id),
+            JournalEntry.objects.filter(user_id=self.user_id),
+        )
+        state = StateInsightsGenerator(InsightState.objects.get(user_id=self.user_id))
+
+        for agent in agents:
+            self.assertEqual(getattr(state, agent)(), getattr(batch, agent)(), agent)
+
+    def test_appends(self):
+        for day in range(20):
+            self.health_metric(day).save()
+            self.journal_entry(day).save()
+        upsert_rows(
+            SleepData, ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality'],
+            [self.sleep_row(day) for day in range(20)]
+        )
+        self.assertParity()
+
+    @override_settings(TREND_WINDOW=7)
+    def test_out_of_order_writes_overwrites_and_deletes(self):
+        upsert_objects(HealthMetric, [self.health_metric(day) for day in range(10, 30)])
+        upsert_objects(HealthMetric, [self.health_metric(day) for day in range(0, 10)])
+        upsert_objects(HealthMetric, [self.health_metric(day) for day in [0, 15, 29]])
+        HealthMetric.objects.filter(user_id=self.user_id, date=self.start + timedelta(days=29)).delete()
+
+        upsert_objects(JournalEntry, [self.journal_entry(day) for day in [5, 1, 3]])
+        upsert_objects(JournalEntry, [self.journal_entry(day) for day in [2, 8]])
+        JournalEntry.objects.filter(user_id=self.user_id, date=self.start + timedelta(days=1)).delete()
+
+        for day in [4, 2, 9]:
+            upsert_rows(
+                SleepData, ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality'], [self.sleep_row(day)]
+            )
+        self.assertParity()
+
+    def test_unscored_journal_entries(self):
+        upsert_objects(HealthMetric, [self.health_metric(0)])
+        upsert_rows(SleepData, ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality'], [self.sleep_row(0)])
+        upsert_rows(
+            JournalEntry, ['user_id', 'date', 'entry'],
+            [(self.user_id, (self.start + timedelta(days=day)).isoformat(), JOURNAL_TEXTS[day]) for day in range(5)]
+        )
+        self.assertParity()
+
+    def test_synthetic_users(self):
+        # Written a month at a time, so most writes are folded into the running state
+        user_ids, rows = next(generate_blocks(20, self.start, 120))
+        for first_day in range(0, 120, 30):
+            days = {(self.start + timedelta(days=day)).isoformat() for day in range(first_day, first_day + 30)}
+            for model, model_rows in rows.items():
+                upsert_rows(model, SYNTHETIC_FIELDS[model], [row for row in model_rows if str(row[1]) in days])
+
+        for user_id in user_ids:
+            self.user_id = user_id
+            self.assertParity()
+
+    def test_empty_datasets(self):
+        self.health_metric(0).save()
+        # Holistic insights need sleep data
+        self.assertParity(agents=('generate_fitness_insights', 'generate_sleep_insights', 'analyze_journal_sentiments'))
+
+    def test_rebuild_matches_incremental(self):
+        for day in range(15):
+            self.health_metric(day).save()
+            self.journal_entry(day).save()
+        upsert_rows(
+            SleepData, ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality'],
+            [self.sleep_row(day) for day in range(15)]
+        )
+        incremental = InsightState.objects.get(user_id=self.user_id)
+
+        InsightState.objects.all().delete()
+        rebuild_insight_states()
+        rebuilt = InsightState.objects.get(user_id=self.user_id)
+        for field in ['health_count', 'health_window', 'sleep_count', 'duration_partials', 'sleep_quality_partials',
+                      'journal_count', 'polarity_partials', 'positive_count', 'negative_count', 'keyword_counts']:
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field), field)
+
+    def test_state_created_on_first_read(self):
+        upsert_objects(HealthMetric, [self.health_metric(day) for day in range(3)])
+        upsert_objects(JournalEntry, [self.journal_entry(day) for day in range(3)])
+        upsert_rows(SleepData, ['user_id', 'date', 'duration', 'disturbances', 'sleep_quality'], [self.sleep_row(1)])
+        InsightState.objects.all().delete()
+        self.assertEqual(load_insight_state(self.user_id).health_count, 3)
+        self.assertParity()
+
+    def test_no_state_for_unknown_users(self):
+        for path in ('/api/insights/?user_id=nobody', '/api/insights/async/?user_id=nobody'):
+            self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertIsNone(load_insight_state('nobody'))
+        self.assertFalse(InsightState.objects.exists())
+
+
+class PopulationAnalyticsTest(TestCase):
+    def setUp(self):
+        caches[settings.POPULATION_CACHE_ALIAS].clear()
+        metrics = []
+        for position in range(5):
+            steps = 1000 * (position + 1)
+            metrics += [
+                HealthMetric(user_id=f'u{position}', date=date(2024, 1, 10), steps=steps,
+                             heart_rate=60, sleep_hours=7.0, hrv=50),
+                HealthMetric(user_id=f'u{position}', date=date(2024, 1, 11), steps=steps + 200,
+                             heart_rate=60, sleep_hours=7.0, hrv=50),
+            ]
+        metrics.append(HealthMetric(user_id='u0', date=date(2024, 2, 1), steps=9000,
+                                    heart_rate=60, sleep_hours=7.0, hrv=50))
+        upsert_objects(HealthMetric, metrics)
+
+    def population(self, **params):
+        return self.client.get('/api/population/', {'metric': 'steps', **params})
+
+    def test_percentiles_histogram_and_rank(self):
+        # Whole months merge the rollups, other windows average the rows: same means
+        for start_date, end_date in [('2024-01-01', '2024-01-31'), ('2024-01-10', '2024-01-11')]:
+            response = self.population(start_date=start_date, end_date=end_date, user_id='u1', bins=4)
+            self.assertEqual(response.status_code, 200)
+            steps = response.json()['metrics']['steps']
+            self.assertEqual(steps['users'], 5)
+            self.assertEqual(steps['mean'], 3100)
+            self.assertEqual(steps['percentiles'], {
+                'p5': 1300, 'p10': 1500, 'p25': 2100, 'p50': 3100, 'p75': 4100, 'p90': 4700, 'p95': 4900,
+            })
+            self.assertEqual(steps['histogram'], {
+                'bin_edges': [1100, 2100, 3100, 4100, 5100], 'counts': [1, 1, 1, 2],
+            })
+            self.assertEqual(steps['user'], {'value': 2100, 'rank': 4, 'percentile_rank': 30.0})
+
+    def test_windows_and_unknown_users(self):
+        steps = self.population(start_date='2024-02-01', end_date='2024-02-29', user_id='u4').json()['metrics']['steps']
+        self.assertEqual(steps['users'], 1)
+        self.assertEqual(steps['percentiles']['p50'], 9000)
+        self.assertIsNone(steps['user'])
+
+        summary = self.client.get('/api/population/').json()['metrics']
+        self.assertEqual(set(summary), {'steps', 'heart_rate', 'hrv', 'sleep_hours', 'duration', 'sleep_quality'})
+        self.assertEqual(summary['heart_rate']['percentiles']['p50'], 60)
+        self.assertEqual(summary['duration']['users'], 0)
+        self.assertEqual(len(summary['steps']['histogram']['counts']), settings.POPULATION_HISTOGRAM_BINS)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.population(metric='mood').status_code, 400)
+        self.assertEqual(self.population(bins='many').status_code, 400)
+        self.assertEqual(self.population(start_date='2024-01-01', end_date='January').status_code, 400)
+
+
+class TrendKernelTest(SimpleTestCase):
+    def test_matches_per_series_least_squares(self):
+        rng = np.random.default_rng(0)
+        series = [rng.normal(100, 15, size) for size in [0, 1, 2, 5, 30, 45, 90]]
+        fits = fit_trends(series, window=30)
+
+        for values, fit in zip(series, fits):
+            tail = values[-30:]
+            self.assertEqual(fit.count, len(tail))
+            if len(tail) >= 2:
+                slope, intercept = np.polyfit(np.arange(len(tail)), tail, 1)
+                self.assertAlmostEqual(fit.slope, slope)
+                self.assertAlmostEqual(fit.forecast, intercept + slope * len(tail))
+            elif len(tail) == 1:
+                self.assertEqual((fit.slope, fit.forecast), (0.0, tail[0]))
+
+    def test_classification(self):
+        rising, falling, flat, single, empty = fit_trends(
+            [[1, 2, 3, 4], [4, 3, 2, 1], [100, 100.1, 99.9, 100], [7], []], window=30
+        )
+        self.assertEqual(classify_trend(rising), 'increasing')
+        self.assertEqual(classify_trend(falling), 'decreasing')
+        self.assertEqual(classify_trend(flat), 'stable')
+        self.assertEqual(classify_trend(single), 'stable')
+        self.assertEqual(classify_trend(empty), 'insufficient_data')
+
+
+class LazyImportTest(SimpleTestCase):
+    def test_startup_skips_analytics_stack(self):
+        # A fresh interpreter: this test process has long since imported NumPy
+        script = (
+            "import sys, django; django.setup(); import data_integration.urls; "
+            "print(' '.join(name for name in ('numpy', 'textblob') if name in sys.modules))"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'mind_body_connection.settings', 'ANALYTICS_WARMUP': '0'}
+        completed = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(completed.stdout.strip(), '')
+
+
+class BenchmarkComparisonTest(SimpleTestCase):
+    def test_flags_only_significant_slowdowns(self):
+        baseline = {
+            'slower': {'median_ms': 10.0},
+            'noise': {'median_ms': 0.1},
+            'faster': {'median_ms': 10.0},
+            'removed': {'median_ms': 1.0},
+        }
+        results = {
+            'slower': {'median_ms': 15.0},
+            'noise': {'median_ms': 0.5},
+            'faster': {'median_ms': 5.0},
+            'added': {'median_ms': 1.0},
+        }
+        comparisons = {row['name']: row for row in compare_results(baseline, results, threshold=0.2)}
+
+        self.assertEqual(set(comparisons), {'slower', 'noise', 'faster'})
+        self.assertTrue(comparisons['slower']['regression'])
+        self.assertEqual(comparisons['slower']['change'], 0.5)
+        self.assertFalse(comparisons['noise']['regression'])
+        self.assertFalse(comparisons['faster']['regression'])
+
+
+class AsyncInsightsViewTest(TestCase):
+    """
+    The async insights view must answer exactly like /api/insights/.
+    """
+    def setUp(self):
+        list(write_blocks(generate_blocks(20, date(2024, 1, 1), 120)))
+
+    def insights(self, path, **params):
+        # Both views share the insights cache
+        caches[settings.INSIGHTS_CACHE_ALIAS].clear()
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_same_insights_as_the_sync_view(self):
+        windows = [{}, {'start_date': '2024-02-10', 'end_date': '2024-03-20'}]
+        for user_id in synthetic_user_ids(20):
+            for window in windows:
+                for agent in (None, 'fitness', 'sleep', 'journal'):
+                    params = {'user_id': user_id, **window, **({'agent': agent} if agent else {})}
+                    with self.subTest(**params):
+                        self.assertEqual(
+                            self.insights('/api/insights/async/', **params), self.insights('/api/insights/', **params)
+                        )
+
+    def test_full_history_state_matches_the_rows(self):
+        # Without a window the insights come from the running state, with one from the rows
+        everything = {'start_date': '2024-01-01', 'end_date': '2024-04-29'}
+        for user_id in synthetic_user_ids(20):
+            for path in ('/api/insights/', '/api/insights/async/'):
+                with self.subTest(user_id=user_id, path=path):
+                    self.assertEqual(
+                        self.insights(path, user_id=user_id), self.insights(path, user_id=user_id, **everything)
+                    )
+
+
+class PrecomputeInsightsTest(TestCase):
+    def setUp(self):
+        list(write_blocks(generate_blocks(3, date(2024, 1, 1), 20)))
+
+    def test_spawned_workers_and_snapshot_freshness(self):
+        # The start method outside Linux: workers begin without Django set up
+        spawn_pool = functools.partial(ProcessPoolExecutor, mp_context=get_context('spawn'))
+        with mock.patch.object(precompute_insights, 'ProcessPoolExecutor', spawn_pool):
+            call_command('precompute_insights', workers=2, chunk_size=1, stdout=StringIO())
+
+        user_id = 'synthetic-0000000'
+        state = load_insight_state(user_id)
+        snapshot = load_snapshot(state)
+        self.assertEqual(snapshot, json.loads(NumpyJSONRenderer().render(
+            StateInsightsGenerator(state).generate_holistic_insights()
+        )))
+        self.assertEqual(load_snapshot(state, 'sleep'), snapshot['sleep_insights'])
+
+        # A write makes the snapshot older than the data, until the next run
+        upsert_rows(HealthMetric, ['user_id', 'date', 'steps', 'heart_rate', 'sleep_hours', 'hrv'],
+                    [(user_id, '2024-02-01', 9000, 60, 8.0, 70)])
+        self.assertIsNone(load_snapshot(load_insight_state(user_id)))
+        self.assertEqual(pending_user_ids(), [user_id])
+        call_command('precompute_insights', workers=1, stdout=StringIO())
+        self.assertIsNotNone(load_snapshot(load_insight_state(user_id)))
+
+
+class SyntheticDataTest(TestCase):
+    def generate(self, **options):
+        return generate_block(0, synthetic_user_ids(3), date(2024, 1, 1), 30, **options)
+
+    def test_deterministic_for_a_seed(self):
+        self.assertEqual(self.generate(seed=7), self.generate(seed=7))
+        self.assertNotEqual(self.generate(seed=7)[HealthMetric], self.generate(seed=8)[HealthMetric])
+
+    def test_sentiment_shifts_journal_polarity(self):
+        def mean_polarity(sentiment):
+            return np.mean([row[4] for row in self.generate(sentiment=sentiment)[JournalEntry]])
+
+        self.assertLess(mean_polarity(-1), mean_polarity(0))
+        self.assertLess(mean_polarity(0), mean_polarity(1))
+        self.assertEqual(self.generate(journal_rate=0)[JournalEntry], [])
+
+    def test_deferred_search_index(self):
+        rows = self.generate()
+        with deferred_search_index():
+            for model, model_rows in rows.items():
+                upsert_rows(model, SYNTHETIC_FIELDS[model], model_rows, notify=False)
+
+        self.assertEqual(HealthMetric.objects.count(), 90)
+        happy = JournalEntry.objects.filter(entry__icontains='happy').count()
+        self.assertGreater(happy, 0)
+        self.assertEqual(search_journal_entries(JournalEntry.objects.all(), 'happy').count(), happy)
+
+        # The insert trigger is back in place for ordinary writes
+        JournalEntry.objects.create(user_id='later', date=date(2024, 3, 1), entry='Serendipitous afternoon')
+        self.assertEqual(search_journal_entries(JournalEntry.objects.all(), 'serendipitous').count(), 1)
+
+
+class TelemetryTest(TestCase):
+    insights_path = '/api/insights/?user_id=synthetic-0000000&start_date=2024-01-01&end_date=2024-01-30'
+
+    def setUp(self):
+        caches[settings.INSIGHTS_CACHE_ALIAS].clear()
+        list(write_blocks(generate_blocks(1, date(2024, 1, 1), 30)))
+
+    @override_settings(TELEMETRY_ENABLED=True)
+    def test_server_timing_and_histograms(self):
+        response = self.client.get(self.insights_path)
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for entry in ('db;dur=', 'agent-fitness;dur=', 'agent-sleep;dur=', 'agent-journal;dur=', 'serialize;dur=',
+                      'total;dur='):
+            self.assertIn(entry, timing)
+
+        metrics = self.client.get('/api/telemetry/')
+        self.assertEqual(metrics['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = metrics.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_phase_duration_seconds_count{route="api/insights/",phase="agent-fitness"}', body)
+
+    @override_settings(TELEMETRY_ENABLED=True)
+    async def test_async_requests(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(TelemetryMiddleware(get_response)))
+        # The test database connection was opened before telemetry started
+        await sync_to_async(telemetry.count_queries)()
+
+        response = await self.async_client.get(self.insights_path.replace('/insights/', '/insights/async/'))
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertNotIn('desc="0 queries"', timing)
+        for entry in ('agent-fitness;dur=', 'agent-sleep;dur=', 'agent-journal;dur=', 'serialize;dur='):
+            self.assertIn(entry, timing)
+
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.insights_path))
+        self.assertEqual(self.client.get('/api/telemetry/').status_code, 404)
+
+
+class ColumnarFormatTest(TestCase):
+    path = '/api/journal/?user_id=synthetic-0000001'
+
+    def setUp(self):
+        list(write_blocks(generate_blocks(2, date(2024, 1, 1), 20), rebuild=False))
+
+    def test_same_rows_as_json(self):
+        rows = self.client.get(self.path).json()
+        columns = self.client.get(self.path, HTTP_ACCEPT='application/vnd.mindbody.columnar+json').json()
+        self.assertEqual(list(columns), list(rows[0]))
+        self.assertEqual([dict(zip(columns, values)) for values in zip(*columns.values())], rows)
+
+        packed = self.client.get(self.path + '&format=msgpack')
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(packed.content), columns)
+
+    def test_pages(self):
+        first = self.client.get('/api/metrics/?page_size=25&format=columnar').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(first['results']['id']), 25)
+        self.assertEqual(len(second['results']['id']), 15)
+        self.assertIsNone(second['next'])
+
+        rows = self.client.get('/api/metrics/?page_size=40').json()['results']
+        self.assertEqual(first['results']['date'] + second['results']['date'], [row['date'] for row in rows])
+
+    def test_empty(self):
+        columns = self.client.get('/api/sleep/?user_id=nobody&format=columnar').json()
+        self.assertEqual(columns, {field: [] for field in ('id', 'user_id', 'date', 'duration', 'disturbances',
+                                                             'sleep_quality')})
+
+
+class FastReadPathTest(TestCase):
+    def setUp(self):
+        list(write_blocks(generate_blocks(2, date(2024, 1, 1), 10), rebuild=False))
+        # Not yet scored: null sentiment columns
+        upsert_rows(JournalEntry, ['user_id', 'date', 'entry'], [('unscored', '2024-01-01', 'No scores yet')],
+                    notify=False)
+
+    def test_matches_model_serializers(self):
+        renderer = JSONRenderer()
+        for serializer_class in (HealthMetricSerializer, SleepDataSerializer, JournalEntrySerializer):
+            queryset = serializer_class.Meta.model.objects.order_by('id')
+            serializer = values_serializer(serializer_class)
+            self.assertEqual(
+                renderer.render(serializer.data(serializer.values_list(queryset))),
+                renderer.render(serializer_class(queryset, many=True).data),
+                serializer_class.__name__,
+            )
+
+    def test_numpy_renderer(self):
+        data = {'mean': np.float64(6.5), 'count': np.int64(3), 'flag': np.bool_(True), 'series': np.arange(3)}
+        self.assertEqual(NumpyJSONRenderer().render(data), b'{"mean":6.5,"count":3,"flag":true,"series":[0,1,2]}')
+
+
+class ConditionalGetTest(TestCase):
+    user_path = '/api/metrics/?user_id=synthetic-0000000'
+
+    def setUp(self):
+        caches[settings.INSIGHTS_CACHE_ALIAS].clear()
+        list(write_blocks(generate_blocks(2, date(2024, 1, 1), 10), rebuild=False))
+
+    def assertNotModified(self, path, response, **headers):
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_not_modified_until_the_data_changes(self):
+        response = self.client.get(self.user_path)
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(self.user_path, response)
+        self.assertEqual(
+            self.client.get(self.user_path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        # Another representation of the same data has its own ETag
+        columnar = self.client.get(self.user_path + '&format=columnar')
+        self.assertNotEqual(columnar['ETag'], response['ETag'])
+
+        # Writes to another user leave this user's ETag alone, but not the all-users one
+        everyone = self.client.get('/api/metrics/')
+        self.client.post('/api/metrics/', [{'user_id': 'synthetic-0000001', 'date': '2024-02-01', 'steps': 5000,
+                                             'heart_rate': 70, 'sleep_hours': 7.0, 'hrv': 50}],
+                         content_type='application/json')
+        self.assertNotModified(self.user_path, response)
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_IF_NONE_MATCH=everyone['ETag']).status_code, 200)
+
+        HealthMetric.objects.filter(user_id='synthetic-0000000').first().delete()
+        changed = self.client.get(self.user_path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_insights(self):
+        path = '/api/insights/?user_id=synthetic-0000000&start_date=2024-01-01&end_date=2024-01-10'
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotModified(path, response)
+
+        async_path = path.replace('/insights/', '/insights/async/')
+        self.assertNotModified(async_path, self.client.get(async_path))
+
+        # Recomputed insights read the same, recommendation included
+        caches[settings.INSIGHTS_CACHE_ALIAS].clear()
+        self.assertEqual(self.client.get(path).content, response.content)
+
+    def test_cached_insights_follow_the_etag_version(self):
+        path = '/api/insights/?user_id=synthetic-0000000&start_date=2024-01-01&end_date=2024-01-10'
+        before = self.client.get(path)
+        version = DataVersion.objects.get(user_id='synthetic-0000000').version
+        stale = {'stale': True}
+        caches[settings.INSIGHTS_CACHE_ALIAS].set(
+            insights_key('synthetic-0000000', version, date(2024, 1, 1), date(2024, 1, 10)), stale
+        )
+        self.assertEqual(self.client.get(path).json(), stale)
+
+        self.client.post('/api/metrics/', [{'user_id': 'synthetic-0000000', 'date': '2024-01-05', 'steps': 100000,
+                                             'heart_rate': 70, 'sleep_hours': 7.0, 'hrv': 50}],
+                         content_type='application/json')
+        # The entry of the older version must not be served under the new ETag
+        after = self.client.get(path)
+        self.assertEqual(after['X-Cache'], 'MISS')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertNotEqual(after.json(), stale)
+        self.assertNotEqual(after.content, before.content)
+
+        cached = self.client.get(path)
+        self.assertEqual((cached['X-Cache'], cached['ETag'], cached.content), ('HIT', after['ETag'], after.content))
+        self.assertNotModified(path, after)
+
+
+class DatabaseProfileTest(SimpleTestCase):
+    def test_production_pragmas_set_on_connect(self):
+        profile = settings.DATABASE_PROFILES['production']
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = type(connections['default'])(
+                {**connections['default'].settings_dict, **profile, 'NAME': os.path.join(directory, 'db.sqlite3')},
+                alias='profile-test',
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'cache_size', 'busy_timeout'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal', 'synchronous': 1,
+            'cache_size': profile['PRAGMAS']['cache_size'], 'busy_timeout': profile['PRAGMAS']['busy_timeout'],
+        })
+
+
+@override_settings(DATABASE_REPLICAS={'replica-a': 3, 'replica-b': 1}, DATABASE_PRIMARY_PIN_SECONDS=15)
+class ReplicaRoutingTest(TestCase):
+    """
+    Routing decisions only: the replica aliases are never connected to.
+    """
+
+    class ReadView:
+        @read_from_replica
+        def get(self, request, write=False):
+            before = HealthMetric.objects.all().db
+            if write:
+                DataVersion.objects.filter(user_id='nobody').update(version=0)
+            return before, HealthMetric.objects.all().db
+
+    def setUp(self):
+        list(write_blocks(generate_blocks(1, date(2024, 1, 1), 5), rebuild=False))
+        self.request = RequestFactory().get('/', {'user_id': 'synthetic-0000000'})
+
+    def settle(self):
+        DataVersion.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def test_reads_from_replica_until_the_request_writes(self):
+        self.settle()
+        self.assertEqual(HealthMetric.objects.all().db, 'default')
+        with override_settings(DATABASE_REPLICA_SELECTION='round_robin'):
+            chosen = [self.ReadView().get(self.request)[0] for _ in range(4)]
+        self.assertEqual(set(chosen), {'replica-a', 'replica-b'})
+        self.assertEqual(chosen[0::2], [chosen[0]] * 2)
+
+        before, after = self.ReadView().get(self.request, write=True)
+        self.assertIn(before, {'replica-a', 'replica-b'})
+        self.assertEqual(after, 'default')
+        self.assertEqual(HealthMetric.objects.all().db, 'default')
+
+    def test_recent_writes_read_from_primary(self):
+        self.assertEqual(self.ReadView().get(self.request), ('default', 'default'))
+        self.settle()
+        self.assertNotEqual(self.ReadView().get(self.request)[0], 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica-a', 'data_integration'))
+        self.assertTrue(router.allow_migrate('default', 'data_integration'))
+
+
+@override_settings(DATABASE_REPLICAS={'replica-test': 1}, DATABASE_PRIMARY_PIN_SECONDS=15)
+class ReplicaReadTest(TestCase):
+    """
+    Reads against a real replica: a second SQLite file holding fewer rows,
+    and an older data version, than the primary, like a lagging copy.
+    """
+    replica = 'replica-test'
+    user_id = 'synthetic-0000000'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, 'replica.sqlite3')
+        # The schema of the test database, copied before any test writes to it
+        primary = connections['default']
+        primary.ensure_connection()
+        primary.connection.backup(sqlite3.connect(path))
+        super().setUpClass()
+        # Registered after the test transactions are opened, so the replica
+        # stays outside them, as a separate server would
+        connections.settings[cls.replica] = {**primary.settings_dict, 'NAME': path}
+        cls.databases = cls.databases | {cls.replica}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del connections.settings[cls.replica]
+        cls.databases = cls.databases - {cls.replica}
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        list(write_blocks(generate_blocks(1, date(2024, 1, 1), 10), rebuild=False))
+        DataVersion.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        # Five days behind, at the version before the primary's
+        version = DataVersion.objects.get(user_id=self.user_id)
+        self.copy_to_replica(
+            HealthMetric.objects.filter(date__lt=date(2024, 1, 6)), version.version - 1, version.updated_at
+        )
+
+    def copy_to_replica(self, metrics, version, updated_at):
+        HealthMetric.objects.using(self.replica).all().delete()
+        HealthMetric.objects.using(self.replica).bulk_create(metrics)
+        DataVersion.objects.using(self.replica).update_or_create(
+            user_id=self.user_id, defaults={'version': version, 'updated_at': updated_at}
+        )
+
+    def catch_up(self):
+        version = DataVersion.objects.get(user_id=self.user_id)
+        self.copy_to_replica(HealthMetric.objects.all(), version.version, version.updated_at)
+
+    def test_validators_come_from_the_replica_read(self):
+        path = f'/api/metrics/?user_id={self.user_id}'
+        lagging = self.client.get(path)
+        self.assertEqual(len(lagging.json()), 5)
+        with self.assertNumQueries(1, using=self.replica):
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=lagging['ETag']).status_code, 304)
+
+        # Once the replica catches up, the validator of the lagging body no longer matches
+        self.catch_up()
+        current = self.client.get(path, HTTP_IF_NONE_MATCH=lagging['ETag'])
+        self.assertEqual(current.status_code, 200)
+        self.assertEqual(len(current.json()), 10)
+
+    def test_export_streams_from_the_replica(self):
+        response = self.client.get(f'/api/export/metrics/?user_id={self.user_id}')
+        with self.assertNumQueries(1, using=self.replica):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 5)
@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+
+
+TrendFit = namedtuple('TrendFit', ['count', 'slope', 'forecast', 'mean'])
+
+
+def pad_series(series, window):
+    """
+    Stack the last `window` readings of each series into a padded matrix.
+
+    :param series: Sequence of 1-D arrays of possibly different lengths
+    :return: Tuple of (values, mask), both of shape (len(series), width); rows
+        are left aligned, padding cells are 0 in values and False in mask
+    """
+    tails = [np.asarray(values, dtype=float)[-window:] for values in series]
+    lengths = np.array([len(tail) for tail in tails], dtype=int)
+    width = int(lengths.max()) if len(tails) else 0
+
+    mask = np.arange(width) < lengths[:, None]
+    values = np.zeros((len(tails), width))
+    if width:
+        values[mask] = np.concatenate(tails)
+    return values, mask
+
+
+def fit_trends(series, window=None):
+    """
+    Least-squares line through the trailing window of every series at once.
+
+    Each series is fitted against reading position (0, 1, ...) over its last
+    `window` readings, and forecast one position past the newest reading. All
+    series are fitted together with matrix operations on a padded array, so
+    thousands of users cost a handful of NumPy calls.
+
+    :param series: Sequence of chronological 1-D arrays, e.g. one per user and metric
+    :param window: Readings per fit; defaults to TREND_WINDOW
+    :return: List of TrendFit, one per series. A series with one reading has
+        slope 0 and forecasts that reading; an empty series has count 0.
+    """
+    if not len(series):
+        return []
+    values, mask = pad_series(series, window or settings.TREND_WINDOW)
+
+    n = mask.sum(axis=1).astype(float)
+    x = np.where(mask, np.arange(values.shape[1], dtype=float), 0.0)
+    sum_x = x.sum(axis=1)
+    sum_y = values.sum(axis=1)
+    sum_xx = (x * x).sum(axis=1)
+    sum_xy = (x * values).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = n * sum_xx - sum_x * sum_x
+        slope = np.where(denominator > 0, (n * sum_xy - sum_x * sum_y) / denominator, 0.0)
+        mean = np.where(n > 0, sum_y / n, np.nan)
+        intercept = mean - slope * np.where(n > 0, sum_x / n, 0.0)
+    forecast = intercept + slope * n
+
+    return [
+        TrendFit(int(count), float(fit_slope), float(fit_forecast), float(fit_mean))
+        for count, fit_slope, fit_forecast, fit_mean in zip(n, slope, forecast, mean)
+    ]
+
+
+def classify_trend(fit):
+    """
+    Name the direction of a fitted trend.
+
+    A trend whose fitted change across the window is within
+    TREND_STABLE_TOLERANCE of the mean reading is called stable.
+
+    :return: 'increasing', 'decreasing', 'stable' or 'insufficient_data'
+    """
+    if fit.count == 0:
+        return 'insufficient_data'
+    change = fit.slope * (fit.count - 1)
+    if abs(change) <= settings.TREND_STABLE_TOLERANCE * abs(fit.mean):
+        return 'stable'
+    return 'increasing' if change > 0 else 'decreasing'
@@ -3,12 +3,26 @@ from .views import (
     HealthMetricView,
     SleepDataView,
     JournalEntryView,
-    HealthInsightsView
+    JournalSearchView,
+    HealthInsightsView,
+    AsyncHealthInsightsView,
+    InsightsCacheStatsView,
+    MetricRollupView,
+    PopulationAnalyticsView,
+    TelemetryView,
+    DataExportView
 )
 
 urlpatterns = [
     path('metrics/', HealthMetricView.as_view(), name='metrics'),
     path('sleep/', SleepDataView.as_view(), name='sleep_data'),
     path('journal/', JournalEntryView.as_view(), name='journal_entries'),
+    path('journal/search/', JournalSearchView.as_view(), name='journal_search'),
     path('insights/', HealthInsightsView.as_view(), name='health_insights'),
+    path('insights/async/', AsyncHealthInsightsView.as_view(), name='health_insights_async'),
+    path('insights/cache/', InsightsCacheStatsView.as_view(), name='insights_cache_stats'),
+    path('rollups/', MetricRollupView.as_view(), name='metric_rollups'),
+    path('population/', PopulationAnalyticsView.as_view(), name='population_analytics'),
+    path('telemetry/', TelemetryView.as_view(), name='telemetry'),
+    path('export/<str:dataset>/', DataExportView.as_view(), name='data_export'),
 ]
\ No newline at end of file
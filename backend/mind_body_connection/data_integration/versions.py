@@ -0,0 +1,126 @@
+import asyncio
+import functools
+import hashlib
+from calendar import timegm
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import ALL_USERS
+from .models import DataVersion
+
+
+def bump_data_versions(user_ids):
+    """
+    Move the data version of these users, and of all users, one step forward.
+
+    Runs inside the writing transaction, so a response can never carry the
+    new version with the old data.
+    """
+    user_ids = set(user_ids) | {ALL_USERS}
+    now = timezone.now()
+    updated = DataVersion.objects.filter(user_id__in=user_ids).update(version=F('version') + 1, updated_at=now)
+    if updated < len(user_ids):
+        DataVersion.objects.bulk_create(
+            [DataVersion(user_id=user_id, version=1, updated_at=now) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+
+
+def _version_key(user_id):
+    return user_id or ALL_USERS
+
+
+def _changed_since(user_id, seconds):
+    # Always asked of the primary: a replica may not have seen the change yet
+    return DataVersion.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=_version_key(user_id), updated_at__gte=timezone.now() - timedelta(seconds=seconds)
+    )
+
+
+def recently_changed(user_id, seconds):
+    """
+    Whether the data of the user (all users when None) changed in the last `seconds`.
+    """
+    return _changed_since(user_id, seconds).exists()
+
+
+async def arecently_changed(user_id, seconds):
+    """
+    Async version of recently_changed.
+    """
+    return await _changed_since(user_id, seconds).aexists()
+
+
+def _validators(request, version):
+    """
+    Strong ETag and Last-Modified timestamp of a response to the request.
+
+    The ETag covers the data version and everything else the response
+    depends on: the path, the query parameters and the rendered format.
+    """
+    version, updated_at = version if version else (0, None)
+    renderer = getattr(request, 'accepted_renderer', None)
+    parts = [
+        str(version),
+        updated_at.isoformat() if updated_at else '',
+        request.path,
+        '&'.join(f"{key}={value}" for key, values in sorted(request.GET.lists()) for value in values),
+        renderer.media_type if renderer else '',
+    ]
+    etag = quote_etag(hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32])
+    last_modified = timegm(updated_at.utctimetuple()) if updated_at else None
+    return etag, last_modified
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_on_data_version(view_method):
+    """
+    Decorate a view's get method to answer If-None-Match and If-Modified-Since.
+
+    The validators come from the data version of the `user_id` query
+    parameter (all users when absent), so an unchanged response is answered
+    with 304 Not Modified before any rows are read. Successful and 304
+    responses get ETag and Last-Modified headers. Works on sync and async methods.
+
+    The version is left on the request as `data_version`, so that a view
+    caching its body keys the cache by the same version as the validators.
+    """
+    def lookup(request):
+        return DataVersion.objects.filter(user_id=_version_key(request.GET.get('user_id'))).values_list(
+            'version', 'updated_at'
+        )
+
+    if asyncio.iscoroutinefunction(view_method):
+        @functools.wraps(view_method)
+        async def wrapper(self, request, *args, **kwargs):
+            version = await lookup(request).afirst()
+            request.data_version = version[0] if version else 0
+            etag, last_modified = _validators(request, version)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view_method(self, request, *args, **kwargs)
+            return _finish(response, etag, last_modified)
+    else:
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            version = lookup(request).first()
+            request.data_version = version[0] if version else 0
+            etag, last_modified = _validators(request, version)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+            return _finish(response, etag, last_modified)
+
+    return wrapper
@@ -1,16 +1,59 @@
-import numpy as np
-import json
-from .insights_generator import process_health_insights,HealthInsightsGenerator
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.db import NotSupportedError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from datetime import datetime
-
-from .models import HealthMetric, SleepData, JournalEntry
-from .serializers import HealthMetricSerializer, SleepDataSerializer, JournalEntrySerializer
+import csv
+from itertools import islice
+
+from .models import HealthMetric, SleepData, JournalEntry, MetricRollup
+from .serializers import (
+    HealthMetricSerializer,
+    SleepDataSerializer,
+    JournalEntrySerializer,
+    HealthMetricIngestSerializer,
+    SleepDataIngestSerializer,
+    JournalEntryIngestSerializer,
+    values_serializer
+)
+from .ingestion import upsert_records
+from .pagination import KeysetPagination
+from rest_framework.settings import api_settings
+from .renderers import (
+    COLUMNAR_FORMATS,
+    NDJSONRenderer,
+    CSVRenderer,
+    ColumnarJSONRenderer,
+    MessagePackRenderer,
+    NumpyJSONEncoder,
+    NumpyJSONRenderer,
+    EchoBuffer,
+)
+from .search import search_journal_entries, SearchQueryError
+from .rollups import METRIC_SOURCES, daily_series, rollup_series
+from .versions import conditional_on_data_version
+from .routers import read_from_replica
+from . import cache as insights_cache
+from . import telemetry
+
+# The analytics stack (NumPy, the insight generators and the sentiment
+# analyzer behind them) is imported inside the views that use it, so that
+# loading the URLconf, e.g. for `manage.py check` or `migrate`, stays cheap.
+# Set ANALYTICS_WARMUP to import it at startup instead.
+
+# The time-series list views also answer `?format=columnar` and `?format=msgpack`
+LIST_RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + [ColumnarJSONRenderer, MessagePackRenderer]
 
 class BaseFilteredView:
+    pagination_class = KeysetPagination
+
     def filter_by_date_range(self, queryset, start_date=None, end_date=None):
         """
         Filter queryset by optional date range
@@ -24,7 +67,57 @@ class BaseFilteredView:
                 raise ValueError("Invalid date format. Use YYYY-MM-DD")
         return queryset
 
+    def list_response(self, request, queryset, serializer_class):
+        """
+        Serialize a filtered queryset, one keyset page at a time when requested.
+
+        Rows are read with values_list and converted by the serializer's
+        ValuesSerializer, as a list of objects or, for the columnar formats,
+        as one list per field.
+        """
+        serializer = values_serializer(serializer_class)
+        paginator = self.pagination_class()
+        rows = paginator.paginate_values_list(queryset, request, serializer.sources)
+        if rows is None:
+            rows = serializer.values_list(queryset)
+
+        if request.accepted_renderer.format in COLUMNAR_FORMATS:
+            data = serializer.columns(rows)
+        else:
+            data = serializer.data(rows)
+
+        if paginator.is_requested(request):
+            return paginator.get_paginated_response(data)
+        return Response(data)
+
+    def upsert_response(self, request, serializer_class):
+        """
+        Validate and upsert a batch of records posted as a list or as {"records": [...]}
+        """
+        records = request.data
+        if isinstance(records, dict):
+            records = records.get('records')
+
+        if not isinstance(records, list) or not records:
+            return Response(
+                {"error": "Expected a non-empty list of records"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(records) > settings.INGEST_MAX_BATCH_SIZE:
+            return Response(
+                {"error": f"Batch too large. Send at most {settings.INGEST_MAX_BATCH_SIZE} records per request"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        summary = upsert_records(serializer_class, records)
+        response_status = status.HTTP_200_OK if summary['upserted'] else status.HTTP_400_BAD_REQUEST
+        return Response(summary, status=response_status)
+
 class HealthMetricView(APIView, BaseFilteredView):
+    renderer_classes = LIST_RENDERER_CLASSES
+
+    @read_from_replica
+    @conditional_on_data_version
     def get(self, request):
         # Get optional query parameters
         start_date = request.query_params.get('start_date')
@@ -44,18 +137,20 @@ class HealthMetricView(APIView, BaseFilteredView):
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = HealthMetricSerializer(metrics, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, metrics, HealthMetricSerializer)
+
+    def post(self, request):
+        return self.upsert_response(request, HealthMetricIngestSerializer)
 
     def options(self, request):
         # Handle preflight requests
         response = HttpResponse()
-        response['Allow'] = 'GET, OPTIONS'
+        response['Allow'] = 'GET, POST, OPTIONS'
         return self.add_cors_headers(response)
 
     def add_cors_headers(self, response):
         response['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
@@ -63,11 +158,15 @@ class HealthMetricView(APIView, BaseFilteredView):
         # Add CORS headers to the response
         response = super().dispatch(request, *args, **kwargs)
         response['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
 class SleepDataView(APIView, BaseFilteredView):
+    renderer_classes = LIST_RENDERER_CLASSES
+
+    @read_from_replica
+    @conditional_on_data_version
     def get(self, request):
         # Get optional query parameters
         start_date = request.query_params.get('start_date')
@@ -87,18 +186,20 @@ class SleepDataView(APIView, BaseFilteredView):
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = SleepDataSerializer(sleep_data, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, sleep_data, SleepDataSerializer)
+
+    def post(self, request):
+        return self.upsert_response(request, SleepDataIngestSerializer)
 
     def options(self, request):
         # Handle preflight requests
         response = HttpResponse()
-        response['Allow'] = 'GET, OPTIONS'
+        response['Allow'] = 'GET, POST, OPTIONS'
         return self.add_cors_headers(response)
 
     def add_cors_headers(self, response):
         response['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
@@ -106,11 +207,15 @@ class SleepDataView(APIView, BaseFilteredView):
         # Add CORS headers to the response
         response = super().dispatch(request, *args, **kwargs)
         response['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
 class JournalEntryView(APIView, BaseFilteredView):
+    renderer_classes = LIST_RENDERER_CLASSES
+
+    @read_from_replica
+    @conditional_on_data_version
     def get(self, request):
         # Get optional query parameters
         start_date = request.query_params.get('start_date')
@@ -130,18 +235,20 @@ class JournalEntryView(APIView, BaseFilteredView):
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = JournalEntrySerializer(journal_entries, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, journal_entries, JournalEntrySerializer)
+
+    def post(self, request):
+        return self.upsert_response(request, JournalEntryIngestSerializer)
 
     def options(self, request):
         # Handle preflight requests
         response = HttpResponse()
-        response['Allow'] = 'GET, OPTIONS'
+        response['Allow'] = 'GET, POST, OPTIONS'
         return self.add_cors_headers(response)
 
     def add_cors_headers(self, response):
         response['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
@@ -149,20 +256,239 @@ class JournalEntryView(APIView, BaseFilteredView):
         # Add CORS headers to the response
         response = super().dispatch(request, *args, **kwargs)
         response['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
-def custom_json_encoder(obj):
-    if isinstance(obj, np.float64):
-        if np.isnan(obj):
-            return None
-        return float(obj)
-    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+class JournalSearchView(APIView, BaseFilteredView):
+    """
+    Full-text search over journal entries.
+
+    `q` accepts keywords, "quoted phrases" and prefix terms such as `anxi*`;
+    all terms must match. Results are newest first, at most `limit` entries.
+    Answers 501 on databases without the SQLite full-text index.
+    """
+    @read_from_replica
+    @conditional_on_data_version
+    def get(self, request):
+        query = request.query_params.get('q')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        user_id = request.query_params.get('user_id')
+
+        try:
+            limit = int(request.query_params.get('limit', settings.JOURNAL_SEARCH_LIMIT))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+        journal_entries = JournalEntry.objects.all()
+        if user_id:
+            journal_entries = journal_entries.filter(user_id=user_id)
+
+        try:
+            journal_entries = self.filter_by_date_range(journal_entries, start_date, end_date)
+            journal_entries = search_journal_entries(journal_entries, query)
+        except (ValueError, SearchQueryError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except NotSupportedError as e:
+            return Response({"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        serializer = values_serializer(JournalEntrySerializer)
+        return Response(serializer.data(serializer.values_list(journal_entries[:limit])))
+
+class DataExportView(APIView, BaseFilteredView):
+    """
+    Stream a full history of one dataset as NDJSON (default) or CSV.
+
+    Rows are read with a server-side iterator and written out chunk by chunk,
+    so memory use does not grow with the size of the export.
+    """
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    datasets = {
+        'metrics': HealthMetric,
+        'sleep': SleepData,
+        'journal': JournalEntry,
+    }
+
+    @read_from_replica
+    @conditional_on_data_version
+    def get(self, request, dataset):
+        model = self.datasets.get(dataset)
+        if model is None:
+            return Response(
+                {"error": f"Unknown dataset. Choose one of: {', '.join(self.datasets)}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        user_id = request.query_params.get('user_id')
+
+        queryset = model.objects.all()
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+
+        try:
+            queryset = self.filter_by_date_range(queryset, start_date, end_date)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The rows are read while the response streams, after the view has
+        # returned, so they are bound to the database chosen for the request now
+        queryset = queryset.using(queryset.db)
+
+        fields = [field.attname for field in model._meta.concrete_fields]
+        rows = (
+            queryset.order_by('user_id', 'date', 'id')
+            .values_list(*fields)
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        )
+
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            content = self.stream_csv(fields, rows)
+        else:
+            content = self.stream_ndjson(fields, rows)
+
+        response = StreamingHttpResponse(content, content_type=f"{renderer.media_type}; charset={renderer.charset}")
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{renderer.format}"'
+        return response
+
+    def stream_chunks(self, rows):
+        while True:
+            chunk = list(islice(rows, settings.EXPORT_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield chunk
+
+    def stream_ndjson(self, fields, rows):
+        for chunk in self.stream_chunks(rows):
+            yield ''.join(NDJSONRenderer.render_row(dict(zip(fields, row))) for row in chunk)
+
+    def stream_csv(self, fields, rows):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(fields)
+        for chunk in self.stream_chunks(rows):
+            yield ''.join(CSVRenderer.render_row(writer, row) for row in chunk)
+
+class MetricRollupView(APIView):
+    """
+    Health and sleep metrics for one user aggregated per day, week or month.
+
+    Weekly and monthly figures come from the rollup table, so a year of
+    weekly data reads 52 rows per metric. Each point carries count, sum, min,
+    max and sum of squares, plus the derived mean and standard deviation.
+    """
+    durations = ('daily', MetricRollup.WEEKLY, MetricRollup.MONTHLY)
+
+    @read_from_replica
+    @conditional_on_data_version
+    def get(self, request):
+        duration = request.query_params.get('duration', MetricRollup.WEEKLY)
+        user_id = request.query_params.get('user_id')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        metric = request.query_params.get('metric')
+
+        if not user_id:
+            return Response({"error": "user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if duration not in self.durations:
+            return Response(
+                {"error": f"Invalid duration. Choose one of: {', '.join(self.durations)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        metrics = list(METRIC_SOURCES)
+        if metric:
+            if metric not in METRIC_SOURCES:
+                return Response(
+                    {"error": f"Unknown metric. Choose one of: {', '.join(METRIC_SOURCES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            metrics = [metric]
+
+        if start_date and end_date:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {"error": "Invalid date format. Use YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        if duration == 'daily':
+            series = daily_series(user_id, metrics, start_date, end_date)
+        else:
+            series = rollup_series(user_id, duration, metrics, start_date, end_date)
+
+        return Response({
+            "user_id": user_id,
+            "duration": duration,
+            "metrics": series,
+        })
+
+class PopulationAnalyticsView(APIView):
+    """
+    How users compare: percentiles and a histogram of every user's mean of
+    each metric over a date window, plus the rank of `user_id` when given.
+    """
+    max_bins = 100
+
+    @read_from_replica
+    def get(self, request):
+        from .population import METRIC_MODELS as POPULATION_METRIC_MODELS, population_summary
+
+        user_id = request.query_params.get('user_id')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        metric = request.query_params.get('metric')
+
+        metrics = list(POPULATION_METRIC_MODELS)
+        if metric:
+            if metric not in POPULATION_METRIC_MODELS:
+                return Response(
+                    {"error": f"Unknown metric. Choose one of: {', '.join(POPULATION_METRIC_MODELS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            metrics = [metric]
+
+        try:
+            bins = int(request.query_params.get('bins', settings.POPULATION_HISTOGRAM_BINS))
+        except ValueError:
+            return Response({"error": "bins must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        bins = max(1, min(bins, self.max_bins))
+
+        if start_date and end_date:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {"error": "Invalid date format. Use YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            start_date = end_date = None
 
+        return Response({
+            "start_date": start_date,
+            "end_date": end_date,
+            "metrics": population_summary(metrics, start_date, end_date, user_id=user_id, bins=bins),
+        })
 
 class HealthInsightsView(APIView):
+    # Insights hold NumPy values, which the renderer writes as plain JSON
+    renderer_classes = [NumpyJSONRenderer] + api_settings.DEFAULT_RENDERER_CLASSES[1:]
+
+    @read_from_replica
+    @conditional_on_data_version
     def get(self, request):
+        from .insight_state import StateInsightsGenerator, load_insight_state
+        from .insights_generator import HealthInsightsGenerator
+        from .precompute import load_snapshot
+
         # Extract query parameters
         duration = request.query_params.get('duration', 'weekly')
         user_id = request.query_params.get('user_id')
@@ -195,8 +521,34 @@ class HealthInsightsView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+        # Serve repeated queries from the cache until the user's data changes
+        cache_key = insights_cache.insights_key(user_id, request.data_version, start_date, end_date, agent)
+        cached = insights_cache.get_insights(cache_key)
+        if cached is not None:
+            response = Response(cached)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        # A user's full history is summarised by their running insight state
+        state = None
+        if user_id and not (start_date and end_date):
+            state = load_insight_state(user_id)
+            if state is None:
+                return Response(
+                    {"message": "No health metrics available for the specified criteria"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            # Precomputed by the nightly precompute_insights run
+            snapshot = load_snapshot(state, agent)
+            if snapshot is not None:
+                insights_cache.set_insights(cache_key, snapshot)
+                response = Response(snapshot)
+                response['X-Cache'] = 'MISS'
+                return response
+
         # Validate data availability
-        if not health_metrics.exists():
+        if not (state.health_count if state else health_metrics.exists()):
             return Response(
                 {"message": "No health metrics available for the specified criteria"},
                 status=status.HTTP_404_NOT_FOUND
@@ -204,16 +556,19 @@ class HealthInsightsView(APIView):
 
         # Process insights
         try:
-            insights_generator = HealthInsightsGenerator(health_metrics, sleep_data, journal_entries)
+            if state:
+                insights_generator = StateInsightsGenerator(state)
+            else:
+                insights_generator = HealthInsightsGenerator(health_metrics, sleep_data, journal_entries)
 
             # If a specific agent is requested, return its insights
             if agent:
                 if agent.lower() == 'fitness':
-                    insights = insights_generator.generate_fitness_insights()
+                    insights = insights_generator.run_agent('fitness')
                 elif agent.lower() == 'sleep':
-                    insights = insights_generator.generate_sleep_insights()
+                    insights = insights_generator.run_agent('sleep')
                 elif agent.lower() == 'journal':
-                    insights = insights_generator.analyze_journal_sentiments()
+                    insights = insights_generator.run_agent('journal')
                 else:
                     return Response(
                         {"error": "Invalid agent specified"},
@@ -223,10 +578,149 @@ class HealthInsightsView(APIView):
                 # Otherwise, return full holistic insights
                 insights = insights_generator.generate_holistic_insights()
 
-            return Response(json.loads(json.dumps(insights, default=custom_json_encoder)))
+            insights_cache.set_insights(cache_key, insights)
+            response = Response(insights)
+            response['X-Cache'] = 'MISS'
+            return response
 
         except Exception as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+# Runs the CPU-bound insight agents off the event loop
+_insights_executor = None
+
+
+def get_insights_executor():
+    global _insights_executor
+    if _insights_executor is None:
+        _insights_executor = ThreadPoolExecutor(
+            max_workers=settings.INSIGHTS_EXECUTOR_WORKERS, thread_name_prefix='insights'
+        )
+    return _insights_executor
+
+
+class AsyncHealthInsightsView(View):
+    """
+    Asynchronous HealthInsightsView for ASGI deployments.
+
+    The three datasets are queried concurrently through Django's async ORM,
+    and the fitness, sleep and journal agents then run side by side in a
+    thread pool, so the event loop is never blocked by a slow agent. Accepts
+    the same parameters and returns the same insights as /api/insights/,
+    sharing its cache and per-user insight state.
+    """
+    agents = ('fitness', 'sleep', 'journal')
+
+    @read_from_replica
+    @conditional_on_data_version
+    async def get(self, request):
+        from .insight_state import StateInsightsGenerator, load_insight_state
+        from .insights_generator import HealthInsightsGenerator
+        from .precompute import load_snapshot
+
+        user_id = request.GET.get('user_id')
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        agent = request.GET.get('agent')
+
+        if agent and agent.lower() not in self.agents:
+            return JsonResponse({"error": "Invalid agent specified"}, status=status.HTTP_400_BAD_REQUEST)
+
+        health_metrics = HealthMetric.objects.all()
+        sleep_data = SleepData.objects.all()
+        journal_entries = JournalEntry.objects.all()
+        if user_id:
+            health_metrics = health_metrics.filter(user_id=user_id)
+            sleep_data = sleep_data.filter(user_id=user_id)
+            journal_entries = journal_entries.filter(user_id=user_id)
+
+        if start_date and end_date:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
+                return JsonResponse(
+                    {"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            health_metrics = health_metrics.filter(date__range=[start_date, end_date])
+            sleep_data = sleep_data.filter(date__range=[start_date, end_date])
+            journal_entries = journal_entries.filter(date__range=[start_date, end_date])
+
+        cache_key = insights_cache.insights_key(user_id, request.data_version, start_date, end_date, agent)
+        cached = insights_cache.get_insights(cache_key)
+        if cached is not None:
+            response = JsonResponse(cached, safe=False)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        if user_id and not (start_date and end_date):
+            state = await sync_to_async(load_insight_state)(user_id)
+            if state is None:
+                return JsonResponse(
+                    {"message": "No health metrics available for the specified criteria"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            snapshot = await sync_to_async(load_snapshot)(state, agent)
+            if snapshot is not None:
+                insights_cache.set_insights(cache_key, snapshot)
+                response = JsonResponse(snapshot, safe=False)
+                response['X-Cache'] = 'MISS'
+                return response
+            has_data = state.health_count > 0
+            insights_generator = StateInsightsGenerator(state)
+        else:
+            has_data = await health_metrics.aexists()
+            insights_generator = HealthInsightsGenerator(health_metrics, sleep_data, journal_entries)
+            if has_data:
+                await insights_generator.aload_columns()
+
+        if not has_data:
+            return JsonResponse(
+                {"message": "No health metrics available for the specified criteria"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        loop = asyncio.get_running_loop()
+        executor = get_insights_executor()
+        try:
+            if agent:
+                insights = await loop.run_in_executor(
+                    executor, telemetry.bind(insights_generator.run_agent, agent.lower())
+                )
+            else:
+                fitness, sleep, journal = await asyncio.gather(*(
+                    loop.run_in_executor(executor, telemetry.bind(insights_generator.run_agent, name))
+                    for name in self.agents
+                ))
+                insights = insights_generator.combine_insights(fitness, sleep, journal)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        insights_cache.set_insights(cache_key, insights)
+        with telemetry.timed('serialize'):
+            response = JsonResponse(insights, safe=False, encoder=NumpyJSONEncoder)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class InsightsCacheStatsView(APIView):
+    """
+    Hit and miss counters of this process's insights cache.
+    """
+    def get(self, request):
+        return Response(insights_cache.stats.as_dict())
+
+
+class TelemetryView(View):
+    """
+    Request timing histograms of this process in the Prometheus text format.
+
+    Served at /api/telemetry/, since /api/metrics/ is the health metrics API.
+    """
+    def get(self, request):
+        if not settings.TELEMETRY_ENABLED:
+            return JsonResponse({"error": "Telemetry is disabled"}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(telemetry.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
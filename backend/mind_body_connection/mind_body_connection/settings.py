@@ -40,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'data_integration.middleware.TelemetryMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -65,6 +66,25 @@ CORS_ORIGIN_WHITELIST = [
 ]
 ALLOWED_HOSTS = ['localhost', '127.0.0.1','0.0.0.0',]
 
+# Keyset pagination for the time-series list endpoints (opt-in via ?page_size= or ?cursor=)
+API_PAGE_SIZE = 500
+API_MAX_PAGE_SIZE = 5000
+
+# Default number of results returned by the journal search endpoint
+JOURNAL_SEARCH_LIMIT = 50
+
+# Rows fetched per database round trip by the streaming export endpoint
+EXPORT_CHUNK_SIZE = 2000
+
+# Batched upsert ingestion: records accepted per request and rows per INSERT statement
+INGEST_MAX_BATCH_SIZE = 10000
+INGEST_DB_BATCH_SIZE = 1000
+
+# Parallel journal sentiment scoring in batch commands (backfills, bulk loads,
+# state rebuilds); requests score in-process. None uses one worker per CPU.
+SENTIMENT_WORKERS = None
+SENTIMENT_CHUNK_SIZE = 500
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -111,13 +131,99 @@ WSGI_APPLICATION = 'mind_body_connection.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite tuning, chosen with DATABASE_PROFILE. The production profile turns on
+# WAL journaling, so dashboard reads no longer wait for ingest writes, syncs to
+# disk at checkpoints rather than every commit, memory-maps the file, enlarges
+# the page cache, waits for locks instead of failing and keeps connections
+# open across requests. PRAGMAS are set on every new connection (see
+# data_integration.database); compare profiles with manage.py benchmark_concurrency.
+DATABASE_PROFILES = {
+    'default': {},
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,  # negative: in KiB, so 64 MiB
+            'busy_timeout': 5000,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'default')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **DATABASE_PROFILES[DATABASE_PROFILE],
     }
 }
 
+# Read replicas for the read-only views, as DATABASE_REPLICAS="alias:weight,..."
+# (weight defaults to 1). Writes always go to 'default'. A replica alias not
+# defined in DATABASES is a SQLite copy of the primary at <alias>.sqlite3,
+# refreshed with manage.py sync_sqlite_replicas; define the alias above to
+# read from e.g. a PostgreSQL replica instead. See data_integration.routers.
+DATABASE_REPLICAS = {
+    alias: int(weight or 1)
+    for alias, _, weight in (
+        entry.strip().partition(':') for entry in os.environ.get('DATABASE_REPLICAS', '').split(',') if entry.strip()
+    )
+}
+for alias in DATABASE_REPLICAS:
+    DATABASES.setdefault(alias, {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    })
+
+# 'weighted' picks a replica at random in proportion to its weight, 'round_robin' takes them in turn
+DATABASE_REPLICA_SELECTION = os.environ.get('DATABASE_REPLICA_SELECTION', 'weighted')
+
+# Reads for a user whose data changed this recently stay on the primary, so
+# clients read their own writes while the replicas catch up
+DATABASE_PRIMARY_PIN_SECONDS = 15
+
+DATABASE_ROUTERS = ['data_integration.routers.PrimaryReplicaRouter']
+
+# Computed insights are cached per user and query under the user's data
+# version, so a write in any process retires their entries (see data_integration.cache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'insights': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'insights',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+INSIGHTS_CACHE_ALIAS = 'insights'
+INSIGHTS_CACHE_TIMEOUT = 3600
+# Fitness trends are least-squares fits over each metric's last TREND_WINDOW
+# readings; a fitted change within TREND_STABLE_TOLERANCE of the mean is "stable"
+TREND_WINDOW = 30
+TREND_STABLE_TOLERANCE = 0.01
+# Population percentiles are cached per date window; they move slowly
+POPULATION_CACHE_ALIAS = 'default'
+POPULATION_CACHE_TIMEOUT = 600
+POPULATION_HISTOGRAM_BINS = 20
+# Threads running insight agents for the async insights view
+INSIGHTS_EXECUTOR_WORKERS = 4
+# NumPy, TextBlob and the insight generators load on first use; set
+# ANALYTICS_WARMUP=1 for preforking servers to load them at startup instead
+ANALYTICS_WARMUP = os.environ.get('ANALYTICS_WARMUP') == '1'
+# Per-request Server-Timing headers and the /api/telemetry/ histograms.
+# Allocation tracing uses tracemalloc, which slows the whole process down.
+TELEMETRY_ENABLED = os.environ.get('TELEMETRY_ENABLED') == '1'
+TELEMETRY_TRACE_ALLOCATIONS = os.environ.get('TELEMETRY_TRACE_ALLOCATIONS') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators